@@ -3,15 +3,18 @@ ESG Dashboard - Overview
 """
 
 import streamlit as st
+from utils.backend import get_session
+from utils.instrumentation import performance_panel
+from utils.database import load_metrics, organization_picker
 
 st.title("📊 ESG Dashboard")
 
 try:
-    from snowflake.snowpark.context import get_active_session
-    session = get_active_session()
+    session = get_session("Dashboard")
+    org_id = organization_picker(session)
 
     # Get data
-    df = session.table("ESG_METRICS").to_pandas()
+    df = load_metrics(session, org_id)
 
     if df.empty:
         st.warning("No ESG data available.")
@@ -23,13 +26,15 @@ try:
             st.metric("Total Records", len(df))
 
         with col2:
-            st.metric("Organizations", df["ORGANIZATION_NAME"].nunique())
+            st.metric("Approved", int((df["REPORT_STATUS"] == "Approved").sum()))
 
         with col3:
-            st.metric("Latest Year", df["REPORTING_YEAR"].max())
+            st.metric("Latest Year", df["REPORT_YEAR"].max())
 
         st.markdown("### Recent Records")
         st.dataframe(df.head(10), use_container_width=True)
 
+    performance_panel(session)
+
 except Exception as e:
     st.error(f"Error: {e}")
@@ -4,25 +4,28 @@ ESG Data Entry - CRUD Operations
 
 import streamlit as st
 from datetime import date
+from utils.backend import get_session
+from utils.instrumentation import performance_panel
+from utils.database import load_metrics, insert_row, delete_report, organization_picker
 
 st.title("✏️ ESG Data Entry")
 
 try:
-    from snowflake.snowpark.context import get_active_session
-    session = get_active_session()
+    session = get_session("Data Entry")
+    org_id = organization_picker(session)
 
     # Tabs
     tab1, tab2 = st.tabs(["View Records", "Add New"])
 
     with tab1:
         st.markdown("### Current Records")
-        df = session.table("ESG_METRICS").to_pandas()
+        df = load_metrics(session, org_id)
 
         if df.empty:
             st.info("No records found.")
         else:
             st.dataframe(
-                df[["ID", "ORGANIZATION_NAME", "REPORTING_YEAR", "GHG_SCOPE1_MTCO2E", "TOTAL_EMPLOYEES"]],
+                df[["ID", "REPORT_YEAR", "REPORT_STATUS", "GHG_SCOPE1_TCO2E", "EMPLOYEES_TOTAL"]],
                 use_container_width=True
             )
 
@@ -31,7 +34,7 @@ try:
             record_id = st.number_input("Record ID to delete", min_value=1, step=1)
             if st.button("Delete Record", type="secondary"):
                 try:
-                    session.sql(f"DELETE FROM ESG_METRICS WHERE ID = {record_id}").collect()
+                    delete_report(session, org_id, record_id)
                     st.success(f"Record {record_id} deleted!")
                     st.rerun()
                 except Exception as e:
@@ -41,15 +44,14 @@ try:
         st.markdown("### Add New ESG Record")
 
         with st.form("add_form"):
-            org_name = st.text_input("Organization Name *")
             reporting_year = st.number_input("Reporting Year *", value=date.today().year, min_value=2000, max_value=2100)
 
             st.markdown("#### Environmental")
             col1, col2 = st.columns(2)
             with col1:
-                ghg_scope1 = st.number_input("GHG Scope 1 (mtCO2e)", value=0.0)
+                ghg_scope1 = st.number_input("GHG Scope 1 (tCO2e)", value=0.0)
             with col2:
-                renewable_pct = st.number_input("Renewable Energy %", value=0.0, min_value=0.0, max_value=100.0)
+                energy_total = st.number_input("Total Energy (MWh)", value=0.0, min_value=0.0)
 
             st.markdown("#### Social")
             col1, col2 = st.columns(2)
@@ -68,26 +70,23 @@ try:
             submitted = st.form_submit_button("Create Record", type="primary")
 
             if submitted:
-                if not org_name:
-                    st.error("Organization name is required!")
+                # (ORG_ID, REPORT_YEAR) is unique; a year is edited on the One Report page
+                if reporting_year in set(load_metrics(session, org_id, ["REPORT_YEAR"])["REPORT_YEAR"]):
+                    st.error(f"FY{reporting_year} already exists for this organization!")
                 else:
-                    sql = f"""
-                    INSERT INTO ESG_METRICS (
-                        ORGANIZATION_NAME, REPORTING_YEAR, GHG_SCOPE1_MTCO2E,
-                        RENEWABLE_ENERGY_PCT, TOTAL_EMPLOYEES, FEMALE_EMPLOYEES_PCT,
-                        BOARD_SIZE, HAS_ETHICS_POLICY, CREATED_BY, CREATED_AT
-                    ) VALUES (
-                        '{org_name}', {reporting_year}, {ghg_scope1},
-                        {renewable_pct}, {employees}, {female_pct},
-                        {board_size}, {ethics}, CURRENT_USER(), CURRENT_TIMESTAMP()
-                    )
-                    """
+                    fields = {
+                        "REPORT_YEAR": reporting_year, "GHG_SCOPE1_TCO2E": ghg_scope1,
+                        "ENERGY_TOTAL_MWH": energy_total, "EMPLOYEES_TOTAL": employees, "WOMEN_WORKFORCE_PCT": female_pct,
+                        "BOARD_TOTAL": board_size, "CODE_OF_CONDUCT": ethics,
+                    }
                     try:
-                        session.sql(sql).collect()
+                        insert_row(session, org_id, fields)
                         st.success("Record created!")
                         st.balloons()
                     except Exception as e:
                         st.error(f"Error: {e}")
 
+    performance_panel(session)
+
 except Exception as e:
     st.error(f"Error: {e}")
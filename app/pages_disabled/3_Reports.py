@@ -4,48 +4,69 @@ ESG Reports - Download and Export
 
 import streamlit as st
 from datetime import date
+from utils.backend import get_session
+from utils.instrumentation import performance_panel
+from utils.database import load_arrow, arrow_frame, batch_totals, organization_picker
+from utils.export import FORMATS, build_export
+
+PAGE_SIZE = 500
 
 st.title("📥 ESG Reports")
 
 try:
-    from snowflake.snowpark.context import get_active_session
-    session = get_active_session()
+    session = get_session("Reports")
+    org_id = organization_picker(session)
 
-    # Get data
-    df = session.table("ESG_METRICS").to_pandas()
+    # Get data (kept as Arrow; only the previewed page becomes a DataFrame)
+    table = load_arrow(session, org_id)
 
-    if df.empty:
+    if table.num_rows == 0:
         st.warning("No data available to export.")
     else:
         st.markdown("### Data Preview")
-        st.dataframe(df, use_container_width=True)
+        pages = (table.num_rows - 1) // PAGE_SIZE + 1
+        page = st.number_input("Page", min_value=1, max_value=pages, value=1) if pages > 1 else 1
+        st.dataframe(arrow_frame(table, (page - 1) * PAGE_SIZE, PAGE_SIZE), use_container_width=True)
+        st.caption(f"Rows {(page - 1) * PAGE_SIZE + 1:,}-{min(page * PAGE_SIZE, table.num_rows):,} of {table.num_rows:,}")
 
         st.markdown("---")
         st.markdown("### Download")
 
-        # CSV download
-        csv_data = df.to_csv(index=False).encode('utf-8')
-        st.download_button(
-            label="📄 Download CSV",
-            data=csv_data,
-            file_name=f"ESG_Report_{date.today()}.csv",
-            mime="text/csv",
-            type="primary"
-        )
+        # Built only on request, streamed from the warehouse in batches
+        fmt = st.radio("Format", list(FORMATS), format_func=str.upper, horizontal=True)
+        if st.button("Prepare export"):
+            st.session_state["report_export"] = ((org_id, fmt), build_export(session, org_id, "all", fmt))
+
+        prepared = st.session_state.get("report_export")
+        if prepared and prepared[0] != (org_id, fmt):
+            # A file for another selection is no longer downloadable; drop its bytes
+            del st.session_state["report_export"]
+        elif prepared:
+            data, _, mime = prepared[1]
+            st.download_button(
+                label=f"📄 Download {fmt.upper()}",
+                data=data,
+                file_name=f"ESG_Report_{date.today()}.{FORMATS[fmt][0]}",
+                mime=mime,
+                type="primary"
+            )
 
         # Summary stats
         st.markdown("---")
         st.markdown("### Summary Statistics")
+        totals = batch_totals([table], ["GHG_SCOPE1_TCO2E", "EMPLOYEES_TOTAL"])
         col1, col2, col3 = st.columns(3)
 
         with col1:
-            st.metric("Total Records", len(df))
+            st.metric("Total Records", totals["ROWS"])
         with col2:
-            if "GHG_SCOPE1_MTCO2E" in df.columns:
-                st.metric("Total Emissions", f"{df['GHG_SCOPE1_MTCO2E'].sum():,.0f}")
+            if "GHG_SCOPE1_TCO2E" in table.schema.names:
+                st.metric("Total Emissions", f"{totals['GHG_SCOPE1_TCO2E']:,.0f}")
         with col3:
-            if "TOTAL_EMPLOYEES" in df.columns:
-                st.metric("Total Employees", f"{df['TOTAL_EMPLOYEES'].sum():,}")
+            if "EMPLOYEES_TOTAL" in table.schema.names:
+                st.metric("Total Employees", f"{totals['EMPLOYEES_TOTAL']:,.0f}")
+
+    performance_panel(session)
 
 except Exception as e:
     st.error(f"Error: {e}")
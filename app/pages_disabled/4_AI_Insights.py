@@ -2,44 +2,54 @@
 AI Insights - Cortex AI Integration
 """
 
+import time
+
+import pandas as pd
 import streamlit as st
+from utils.backend import get_session
+from utils.instrumentation import performance_panel
+from utils.database import data_fingerprint, organization_picker
+from utils.cortex import data_context, response_cache_stats, submit
+from utils.narratives import PILLARS, SECTIONS, load_narratives, merged_rows, narrative_query
+
+# Seconds between refreshes of pending answers
+POLL_SECONDS = 0.5
 
 st.title("🤖 AI Insights")
 st.markdown("Get AI-powered analysis using Snowflake Cortex")
 
 try:
-    from snowflake.snowpark.context import get_active_session
-    session = get_active_session()
+    session = get_session("AI Insights")
+    org_id = organization_picker(session)
 
-    # Get data summary
-    df = session.table("ESG_METRICS").to_pandas()
+    # One fingerprint of the organization's rows per run keys both the context and the answer cache
+    fingerprint = data_fingerprint(session, org_id)
+    data_summary = data_context(session, org_id, fingerprint)
 
-    if df.empty:
+    if not data_summary:
         st.warning("No data available for analysis.")
     else:
-        # Data context
-        data_summary = f"""
-        ESG Data Summary:
-        - Total records: {len(df)}
-        - Organizations: {df['ORGANIZATION_NAME'].nunique()}
-        - Years: {df['REPORTING_YEAR'].min()} to {df['REPORTING_YEAR'].max()}
-        - Total GHG Emissions: {df['GHG_SCOPE1_MTCO2E'].sum():,.0f} mtCO2e
-        - Avg Renewable Energy: {df['RENEWABLE_ENERGY_PCT'].mean():.1f}%
-        """
-
         st.markdown("### Data Context")
         st.code(data_summary)
 
         st.markdown("---")
-        st.markdown("### Ask a Question")
+        mode = st.radio("Mode", ["Ask a question", "Report narratives"], horizontal=True)
+
+        if mode == "Ask a question":
+            st.markdown("### Ask a Question")
 
-        user_question = st.text_input(
-            "Enter your question:",
-            placeholder="e.g., What are the key trends in our ESG performance?"
-        )
+            # Questions run as background jobs kept per user session; the page
+            # stays interactive and several questions can be in flight at once
+            jobs = st.session_state.setdefault("ai_jobs", {})
 
-        if st.button("Get AI Answer", type="primary", disabled=not user_question):
-            with st.spinner("Analyzing with Cortex AI..."):
+            with st.form("ask", clear_on_submit=True):
+                user_question = st.text_input(
+                    "Enter your question:",
+                    placeholder="e.g., What are the key trends in our ESG performance?"
+                )
+                asked = st.form_submit_button("Get AI Answer", type="primary")
+
+            if asked and user_question:
                 prompt = f"""You are an ESG analyst. Based on this data summary, answer the question.
 
 {data_summary}
@@ -47,23 +57,107 @@ try:
 Question: {user_question}
 
 Provide a clear, professional response:"""
-
-                # Escape quotes
-                escaped_prompt = prompt.replace("'", "''")
-
                 try:
-                    result = session.sql(f"""
-                        SELECT SNOWFLAKE.CORTEX.COMPLETE(
-                            'claude-3-5-sonnet',
-                            '{escaped_prompt}'
-                        ) as response
-                    """).collect()
-
-                    st.markdown("### AI Response")
-                    st.markdown(result[0]["RESPONSE"])
+                    job = submit(session, prompt, label=user_question, fingerprint=fingerprint)
+                    jobs[job.id] = job
                 except Exception as e:
                     st.error(f"Cortex error: {e}")
-                    st.info("Make sure Cortex AI is enabled in your Snowflake account.")
+
+            active = any(not job.done for job in jobs.values())
+
+            # Re-renders only this block while answers are pending
+            @st.fragment(run_every=POLL_SECONDS if active else None)
+            def show_answers():
+                for job in reversed(list(jobs.values())):
+                    job.poll()
+                    with st.container(border=True):
+                        st.markdown(f"**{job.label}**")
+                        if job.status == "failed":
+                            st.error(f"Cortex error: {job.error}")
+                            st.info("Make sure Cortex AI is enabled in your Snowflake account.")
+                        elif job.text:
+                            st.markdown(job.text)
+                        if job.done:
+                            cached = f" · cached ({job.source})" if job.source in ("memory", "table") else ""
+                            st.caption(f"{job.status.capitalize()} in {job.elapsed:.1f}s{cached}")
+                        else:
+                            st.caption(f"{job.status.capitalize()}… {time.time() - job.submitted:.0f}s")
+                            if st.button("Cancel", key=f"cancel_{job.id}"):
+                                job.cancel()
+                # Last answer in: one full rerun turns the polling off
+                if active and all(job.done for job in jobs.values()):
+                    st.rerun()
+
+            if jobs:
+                st.markdown("### AI Responses")
+                show_answers()
+                if not active and st.button("Clear answers"):
+                    jobs.clear()
+                    st.rerun()
+
+        else:
+            st.markdown("### One Report Narratives")
+            st.caption("Drafts every E, S and G subsection for every report year in a single "
+                       "Cortex pass in the warehouse; subsections whose figures have not changed are skipped.")
+
+            running = st.session_state.get("narrative_job")
+            col1, col2 = st.columns(2)
+            force = col2.checkbox("Also regenerate unchanged subsections")
+            if running is None and col1.button("Generate report narratives", type="primary"):
+                query = narrative_query(session, org_id, force=force)
+                if hasattr(query, "collect_nowait"):
+                    st.session_state["narrative_job"] = query.collect_nowait()
+                    st.rerun()
+                with st.spinner("Generating narratives with Cortex AI..."):
+                    st.session_state["narrative_result"] = ("success", f"{merged_rows(query.collect())} narratives written")
+
+            if running is not None:
+                @st.fragment(run_every=POLL_SECONDS * 4)
+                def wait_for_narratives():
+                    if running.is_done():
+                        del st.session_state["narrative_job"]
+                        try:
+                            result = ("success", f"{merged_rows(running.result())} narratives written")
+                        except Exception as e:
+                            result = ("error", f"Cortex error: {e}")
+                        st.session_state["narrative_result"] = result
+                        st.rerun()
+                    st.info("Generating narratives in the warehouse...")
+                    if st.button("Cancel generation"):
+                        running.cancel()
+                        del st.session_state["narrative_job"]
+                        st.rerun()
+
+                wait_for_narratives()
+
+            if "narrative_result" in st.session_state:
+                kind, message = st.session_state.pop("narrative_result")
+                getattr(st, kind)(message)
+
+            narratives = load_narratives(session, org_id)
+            if narratives.empty:
+                st.info("No narratives yet. Generate them to draft the One Report sustainability chapter.")
+            else:
+                year = st.selectbox("Report year", sorted(narratives["REPORT_YEAR"].unique(), reverse=True))
+                rows = narratives[narratives["REPORT_YEAR"] == year].set_index("SECTION")
+                for pillar, pillar_name in PILLARS.items():
+                    st.subheader(pillar_name)
+                    for key, (section_pillar, title, _) in SECTIONS.items():
+                        if section_pillar != pillar or key not in rows.index:
+                            continue
+                        row = rows.loc[key]
+                        written = row["UPDATED_AT"] if pd.notna(row["UPDATED_AT"]) else row["CREATED_AT"]
+                        with st.expander(title, expanded=True):
+                            st.markdown(row["NARRATIVE"])
+                            st.caption(f"{row['MODEL']} · {written:%Y-%m-%d %H:%M}")
+
+    stats = response_cache_stats()
+    st.sidebar.caption(
+        f"AI cache: {stats['hit_rate']:.0%} hit rate, "
+        f"{stats['saved_seconds']:.1f}s of model time saved"
+    )
+
+    performance_panel(session)
 
 except Exception as e:
     st.error(f"Error: {e}")
@@ -0,0 +1,152 @@
+#!/usr/bin/env python3
+"""
+Budibase ESG bulk loader
+Loads thousands of ESG_METRICS rows into Budibase from a CSV, JSON/JSONL or
+Parquet file (for example a One Report export from the Streamlit app).
+Requests share a keep-alive connection pool and run on a bounded thread
+pool; 429/5xx responses are retried with exponential backoff.
+
+Usage:
+    python bulk_load.py --api-key YOUR_KEY --app-id YOUR_APP_ID --file export.csv --concurrency 8
+
+Try it locally against the mock server:
+    python mock_budibase.py --port 4001 --error-rate 0.05 &
+    python bulk_load.py --api-base http://127.0.0.1:4001/api/public/v1 \\
+        --api-key test --app-id app_test --create-table --file export.csv
+"""
+
+import argparse
+import csv
+import json
+import sys
+import threading
+import time
+from datetime import date
+from decimal import Decimal
+
+from setup_esg_app import API_BASE, ESG_METRICS_SCHEMA, BudibaseAPI
+
+FIELD_TYPES = {name: field["type"] for name, field in ESG_METRICS_SCHEMA["schema"].items()}
+
+
+def coerce(name: str, value):
+    """Turn a text cell into the type Budibase expects for the field; None drops it"""
+    if value is None or value == "":
+        return None
+    if isinstance(value, Decimal):
+        return float(value)
+    if isinstance(value, date):
+        return value.isoformat()
+    if not isinstance(value, str):
+        return value
+    kind = FIELD_TYPES.get(name)
+    if kind == "number":
+        number = float(value)
+        return int(number) if number.is_integer() else number
+    if kind == "boolean":
+        return value.strip().lower() in ("true", "1", "yes", "y", "t")
+    return value
+
+
+def read_rows(path: str):
+    """Yield rows as dicts with only the fields of the Budibase schema"""
+    if path.endswith(".csv"):
+        with open(path, newline="", encoding="utf-8") as f:
+            rows = csv.DictReader(f)
+            yield from (clean_row(row) for row in rows)
+    elif path.endswith(".jsonl"):
+        with open(path, encoding="utf-8") as f:
+            yield from (clean_row(json.loads(line)) for line in f if line.strip())
+    elif path.endswith(".json"):
+        with open(path, encoding="utf-8") as f:
+            data = json.load(f)
+        yield from (clean_row(row) for row in (data.get("data", []) if isinstance(data, dict) else data))
+    elif path.endswith(".parquet"):
+        import pyarrow.parquet as pq
+
+        for batch in pq.ParquetFile(path).iter_batches():
+            yield from (clean_row(row) for row in batch.to_pylist())
+    else:
+        raise ValueError(f"Unsupported file type: {path} (use .csv, .json, .jsonl or .parquet)")
+
+
+def clean_row(row: dict) -> dict:
+    """Keep the Budibase schema fields of a row, coerced to their field types"""
+    cleaned = {}
+    for name, value in row.items():
+        name = name.strip().upper()
+        if name in FIELD_TYPES:
+            value = coerce(name, value)
+            if value is not None:
+                cleaned[name] = value
+    return cleaned
+
+
+def count_rows(path: str) -> int:
+    """Row count for progress reporting (cheap second pass over the file)"""
+    return sum(1 for _ in read_rows(path))
+
+
+class Progress:
+    """Prints done/total and throughput at most once per interval"""
+
+    def __init__(self, total: int, interval: float = 1.0):
+        self.total = total
+        self.interval = interval
+        self.started = time.perf_counter()
+        self.last = 0.0
+        self.lock = threading.Lock()
+
+    def __call__(self, done: int, failed: int, final: bool = False):
+        with self.lock:
+            elapsed = time.perf_counter() - self.started
+            if not final and elapsed - self.last < self.interval:
+                return
+            self.last = elapsed
+            rate = (done + failed) / elapsed if elapsed else 0.0
+            end = "\n" if final else ""
+            print(f"\r    {done + failed:,}/{self.total:,} rows  {failed:,} failed  {rate:,.1f} rows/s",
+                  end=end, flush=True)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Bulk load ESG rows into Budibase")
+    parser.add_argument("--api-key", required=True, help="Your Budibase API key")
+    parser.add_argument("--app-id", required=True, help="Your Budibase App ID (from URL)")
+    parser.add_argument("--api-base", default=API_BASE, help="Public API URL (e.g. a self-hosted or mock server)")
+    parser.add_argument("--file", required=True, help="CSV, JSON, JSONL or Parquet file to load")
+    parser.add_argument("--table-id", help="Target table ID (default: look up ESG_METRICS)")
+    parser.add_argument("--create-table", action="store_true", help="Create ESG_METRICS if it does not exist")
+    parser.add_argument("--concurrency", type=int, default=8, help="Parallel requests")
+    parser.add_argument("--timeout", type=float, default=30, help="Read timeout per request in seconds")
+    parser.add_argument("--retries", type=int, default=5, help="Retries per request on 429/5xx")
+    args = parser.parse_args()
+
+    with BudibaseAPI(args.api_key, args.app_id, api_base=args.api_base,
+                     timeout=(5, args.timeout), retries=args.retries,
+                     pool_size=args.concurrency) as api:
+        table_id = args.table_id or api.find_table("ESG_METRICS")
+        if table_id is None and args.create_table:
+            table_id = api.create_table(ESG_METRICS_SCHEMA)["data"]["_id"]
+        if table_id is None:
+            sys.exit("ESG_METRICS table not found (run setup_esg_app.py or pass --create-table)")
+
+        total = count_rows(args.file)
+        print(f"Loading {total:,} rows from {args.file} into {table_id} "
+              f"({args.concurrency} concurrent requests)")
+        progress = Progress(total)
+        created, failures = api.create_rows(table_id, read_rows(args.file), args.concurrency, progress)
+        progress(len(created), len(failures), final=True)
+
+    elapsed = time.perf_counter() - progress.started
+    print(f"Created {len(created):,} rows in {elapsed:.1f}s ({len(created) / elapsed:,.1f} rows/s)")
+    for index, error in failures[:10]:
+        print(f"    row {index + 1}: {error}")
+    if failures:
+        # Creates are not retried after a 500/502/504, and those may have been written
+        print("Rows that failed with a 5xx other than 503 may have been created; check before reloading them")
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
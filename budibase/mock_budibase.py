@@ -0,0 +1,201 @@
+#!/usr/bin/env python3
+"""
+Local mock of the Budibase Public API
+Implements the table and row endpoints the scripts in this directory use,
+keeping data in memory. Can inject latency and 429/503 responses to exercise
+retries and concurrency without touching Budibase Cloud, and 502s returned
+after a row create was already written, to check that creates are never
+retried into duplicates.
+
+Usage:
+    python mock_budibase.py --port 4001 --error-rate 0.05 --latency 0.02
+    python bulk_load.py --api-base http://localhost:4001/api/public/v1 \\
+        --api-key test --app-id app_test --file rows.csv
+"""
+
+import argparse
+import json
+import random
+import re
+import threading
+import time
+import uuid
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+PREFIX = "/api/public/v1"
+PAGE_LIMIT = 100
+
+
+class MockStore:
+    """Tables and rows kept in memory, shared by all handler threads"""
+
+    def __init__(self, error_rate: float = 0.0, latency: float = 0.0, late_error_rate: float = 0.0):
+        self.lock = threading.Lock()
+        self.tables = {}  # table id -> table definition
+        self.rows = {}  # table id -> {row id: row}
+        self.error_rate = error_rate
+        self.latency = latency
+        self.late_error_rate = late_error_rate
+        self.requests = 0
+        self.injected_errors = 0
+
+
+class Handler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"  # keep-alive, like the real API
+    store: MockStore = None
+
+    def log_message(self, format, *args):
+        pass
+
+    def _reply(self, status: int, body: dict, headers: dict = None):
+        data = json.dumps(body).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(data)))
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
+        self.end_headers()
+        self.wfile.write(data)
+
+    def _body(self) -> dict:
+        length = int(self.headers.get("Content-Length") or 0)
+        return json.loads(self.rfile.read(length) or b"{}")
+
+    def _dispatch(self, method: str):
+        store = self.store
+        body = self._body()
+        with store.lock:
+            store.requests += 1
+        if store.latency:
+            time.sleep(store.latency)
+        if not self.headers.get("x-budibase-api-key") or not self.headers.get("x-budibase-app-id"):
+            return self._reply(403, {"message": "Missing API key or app ID"})
+        if random.random() < store.error_rate:
+            with store.lock:
+                store.injected_errors += 1
+            if random.random() < 0.5:
+                return self._reply(429, {"message": "Too many requests"}, {"Retry-After": "0"})
+            return self._reply(503, {"message": "Service unavailable"})
+
+        path = self.path.split("?")[0]
+        if not path.startswith(PREFIX):
+            return self._reply(404, {"message": "Not found"})
+        path = path[len(PREFIX):]
+
+        with store.lock:
+            if method == "POST" and path == "/tables":
+                if any(t["name"] == body.get("name") for t in store.tables.values()):
+                    return self._reply(400, {"message": "Table name already in use"})
+                table = {**body, "_id": f"ta_{uuid.uuid4().hex}"}
+                store.tables[table["_id"]] = table
+                store.rows[table["_id"]] = {}
+                return self._reply(200, {"data": table})
+            if method == "POST" and path == "/tables/search":
+                name = body.get("name", "").lower()
+                return self._reply(200, {"data": [t for t in store.tables.values() if t["name"].lower().startswith(name)]})
+
+            match = re.fullmatch(r"/tables/([^/]+)", path)
+            if method == "PUT" and match:
+                if match.group(1) not in store.tables:
+                    return self._reply(404, {"message": "Table not found"})
+                store.tables[match.group(1)] = {**body, "_id": match.group(1)}
+                return self._reply(200, {"data": store.tables[match.group(1)]})
+
+            match = re.fullmatch(r"/tables/([^/]+)/rows(/search|/[^/]+)?", path)
+            if not match or match.group(1) not in store.tables:
+                return self._reply(404, {"message": "Not found"})
+            rows = store.rows[match.group(1)]
+            suffix = match.group(2)
+
+            if method == "POST" and suffix is None:
+                row = {**body, "_id": f"ro_{uuid.uuid4().hex}", "tableId": match.group(1)}
+                rows[row["_id"]] = row
+                if random.random() < store.late_error_rate:
+                    # Written, but the gateway reports a failure
+                    store.injected_errors += 1
+                    return self._reply(502, {"message": "Bad gateway"})
+                return self._reply(200, {"data": row})
+            if method == "POST" and suffix == "/search":
+                return self._search(rows, body)
+            row_id = (suffix or "/")[1:]
+            if row_id not in rows:
+                return self._reply(404, {"message": "Row not found"})
+            if method == "PUT":
+                rows[row_id] = {**rows[row_id], **body, "_id": row_id}
+                return self._reply(200, {"data": rows[row_id]})
+            if method == "DELETE":
+                return self._reply(200, {"data": rows.pop(row_id)})
+        return self._reply(405, {"message": "Method not allowed"})
+
+    def _search(self, rows: dict, body: dict):
+        """Paginated like the real API: limit, bookmark (page offset) and hasNextPage"""
+        items = [row for row in rows.values() if _matches(row, body.get("query") or {})]
+        limit = min(int(body.get("limit") or PAGE_LIMIT), PAGE_LIMIT)
+        start = int(body.get("bookmark") or 0)
+        page = items[start:start + limit]
+        has_next = start + limit < len(items)
+        return self._reply(200, {
+            "data": page,
+            "hasNextPage": has_next,
+            "bookmark": start + limit if has_next else None,
+        })
+
+    def do_POST(self):
+        self._dispatch("POST")
+
+    def do_PUT(self):
+        self._dispatch("PUT")
+
+    def do_DELETE(self):
+        self._dispatch("DELETE")
+
+
+def _matches(row: dict, query: dict) -> bool:
+    """The equal, notEqual, string (prefix) and range filters of the search API"""
+    for field, value in query.get("equal", {}).items():
+        if row.get(field) != value:
+            return False
+    for field, value in query.get("notEqual", {}).items():
+        if row.get(field) == value:
+            return False
+    for field, value in query.get("string", {}).items():
+        if not str(row.get(field, "")).lower().startswith(str(value).lower()):
+            return False
+    for field, bounds in query.get("range", {}).items():
+        value = row.get(field)
+        if value is None or value < bounds.get("low", value) or value > bounds.get("high", value):
+            return False
+    return True
+
+
+def serve(port: int = 0, error_rate: float = 0.0, latency: float = 0.0, late_error_rate: float = 0.0):
+    """Start the mock in a background thread; returns (server, store, api_base)"""
+    store = MockStore(error_rate, latency, late_error_rate)
+    handler = type("BoundHandler", (Handler,), {"store": store})
+    server = ThreadingHTTPServer(("127.0.0.1", port), handler)
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server, store, f"http://127.0.0.1:{server.server_address[1]}{PREFIX}"
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Run a local mock of the Budibase Public API")
+    parser.add_argument("--port", type=int, default=4001, help="Port to listen on")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="Share of requests answered with 429/503")
+    parser.add_argument("--latency", type=float, default=0.0, help="Seconds added to every request")
+    parser.add_argument("--late-error-rate", type=float, default=0.0,
+                        help="Share of row creates that are written and then answered with 502")
+    args = parser.parse_args()
+
+    server, store, api_base = serve(args.port, args.error_rate, args.latency, args.late_error_rate)
+    print(f"Mock Budibase API at {api_base} (Ctrl+C to stop)")
+    try:
+        while True:
+            time.sleep(1)
+    except KeyboardInterrupt:
+        print(f"\n{store.requests} requests, {store.injected_errors} injected errors")
+        server.shutdown()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,366 @@
+#!/usr/bin/env python3
+"""
+Two-way reconciliation between Budibase and ESG_METRICS
+Both sides can be edited (Budibase UI and the Streamlit app). This job
+streams both, skips rows whose hash matches the persisted index, and
+three-way merges the rest field by field against the last reconciled
+values:
+  - a field changed on one side only is copied to the other side
+  - a field changed differently on both sides is a conflict, reported and
+    left alone unless --prefer picks a winner
+Snowflake-side changes are loaded into a STAGING table and applied to PROD
+with a single MERGE.
+
+Snowflake rows are hashed in the warehouse (HASH over the synced columns), so
+only changed rows are downloaded. Budibase has no server-side hash, so its
+rows are streamed and hashed locally.
+
+Usage:
+    python reconcile_esg.py --api-key YOUR_KEY --app-id YOUR_APP_ID --connection default --dry-run
+    python reconcile_esg.py ... --prefer snowflake
+"""
+
+import argparse
+import hashlib
+import json
+import os
+import sys
+
+import pandas as pd
+
+from setup_esg_app import API_BASE, BudibaseAPI
+from bulk_load import FIELD_TYPES, clean_row
+from sync_esg import connect, fallback_key, row_key, unkeyed_error
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+
+from utils.schema import COLUMN_TYPES  # noqa: E402
+
+DEFAULT_INDEX = os.path.join(os.path.dirname(__file__), ".reconcile_index.json")
+
+PROD_TABLE = "ESG_REPORTING.PROD.ESG_METRICS"
+STAGING_TABLE = "ESG_REPORTING.STAGING.ESG_METRICS_RECONCILE"
+
+# Columns both systems hold, in DDL order
+SYNC_FIELDS = [c for c in COLUMN_TYPES if c in FIELD_TYPES]
+
+# Rows fetched per keyed SELECT
+FETCH_CHUNK = 500
+
+
+def canonical(values: dict) -> dict:
+    """Field values normalized so both sides compare (and hash) equal
+
+    DECIMALs are rounded to their DDL scale, dates are YYYY-MM-DD and
+    missing fields are None.
+    """
+    out = {}
+    for field in SYNC_FIELDS:
+        value = values.get(field)
+        kind = COLUMN_TYPES[field]
+        if value is None or value == "":
+            value = None
+        elif kind[0] == "DECIMAL":
+            value = round(float(value), kind[2])
+        elif kind[0] == "INTEGER":
+            value = int(value)
+        elif kind[0] == "BOOLEAN":
+            value = bool(value)
+        elif kind[0] == "DATE":
+            value = str(value)[:10]
+        else:
+            value = str(value)
+        out[field] = value
+    return out
+
+
+def row_hash(values: dict) -> str:
+    return hashlib.sha256(json.dumps(values, sort_keys=True, default=str).encode("utf-8")).hexdigest()
+
+
+class ReconcileIndex:
+    """Per key: Budibase row ID, last seen hash on each side and the merged base values"""
+
+    def __init__(self, path: str):
+        self.path = path
+        self.data = {"table_id": None, "key": None, "rows": {}}
+        if os.path.exists(path):
+            with open(path, encoding="utf-8") as f:
+                self.data.update(json.load(f))
+
+    @property
+    def rows(self) -> dict:
+        return self.data["rows"]
+
+    def matches(self, table_id: str, key: list) -> bool:
+        return self.data["table_id"] == table_id and self.data["key"] == key
+
+    def reset(self, table_id: str, key: list):
+        self.data = {"table_id": table_id, "key": key, "rows": {}}
+
+    def save(self):
+        tmp = f"{self.path}.tmp"
+        with open(tmp, "w", encoding="utf-8") as f:
+            json.dump(self.data, f, separators=(",", ":"))
+        os.replace(tmp, self.path)
+
+
+def snowflake_hashes(session, key: list) -> dict:
+    """key -> HASH of the synced columns, computed in the warehouse and streamed"""
+    sql = f"SELECT {', '.join(key)}, HASH({', '.join(SYNC_FIELDS)}) AS ROW_HASH FROM {PROD_TABLE}"
+    return {row_key(r.asDict(), key): str(r["ROW_HASH"]) for r in session.sql(sql).to_local_iterator()}
+
+
+def _keyed_select(session, key: list, keys: list, select: str):
+    """Rows of PROD for the given keys, fetched in chunks with bound key values"""
+    wanted = [k.split("|") for k in keys]
+    tuple_sql = "(" + ", ".join("?" for _ in key) + ")"
+    for start in range(0, len(wanted), FETCH_CHUNK):
+        chunk = wanted[start:start + FETCH_CHUNK]
+        sql = (f"SELECT {select} FROM {PROD_TABLE} "
+               f"WHERE ({', '.join(key)}) IN ({', '.join(tuple_sql for _ in chunk)})")
+        params = [_key_param(c, v) for parts in chunk for c, v in zip(key, parts)]
+        yield from session.sql(sql, params=params).collect()
+
+
+def snowflake_rows(session, key: list, keys: list) -> dict:
+    """Full canonical rows for the given keys"""
+    rows = {}
+    for r in _keyed_select(session, key, keys, ", ".join(SYNC_FIELDS)):
+        values = canonical(r.asDict())
+        rows[row_key(values, key)] = values
+    return rows
+
+
+def snowflake_hashes_for(session, key: list, keys: list) -> dict:
+    """Current warehouse hashes for just these keys"""
+    select = f"{', '.join(key)}, HASH({', '.join(SYNC_FIELDS)}) AS ROW_HASH"
+    return {row_key(r.asDict(), key): str(r["ROW_HASH"]) for r in _keyed_select(session, key, keys, select)}
+
+
+def _key_param(column: str, value: str):
+    return int(value) if COLUMN_TYPES.get(column, ("ANY",))[0] == "INTEGER" else value
+
+
+def budibase_rows(api: BudibaseAPI, table_id: str, key: list, defaults: dict = None) -> tuple:
+    """(rows, unkeyed) from every Budibase row
+
+    rows maps key -> (row ID, canonical values, hash, key columns filled from
+    defaults); unkeyed counts rows with only part of the key.
+    """
+    defaults = defaults or {}
+    rows, unkeyed = {}, 0
+    for row in api.iter_rows(table_id, prefetch=True):
+        values = canonical(clean_row(row))
+        k = fallback_key(values, key, defaults)
+        if k is None:
+            unkeyed += any(values.get(c) is not None for c in key)
+            continue
+        filled = [c for c in key if values[c] is None]
+        values.update({c: defaults[c] for c in filled})
+        rows[k] = (row["_id"], values, row_hash(values), filled)
+    return rows, unkeyed
+
+
+def merge_fields(base: dict, sf: dict, bb: dict, prefer: str = None) -> tuple:
+    """Three-way merge of one row; returns (merged values, conflicting fields)"""
+    merged, conflicts = {}, []
+    for field in SYNC_FIELDS:
+        s, b = sf.get(field), bb.get(field)
+        o = base.get(field) if base else None
+        if s == b:
+            merged[field] = s
+        elif base is not None and s == o:
+            merged[field] = b
+        elif base is not None and b == o:
+            merged[field] = s
+        else:
+            conflicts.append((field, o, s, b))
+            # Unresolved conflicts keep the base value, so they are reported again next run
+            merged[field] = {"snowflake": s, "budibase": b}.get(prefer, o)
+    return merged, conflicts
+
+
+class Plan:
+    def __init__(self):
+        self.to_budibase = []  # (key, row ID or None, fields); None creates
+        self.to_snowflake = []  # (key, full values)
+        self.delete_budibase = []  # (key, row ID)
+        self.delete_snowflake = []  # key
+        self.conflicts = []  # (key, [(field, base, snowflake, budibase)])
+        self.merged = {}  # key -> new base values for the index
+        self.unresolved = set()  # keys whose conflicting fields were left alone
+        self.gone = []  # keys deleted on both sides
+
+
+def plan(index: ReconcileIndex, sf_hashes: dict, sf_full: dict, bb: dict, prefer: str = None) -> Plan:
+    """Decide every write from the changed rows on each side and the index"""
+    result = Plan()
+    known = index.rows
+    keys = set(sf_hashes) | set(bb) | set(known)
+    for k in sorted(keys):
+        entry = known.get(k)
+        base = entry["base"] if entry else None
+        in_sf, in_bb = k in sf_hashes, k in bb
+        sf_changed = in_sf and (entry is None or sf_hashes[k] != entry["sf_hash"])
+        bb_changed = in_bb and (entry is None or bb[k][2] != entry["bb_hash"])
+
+        if not in_sf and not in_bb:
+            result.gone.append(k)
+            continue
+        if not in_bb:
+            if entry is None:
+                result.to_budibase.append((k, None, sf_full[k]))
+                result.merged[k] = sf_full[k]
+            elif sf_changed:
+                result.conflicts.append((k, [("<row>", "deleted in Budibase", "changed", None)]))
+            else:
+                result.delete_snowflake.append(k)
+            continue
+        if not in_sf:
+            if entry is None:
+                result.to_snowflake.append((k, bb[k][1]))
+                result.merged[k] = bb[k][1]
+                if bb[k][3]:
+                    result.to_budibase.append((k, bb[k][0], {f: bb[k][1][f] for f in bb[k][3]}))
+            elif bb_changed:
+                result.conflicts.append((k, [("<row>", "deleted in Snowflake", None, "changed")]))
+            else:
+                result.delete_budibase.append((k, bb[k][0]))
+            continue
+        if not sf_changed and not bb_changed:
+            continue  # the common case: both hashes match the index
+
+        sf_values = sf_full[k] if sf_changed else base
+        bb_values = bb[k][1]
+        merged, conflicts = merge_fields(base, sf_values, bb_values, prefer)
+        skip = set()
+        if conflicts:
+            result.conflicts.append((k, conflicts))
+            if prefer is None:
+                skip = {field for field, *_ in conflicts}
+                result.unresolved.add(k)
+        # Key columns filled from defaults are written, so the row holds them from now on
+        bb_diff = {f: v for f, v in merged.items()
+                   if f not in skip and (bb_values.get(f) != v or f in bb[k][3])}
+        if bb_diff:
+            result.to_budibase.append((k, bb[k][0], bb_diff))
+        sf_target = {**sf_values, **{f: v for f, v in merged.items() if f not in skip}}
+        if sf_target != sf_values:
+            result.to_snowflake.append((k, sf_target))
+        result.merged[k] = merged
+    return result
+
+
+def _sql_type(column: str) -> str:
+    kind = COLUMN_TYPES[column]
+    if kind[0] == "DECIMAL":
+        return f"DECIMAL({kind[1]},{kind[2]})"
+    if kind[0] == "VARCHAR":
+        return f"VARCHAR({kind[1]})"
+    return kind[0]
+
+
+def merge_into_snowflake(session, key: list, upserts: list, deletes: list):
+    """Load every Snowflake-side change into STAGING, then apply them with one MERGE"""
+    columns = ", ".join(f"{c} {_sql_type(c)}" for c in SYNC_FIELDS)
+    session.sql(f"CREATE OR REPLACE TRANSIENT TABLE {STAGING_TABLE} (ACTION VARCHAR(10), {columns})").collect()
+    records = [{"ACTION": "UPSERT", **values} for _, values in upserts]
+    records += [{"ACTION": "DELETE", **dict(zip(key, (_key_param(c, v) for c, v in zip(key, k.split("|")))))}
+                for k in deletes]
+    frame = pd.DataFrame(records, columns=["ACTION", *SYNC_FIELDS])
+    database, schema, table = STAGING_TABLE.split(".")
+    session.write_pandas(frame, table, database=database, schema=schema, quote_identifiers=False)
+
+    on = " AND ".join(f"t.{c} = s.{c}" for c in key)
+    updates = ", ".join(f"{c} = s.{c}" for c in SYNC_FIELDS if c not in key)
+    session.sql(f"""MERGE INTO {PROD_TABLE} t USING {STAGING_TABLE} s ON {on}
+        WHEN MATCHED AND s.ACTION = 'DELETE' THEN DELETE
+        WHEN MATCHED THEN UPDATE SET {updates},
+            UPDATED_BY = 'BUDIBASE_RECONCILE', UPDATED_AT = CURRENT_TIMESTAMP()
+        WHEN NOT MATCHED AND s.ACTION = 'UPSERT' THEN INSERT ({', '.join(SYNC_FIELDS)})
+            VALUES ({', '.join(f's.{c}' for c in SYNC_FIELDS)})""").collect()
+
+
+def print_plan(result: Plan):
+    print(f"{len(result.to_budibase)} Budibase writes, {len(result.delete_budibase)} Budibase deletes, "
+          f"{len(result.to_snowflake)} Snowflake upserts, {len(result.delete_snowflake)} Snowflake deletes, "
+          f"{len(result.conflicts)} rows with conflicts")
+    for k, row_id, fields in result.to_budibase:
+        print(f"  -> Budibase {'create' if row_id is None else 'update'} {k}: {', '.join(sorted(fields))}")
+    for k, _ in result.delete_budibase:
+        print(f"  -> Budibase delete {k}")
+    for k, _ in result.to_snowflake:
+        print(f"  -> Snowflake upsert {k}")
+    for k in result.delete_snowflake:
+        print(f"  -> Snowflake delete {k}")
+    for k, conflicts in result.conflicts:
+        for field, base, sf, bb in conflicts:
+            print(f"  !! {k} {field}: base={base!r} snowflake={sf!r} budibase={bb!r}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Reconcile ESG_METRICS between Snowflake and Budibase")
+    parser.add_argument("--api-key", required=True, help="Your Budibase API key")
+    parser.add_argument("--app-id", required=True, help="Your Budibase App ID (from URL)")
+    parser.add_argument("--api-base", default=API_BASE, help="Public API URL (e.g. a self-hosted or mock server)")
+    parser.add_argument("--connection", help="Snowflake connection name (default: the configured default)")
+    parser.add_argument("--table-id", help="Budibase table ID (default: look up ESG_METRICS)")
+    parser.add_argument("--key", default="ORG_ID,REPORT_YEAR", help="Comma-separated key columns")
+    parser.add_argument("--default-org-id", type=int, help="ORG_ID for Budibase rows that have none")
+    parser.add_argument("--index", default=DEFAULT_INDEX, help="Hash index file")
+    parser.add_argument("--prefer", choices=["snowflake", "budibase"], help="Resolve conflicts for this side")
+    parser.add_argument("--dry-run", action="store_true", help="Print the plan without writing anything")
+    args = parser.parse_args()
+
+    key = [c.strip().upper() for c in args.key.split(",")]
+    defaults = {"ORG_ID": args.default_org_id} if args.default_org_id is not None else {}
+    session = connect(args.connection)
+    index = ReconcileIndex(args.index)
+
+    with BudibaseAPI(args.api_key, args.app_id, api_base=args.api_base) as api:
+        table_id = args.table_id or index.data["table_id"] or api.find_table("ESG_METRICS")
+        if table_id is None:
+            sys.exit("ESG_METRICS table not found in Budibase (run setup_esg_app.py first)")
+        if not index.matches(table_id, key):
+            index.reset(table_id, key)
+
+        sf_hashes = snowflake_hashes(session, key)
+        bb, unkeyed = budibase_rows(api, table_id, key, defaults)
+        if unkeyed:
+            sys.exit(unkeyed_error(unkeyed, key))
+        changed = [k for k, h in sf_hashes.items() if k not in index.rows or index.rows[k]["sf_hash"] != h]
+        sf_full = snowflake_rows(session, key, changed)
+        result = plan(index, sf_hashes, sf_full, bb, args.prefer)
+        print_plan(result)
+        if args.dry_run:
+            return
+
+        if result.to_snowflake or result.delete_snowflake:
+            merge_into_snowflake(session, key, result.to_snowflake, result.delete_snowflake)
+        created = {}
+        for k, row_id, fields in result.to_budibase:
+            if row_id is None:
+                created[k] = api.create_row(table_id, {f: v for f, v in fields.items() if v is not None})["data"]["_id"]
+            else:
+                api.update_row(table_id, row_id, fields)
+        for _, row_id in result.delete_budibase:
+            api.delete_row(table_id, row_id)
+
+        # Record what both sides now hold; Snowflake hashes are re-read only for rows just merged
+        for k in [k for k, _ in result.delete_budibase] + result.delete_snowflake + result.gone:
+            index.rows.pop(k, None)
+        written = [k for k, _ in result.to_snowflake]
+        fresh = snowflake_hashes_for(session, key, written) if written else {}
+        for k, merged in result.merged.items():
+            row_id = created.get(k) or (bb[k][0] if k in bb else index.rows[k]["_id"])
+            # Rows left in conflict get no Snowflake hash, so they are re-read next run
+            sf_hash = None if k in result.unresolved else fresh.get(k, sf_hashes.get(k))
+            index.rows[k] = {"_id": row_id, "sf_hash": sf_hash,
+                             "bb_hash": row_hash(merged), "base": merged}
+        index.save()
+        print("Reconciliation complete")
+
+
+if __name__ == "__main__":
+    main()
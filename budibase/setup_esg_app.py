@@ -11,19 +11,47 @@ Usage:
 """
 
 import requests
+import hashlib
 import json
+import os
 import argparse
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
 from datetime import date
 
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+
 # Budibase Cloud API base URL
 API_BASE = "https://budibase.app/api/public/v1"
 
+# (connect, read) seconds per request
+DEFAULT_TIMEOUT = (5, 30)
+
+# Rate limiting and transient server errors are retried with backoff
+RETRY_STATUSES = (429, 500, 502, 503, 504)
+
+# The only statuses that mean the request was turned away before it ran. After
+# a 500/502/504 a write may already have landed, so POST is not retried on those.
+UNAPPLIED_STATUSES = (429, 503)
+NON_IDEMPOTENT_METHODS = ("POST", "PATCH")
+
+# Rows per search request (the server caps this)
+PAGE_SIZE = 100
+
+# Table IDs and schema digests from earlier runs, per app
+PROVISION_CACHE = os.path.join(os.path.dirname(os.path.abspath(__file__)), ".budibase_provision.json")
+
 # ESG Metrics table schema matching Snowflake structure
 ESG_METRICS_SCHEMA = {
     "name": "ESG_METRICS",
     "primaryDisplay": "REPORT_YEAR",
     "schema": {
         # Report Info
+        "ORG_ID": {
+            "name": "ORG_ID",
+            "type": "number",
+            "constraints": {"presence": True}
+        },
         "REPORT_YEAR": {
             "name": "REPORT_YEAR",
             "type": "number",
@@ -352,6 +380,7 @@ ESG_METRICS_SCHEMA = {
 
 # Sample data matching Snowflake insert
 SAMPLE_DATA = {
+    "ORG_ID": 1,
     "REPORT_YEAR": 2023,
     "REPORT_STATUS": "Submitted to SET",
     "SECTOR": "Technology",
@@ -430,94 +459,295 @@ SAMPLE_DATA = {
 }
 
 
+class _Retry(Retry):
+    """Retry that never repeats a POST or PATCH the server may already have applied"""
+
+    def is_retry(self, method: str, status_code: int, has_retry_after: bool = False) -> bool:
+        if method.upper() in NON_IDEMPOTENT_METHODS and status_code not in UNAPPLIED_STATUSES:
+            return False
+        return super().is_retry(method, status_code, has_retry_after)
+
+
 class BudibaseAPI:
-    def __init__(self, api_key: str, app_id: str):
+    """Budibase Public API client
+
+    All calls share one requests.Session, so connections are kept alive and
+    pooled (pool_size should be at least the bulk-load concurrency). 429 and
+    503 responses are retried with exponential backoff, honouring
+    Retry-After; other 5xx responses only for idempotent methods, so a row
+    create is never sent twice. Every request has a timeout.
+    """
+
+    def __init__(self, api_key: str, app_id: str, api_base: str = API_BASE,
+                 timeout: float = DEFAULT_TIMEOUT, retries: int = 5, backoff: float = 0.5,
+                 pool_size: int = 16):
         self.api_key = api_key
         self.app_id = app_id
+        self.api_base = api_base.rstrip("/")
+        self.timeout = timeout
         self.headers = {
             "x-budibase-api-key": api_key,
             "x-budibase-app-id": app_id,
             "Content-Type": "application/json"
         }
+        retry = _Retry(
+            total=retries,
+            read=0,  # a timed-out POST may already have been applied
+            backoff_factor=backoff,
+            status_forcelist=RETRY_STATUSES,
+            allowed_methods=None,  # every method; _Retry limits POST/PATCH to UNAPPLIED_STATUSES
+            respect_retry_after_header=True,
+            raise_on_status=False,
+        )
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=pool_size, max_retries=retry)
+        self.session = requests.Session()
+        self.session.headers.update(self.headers)
+        self.session.mount("https://", adapter)
+        self.session.mount("http://", adapter)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def close(self):
+        self.session.close()
+
+    def _request(self, method: str, path: str, payload: dict = None) -> dict:
+        response = self.session.request(method, f"{self.api_base}{path}", json=payload, timeout=self.timeout)
+        response.raise_for_status()
+        return response.json()
 
     def create_table(self, schema: dict) -> dict:
         """Create a table with the given schema"""
-        url = f"{API_BASE}/tables"
-        response = requests.post(url, headers=self.headers, json=schema)
-        response.raise_for_status()
-        return response.json()
+        return self._request("POST", "/tables", schema)
 
-    def get_tables(self) -> dict:
+    def _paginate(self, path: str, body: dict, prefetch: bool = False):
+        """Yield items from a search endpoint, following bookmark/hasNextPage
+
+        prefetch=True requests the next page on a background thread while the
+        caller is still consuming the current one.
+        """
+        def fetch(bookmark):
+            page_body = dict(body) if bookmark is None else {**body, "bookmark": bookmark}
+            return self._request("POST", path, page_body)
+
+        pool = ThreadPoolExecutor(max_workers=1) if prefetch else None
+        try:
+            page = fetch(None)
+            while True:
+                bookmark = page.get("bookmark")
+                more = bool(page.get("hasNextPage")) and bookmark is not None
+                upcoming = pool.submit(fetch, bookmark) if more and pool else None
+                yield from page.get("data", [])
+                if not more:
+                    return
+                page = upcoming.result() if upcoming else fetch(bookmark)
+        finally:
+            if pool:
+                pool.shutdown(cancel_futures=True)
+
+    def iter_tables(self, name: str = None):
+        """Yield every table in the app (optionally only those matching name)"""
+        body = {"paginate": True}
+        if name:
+            body["name"] = name
+        yield from self._paginate("/tables/search", body)
+
+    def get_tables(self, name: str = None) -> dict:
         """List all tables in the app"""
-        url = f"{API_BASE}/tables/search"
-        response = requests.post(url, headers=self.headers, json={})
-        response.raise_for_status()
-        return response.json()
+        return {"data": list(self.iter_tables(name))}
+
+    def find_table_definition(self, name: str) -> dict:
+        """Return the table with this name (including its schema), or None"""
+        for table in self.iter_tables(name):
+            if table["name"] == name:
+                return table
+        return None
+
+    def find_table(self, name: str) -> str:
+        """Return the ID of the table with this name, or None"""
+        table = self.find_table_definition(name)
+        return table["_id"] if table else None
+
+    def update_table(self, table_id: str, schema: dict) -> dict:
+        """Replace a table definition (name, primaryDisplay and field schema)"""
+        return self._request("PUT", f"/tables/{table_id}", schema)
 
     def create_row(self, table_id: str, data: dict) -> dict:
         """Create a row in the specified table"""
-        url = f"{API_BASE}/tables/{table_id}/rows"
-        response = requests.post(url, headers=self.headers, json=data)
-        response.raise_for_status()
-        return response.json()
-
-    def get_rows(self, table_id: str) -> dict:
-        """Get all rows from a table"""
-        url = f"{API_BASE}/tables/{table_id}/rows/search"
-        response = requests.post(url, headers=self.headers, json={})
-        response.raise_for_status()
-        return response.json()
+        return self._request("POST", f"/tables/{table_id}/rows", data)
+
+    def create_rows(self, table_id: str, rows, concurrency: int = 8, on_progress=None) -> tuple:
+        """Create many rows concurrently over the pooled session
+
+        The public API has no bulk endpoint, so rows are posted one per
+        request from a bounded thread pool. on_progress(done, failed) is
+        called after every row. Returns (created rows, [(index, error)]).
+        """
+        created, failures = [], []
+
+        def collect(futures):
+            for future in futures:
+                try:
+                    created.append(future.result()["data"])
+                except (requests.exceptions.RequestException, KeyError, ValueError) as e:
+                    failures.append((pending.pop(future), e))
+                else:
+                    del pending[future]
+                if on_progress:
+                    on_progress(len(created), len(failures))
+
+        with ThreadPoolExecutor(max_workers=concurrency) as pool:
+            pending = {}  # future -> input row index
+            for index, row in enumerate(rows):
+                # Keep at most 2x concurrency requests queued so huge inputs stream
+                if len(pending) >= concurrency * 2:
+                    collect(wait(pending, return_when=FIRST_COMPLETED).done)
+                pending[pool.submit(self.create_row, table_id, row)] = index
+            collect(list(pending))
+        return created, failures
+
+    def iter_rows(self, table_id: str, query: dict = None, fields: list = None, page_size: int = PAGE_SIZE,
+                  sort: dict = None, prefetch: bool = False):
+        """Yield rows page by page instead of buffering the whole table
+
+        query is a Budibase search filter, e.g. {"equal": {"REPORT_YEAR": 2023}}
+        or {"range": {"REPORT_YEAR": {"low": 2020, "high": 2024}}}, applied on
+        the server. The Public API has no projection, so fields (plus _id) is
+        applied to each row as it arrives.
+        """
+        body = {"paginate": True, "limit": page_size}
+        if query:
+            body["query"] = query
+        if sort:
+            body["sort"] = sort
+        keep = ("_id", *fields) if fields else None
+        for row in self._paginate(f"/tables/{table_id}/rows/search", body, prefetch):
+            yield {k: row[k] for k in keep if k in row} if keep else row
+
+    def get_rows(self, table_id: str, query: dict = None) -> dict:
+        """Get all rows from a table (every page)"""
+        return {"data": list(self.iter_rows(table_id, query))}
 
     def update_row(self, table_id: str, row_id: str, data: dict) -> dict:
         """Update a row"""
-        url = f"{API_BASE}/tables/{table_id}/rows/{row_id}"
-        response = requests.put(url, headers=self.headers, json=data)
-        response.raise_for_status()
-        return response.json()
+        return self._request("PUT", f"/tables/{table_id}/rows/{row_id}", data)
 
     def delete_row(self, table_id: str, row_id: str) -> dict:
         """Delete a row"""
-        url = f"{API_BASE}/tables/{table_id}/rows/{row_id}"
-        response = requests.delete(url, headers=self.headers)
-        response.raise_for_status()
-        return response.json()
+        return self._request("DELETE", f"/tables/{table_id}/rows/{row_id}")
+
+
+def schema_digest(schema: dict) -> str:
+    """Stable hash of a table definition"""
+    return hashlib.sha256(json.dumps(schema, sort_keys=True).encode("utf-8")).hexdigest()
+
+
+def field_diff(current: dict, wanted: dict) -> tuple:
+    """(added, changed, removed) field names between two table schemas"""
+    added = [f for f in wanted if f not in current]
+    changed = [f for f in wanted if f in current and current[f] != wanted[f]]
+    removed = [f for f in current if f not in wanted]
+    return added, changed, removed
+
+
+def _load_provision_cache(path: str) -> dict:
+    if os.path.exists(path):
+        with open(path, encoding="utf-8") as f:
+            return json.load(f)
+    return {}
+
+
+def _save_provision_cache(path: str, cache: dict):
+    tmp = f"{path}.tmp"
+    with open(tmp, "w", encoding="utf-8") as f:
+        json.dump(cache, f, indent=1)
+    os.replace(tmp, path)
+
+
+def provision_table(api: BudibaseAPI, schema: dict, cache_path: str = PROVISION_CACHE,
+                    prune: bool = False) -> tuple:
+    """Make sure the table exists with this schema; returns (table ID, action)
+
+    The table ID, schema digest and last applied schema are cached per app.
+    If the digest is unchanged no API call is made. Otherwise only the
+    field-level difference is applied. Fields missing from the wanted schema
+    are kept unless prune=True, because dropping a field deletes its data.
+    action is "unchanged", "created" or "updated".
+    """
+    cache = _load_provision_cache(cache_path)
+    cache_key = f"{api.api_base}|{api.app_id}|{schema['name']}"
+    digest = schema_digest(schema)
+    entry = cache.get(cache_key)
+    if entry and entry["digest"] == digest and not (prune and set(entry["table"]["schema"]) - set(schema["schema"])):
+        return entry["table_id"], "unchanged"
+
+    if entry:
+        current = {**entry["table"], "_id": entry["table_id"]}
+    else:
+        current = api.find_table_definition(schema["name"])
+
+    if current is None:
+        table_id = api.create_table(schema)["data"]["_id"]
+        applied = schema
+        action = "created"
+    else:
+        table_id = current["_id"]
+        added, changed, removed = field_diff(current.get("schema", {}), schema["schema"])
+        fields = {**current.get("schema", {}), **schema["schema"]}
+        if prune:
+            fields = {f: v for f, v in fields.items() if f not in removed}
+        applied = {**schema, "schema": fields}
+        action = "unchanged"
+        if any(current.get(k) != v for k, v in applied.items()):
+            try:
+                api.update_table(table_id, {**applied, "_id": table_id})
+            except requests.exceptions.HTTPError as e:
+                if e.response.status_code != 404:
+                    raise
+                # The cached table was deleted in Budibase; start over
+                cache.pop(cache_key, None)
+                _save_provision_cache(cache_path, cache)
+                return provision_table(api, schema, cache_path, prune)
+            action = "updated"
+            print(f"    Schema diff: {len(added)} added, {len(changed)} changed, "
+                  f"{len(removed) if prune else 0} removed"
+                  + (f" ({len(removed)} extra kept)" if removed and not prune else ""))
+
+    # Remember what Budibase now holds, including fields kept without prune
+    cache[cache_key] = {"table_id": table_id, "digest": digest,
+                        "table": {k: applied[k] for k in ("name", "primaryDisplay", "schema") if k in applied}}
+    _save_provision_cache(cache_path, cache)
+    return table_id, action
 
 
 def main():
     parser = argparse.ArgumentParser(description="Set up ESG app in Budibase")
     parser.add_argument("--api-key", required=True, help="Your Budibase API key")
     parser.add_argument("--app-id", required=True, help="Your Budibase App ID (from URL)")
+    parser.add_argument("--api-base", default=API_BASE, help="Public API URL (e.g. a self-hosted or mock server)")
     parser.add_argument("--skip-sample-data", action="store_true", help="Skip inserting sample data")
+    parser.add_argument("--prune-fields", action="store_true", help="Drop Budibase fields no longer in the schema")
+    parser.add_argument("--cache", default=PROVISION_CACHE, help="Provisioning cache file")
     args = parser.parse_args()
 
-    api = BudibaseAPI(args.api_key, args.app_id)
+    api = BudibaseAPI(args.api_key, args.app_id, api_base=args.api_base)
 
     print("=" * 60)
     print("SET ESG One Report (Form 56-1) - Budibase Setup")
     print("=" * 60)
 
-    # Step 1: Create ESG_METRICS table
-    print("\n[1/3] Creating ESG_METRICS table...")
-    try:
-        result = api.create_table(ESG_METRICS_SCHEMA)
-        table_id = result["data"]["_id"]
-        print(f"    Table created: {table_id}")
-    except requests.exceptions.HTTPError as e:
-        if e.response.status_code == 400:
-            print("    Table may already exist, searching...")
-            tables = api.get_tables()
-            for t in tables.get("data", []):
-                if t["name"] == "ESG_METRICS":
-                    table_id = t["_id"]
-                    print(f"    Found existing table: {table_id}")
-                    break
-            else:
-                raise Exception("Could not find or create ESG_METRICS table")
-        else:
-            raise
-
-    # Step 2: Insert sample data
-    if not args.skip_sample_data:
+    # Step 1: Create or update the ESG_METRICS table
+    print("\n[1/3] Provisioning ESG_METRICS table...")
+    table_id, action = provision_table(api, ESG_METRICS_SCHEMA, args.cache, args.prune_fields)
+    print(f"    Table {action}: {table_id}")
+
+    # Step 2: Insert sample data (only into a new table, so reruns stay no-ops)
+    if action != "created":
+        print("\n[2/3] Table already existed, sample data not inserted")
+    elif not args.skip_sample_data:
         print("\n[2/3] Inserting sample data (FY2023)...")
         try:
             row = api.create_row(table_id, SAMPLE_DATA)
@@ -552,14 +782,14 @@ Table ID: {table_id}
     print("=" * 60)
     print(f"""
 # Create row:
-curl -X POST "{API_BASE}/tables/{table_id}/rows" \\
+curl -X POST "{api.api_base}/tables/{table_id}/rows" \\
   -H "x-budibase-api-key: {args.api_key[:8]}..." \\
   -H "x-budibase-app-id: {args.app_id}" \\
   -H "Content-Type: application/json" \\
   -d '{{"REPORT_YEAR": 2024, "REPORT_STATUS": "Draft", ...}}'
 
 # Get all rows:
-curl -X POST "{API_BASE}/tables/{table_id}/rows/search" \\
+curl -X POST "{api.api_base}/tables/{table_id}/rows/search" \\
   -H "x-budibase-api-key: {args.api_key[:8]}..." \\
   -H "x-budibase-app-id: {args.app_id}" \\
   -H "Content-Type: application/json" \\
@@ -0,0 +1,228 @@
+#!/usr/bin/env python3
+"""
+Incremental Snowflake -> Budibase sync for ESG_METRICS
+Keeps a local checkpoint with the table fingerprint, an UPDATED_AT/CREATED_AT
+high-water mark and the Budibase row ID and last pushed values per key.
+Each run pulls only rows changed since the watermark and issues only the
+create/update/delete calls needed; if the fingerprint has not moved it makes
+no Budibase calls at all.
+
+Usage:
+    python sync_esg.py --api-key YOUR_KEY --app-id YOUR_APP_ID --connection default
+    python sync_esg.py ... --dry-run              # print the diff, change nothing
+    python sync_esg.py ... --key REPORT_YEAR      # a table without ORG_ID
+    python sync_esg.py ... --full --default-org-id 1  # after setup/04_migrate_organizations.sql
+"""
+
+import argparse
+import json
+import os
+import sys
+
+from setup_esg_app import API_BASE, BudibaseAPI
+from bulk_load import FIELD_TYPES, clean_row
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+
+from utils.database import FINGERPRINT_SQL, TABLE  # noqa: E402
+
+DEFAULT_CHECKPOINT = os.path.join(os.path.dirname(__file__), ".sync_checkpoint.json")
+
+CHANGED_SQL = f"""SELECT * FROM {TABLE}
+    WHERE UPDATED_AT >= CAST(? AS TIMESTAMP_NTZ) OR CREATED_AT >= CAST(? AS TIMESTAMP_NTZ)"""
+
+
+class Checkpoint:
+    """Sync state persisted as JSON next to this script"""
+
+    def __init__(self, path: str):
+        self.path = path
+        self.data = {"table_id": None, "key": None, "fingerprint": None, "watermark": None, "rows": {}}
+        if os.path.exists(path):
+            with open(path, encoding="utf-8") as f:
+                self.data.update(json.load(f))
+
+    @property
+    def rows(self) -> dict:
+        """key -> {"_id": Budibase row ID, "values": last pushed fields}"""
+        return self.data["rows"]
+
+    def matches(self, table_id: str, key: list) -> bool:
+        return self.data["table_id"] == table_id and self.data["key"] == key
+
+    def reset(self, table_id: str, key: list):
+        self.data = {"table_id": table_id, "key": key, "fingerprint": None, "watermark": None, "rows": {}}
+
+    def save(self):
+        # Write then rename, so an interrupted run never leaves half a checkpoint
+        tmp = f"{self.path}.tmp"
+        with open(tmp, "w", encoding="utf-8") as f:
+            json.dump(self.data, f, indent=1, default=str)
+        os.replace(tmp, self.path)
+
+
+def row_key(row: dict, key: list) -> str:
+    return "|".join(str(int(row[c]) if isinstance(row[c], float) else row[c]) for c in key)
+
+
+def fallback_key(row: dict, key: list, defaults: dict):
+    """row_key of a Budibase row, taking key columns it lacks from defaults
+
+    Rows created before ORG_ID existed match the Snowflake row of the default
+    organization instead of being skipped and duplicated. None when a key
+    column is missing and has no default.
+    """
+    values = {c: defaults.get(c) if row.get(c) is None else row[c] for c in key}
+    if any(v is None for v in values.values()):
+        return None
+    return row_key(values, key)
+
+
+def unkeyed_error(count: int, key: list) -> str:
+    return (f"{count} Budibase rows have only part of the key {','.join(key)}; pass --default-org-id "
+            "(the organization setup/04_migrate_organizations.sql assigned) so they are matched, not duplicated")
+
+
+def fingerprint(session) -> list:
+    row = session.sql(FINGERPRINT_SQL.format(table=TABLE)).collect()[0]
+    return [str(row["MAX_UPDATED_AT"]), str(row["MAX_CREATED_AT"]), int(row["ROW_COUNT"])]
+
+
+def index_budibase(api: BudibaseAPI, table_id: str, key: list, defaults: dict = None) -> tuple:
+    """Build the key -> row map from what is already in Budibase (first run only)
+
+    Returns (rows, unkeyed), unkeyed counting rows with only part of the key.
+    A key column filled from defaults is not in the row's values, so the
+    first sync writes it.
+    """
+    rows, unkeyed = {}, 0
+    for row in api.iter_rows(table_id, fields=list(FIELD_TYPES), prefetch=True):
+        k = fallback_key(row, key, defaults or {})
+        if k is not None:
+            rows[k] = {"_id": row["_id"], "values": clean_row(row)}
+        elif any(row.get(c) is not None for c in key):
+            unkeyed += 1
+    return rows, unkeyed
+
+
+def plan(session, checkpoint: Checkpoint, key: list) -> tuple:
+    """Return (creates, updates, deletes) needed to bring Budibase up to date
+
+    creates: [(key, fields)], updates: [(key, changed fields)], deletes: [key]
+    """
+    watermark = checkpoint.data["watermark"]
+    if watermark is None:
+        changed = session.sql(f"SELECT * FROM {TABLE}").collect()
+    else:
+        changed = session.sql(CHANGED_SQL, params=[watermark, watermark]).collect()
+
+    creates, updates = [], []
+    for row in changed:
+        values = clean_row(row.asDict())
+        k = row_key(values, key)
+        known = checkpoint.rows.get(k)
+        if known is None:
+            creates.append((k, values))
+            continue
+        # Fields that became NULL in Snowflake are cleared explicitly
+        diff = {f: v for f, v in values.items() if known["values"].get(f) != v}
+        diff.update({f: None for f in known["values"] if f not in values})
+        if diff:
+            updates.append((k, diff))
+
+    # Deletes are invisible to a watermark, so compare the (small) key column set
+    present = {row_key(r.asDict(), key) for r in session.sql(f"SELECT {', '.join(key)} FROM {TABLE}").collect()}
+    deletes = [k for k in checkpoint.rows if k not in present]
+    return creates, updates, deletes
+
+
+def print_diff(creates, updates, deletes, checkpoint: Checkpoint):
+    for k, values in creates:
+        print(f"  + {k}  create ({len(values)} fields)")
+    for k, diff in updates:
+        old = checkpoint.rows[k]["values"]
+        print(f"  ~ {k}  " + ", ".join(f"{f}: {old.get(f)!r} -> {v!r}" for f, v in sorted(diff.items())))
+    for k in deletes:
+        print(f"  - {k}  delete")
+
+
+def apply(api: BudibaseAPI, table_id: str, checkpoint: Checkpoint, creates, updates, deletes):
+    rows = checkpoint.rows
+    for k, values in creates:
+        created = api.create_row(table_id, values)["data"]
+        rows[k] = {"_id": created["_id"], "values": values}
+    for k, diff in updates:
+        api.update_row(table_id, rows[k]["_id"], diff)
+        values = {**rows[k]["values"], **diff}
+        rows[k]["values"] = {f: v for f, v in values.items() if v is not None}
+    for k in deletes:
+        api.delete_row(table_id, rows.pop(k)["_id"])
+
+
+def connect(connection: str = None):
+    """Snowpark session from a named connection in ~/.snowflake (the snow CLI config)"""
+    from snowflake.snowpark import Session
+
+    if connection:
+        return Session.builder.config("connection_name", connection).create()
+    return Session.builder.create()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Incrementally sync ESG_METRICS from Snowflake to Budibase")
+    parser.add_argument("--api-key", required=True, help="Your Budibase API key")
+    parser.add_argument("--app-id", required=True, help="Your Budibase App ID (from URL)")
+    parser.add_argument("--api-base", default=API_BASE, help="Public API URL (e.g. a self-hosted or mock server)")
+    parser.add_argument("--connection", help="Snowflake connection name (default: the configured default)")
+    parser.add_argument("--table-id", help="Budibase table ID (default: look up ESG_METRICS)")
+    parser.add_argument("--key", default="ORG_ID,REPORT_YEAR", help="Comma-separated key columns")
+    parser.add_argument("--default-org-id", type=int, help="ORG_ID for Budibase rows that have none")
+    parser.add_argument("--checkpoint", default=DEFAULT_CHECKPOINT, help="Checkpoint file")
+    parser.add_argument("--full", action="store_true", help="Ignore the checkpoint and re-index Budibase")
+    parser.add_argument("--dry-run", action="store_true", help="Print the changes without applying them")
+    args = parser.parse_args()
+
+    key = [c.strip().upper() for c in args.key.split(",")]
+    defaults = {"ORG_ID": args.default_org_id} if args.default_org_id is not None else {}
+    session = connect(args.connection)
+    checkpoint = Checkpoint(args.checkpoint)
+
+    with BudibaseAPI(args.api_key, args.app_id, api_base=args.api_base) as api:
+        table_id = args.table_id or checkpoint.data["table_id"] or api.find_table("ESG_METRICS")
+        if table_id is None:
+            sys.exit("ESG_METRICS table not found in Budibase (run setup_esg_app.py first)")
+
+        current = fingerprint(session)
+        if not args.full and checkpoint.matches(table_id, key) and checkpoint.data["fingerprint"] == current:
+            print("Nothing changed since the last sync")
+            return
+
+        if args.full or not checkpoint.matches(table_id, key):
+            print("Indexing existing Budibase rows...")
+            checkpoint.reset(table_id, key)
+            rows, unkeyed = index_budibase(api, table_id, key, defaults)
+            if unkeyed:
+                sys.exit(unkeyed_error(unkeyed, key))
+            checkpoint.rows.update(rows)
+
+        creates, updates, deletes = plan(session, checkpoint, key)
+        print(f"{len(creates)} to create, {len(updates)} to update, {len(deletes)} to delete")
+        if args.dry_run:
+            print_diff(creates, updates, deletes, checkpoint)
+            return
+
+        try:
+            apply(api, table_id, checkpoint, creates, updates, deletes)
+        except Exception:
+            # Keep the row IDs created so far so a rerun updates instead of duplicating
+            checkpoint.save()
+            raise
+        checkpoint.data["fingerprint"] = current
+        # The newer of the two maxima; rows stamped exactly here are re-read and skipped by value
+        checkpoint.data["watermark"] = max((t for t in current[:2] if t != "None"), default=None)
+        checkpoint.save()
+        print("Sync complete")
+
+
+if __name__ == "__main__":
+    main()
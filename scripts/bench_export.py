@@ -0,0 +1,110 @@
+#!/usr/bin/env python3
+"""
+Memory benchmark for One Report exports
+Streams synthetic ESG_METRICS record batches through utils.export at growing
+row counts and reports the peak RSS of each run, next to the old approach of
+materializing a DataFrame and calling to_csv(). Like build_export(), each run
+ends by reading the finished file back as the bytes handed to the download
+button. Each measurement runs in its own process so peaks do not carry over.
+
+Usage: python scripts/bench_export.py [--rows 10000 40000 160000] [--formats csv parquet xlsx]
+"""
+import argparse
+import os
+import resource
+import subprocess
+import sys
+import tempfile
+import time
+
+import numpy as np
+import pyarrow as pa
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+
+from utils.export import export_schema, write_export  # noqa: E402
+from utils.schema import CATEGORIES, COLUMN_TYPES  # noqa: E402
+
+BATCH_ROWS = 10000
+
+
+def synthetic_batches(rows: int, seed: int = 7):
+    """Yield freshly built batches shaped like the warehouse's Arrow output"""
+    rng = np.random.default_rng(seed)
+    schema = export_schema(list(COLUMN_TYPES))
+    for start in range(0, rows, BATCH_ROWS):
+        n = min(BATCH_ROWS, rows - start)
+        arrays = []
+        for field in schema:
+            kind = COLUMN_TYPES[field.name]
+            if field.name in ("ID", "REPORT_YEAR"):
+                arrays.append(pa.array(np.arange(start, start + n)))
+            elif kind[0] == "DECIMAL":
+                values = np.round(rng.uniform(0, 10 ** min(kind[1] - kind[2], 6) - 1, n), kind[2])
+                arrays.append(pa.array(values).cast(field.type))
+            elif kind[0] == "INTEGER":
+                arrays.append(pa.array(rng.integers(0, 5000, n)))
+            elif kind[0] == "BOOLEAN":
+                arrays.append(pa.array(rng.random(n) < 0.5))
+            elif field.name in CATEGORIES:
+                arrays.append(pa.array(rng.choice(CATEGORIES[field.name], n)))
+            elif kind[0] == "TEXT":
+                arrays.append(pa.array([f"One Report notes for row {start + i}" for i in range(n)]))
+            elif kind[0] in ("DATE", "TIMESTAMP_NTZ"):
+                arrays.append(pa.nulls(n, field.type))
+            else:
+                arrays.append(pa.array([f"{field.name.lower()}_{i % 50}" for i in range(n)]))
+        yield pa.RecordBatch.from_arrays(arrays, schema=schema)
+
+
+def peak_mb() -> float:
+    # ru_maxrss is KiB on Linux
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+
+def child(rows: int, method: str):
+    """Run one export in this process and print 'peak_mb seconds'"""
+    started = time.perf_counter()
+    with tempfile.TemporaryFile() as sink:
+        if method == "to_csv (old)":
+            frame = pa.Table.from_batches(list(synthetic_batches(rows))).to_pandas()
+            sink.write(frame.to_csv(index=False).encode("utf-8"))
+        elif method != "idle":
+            write_export(synthetic_batches(rows), method, sink, list(COLUMN_TYPES))
+            sink.seek(0)
+            data = sink.read()  # noqa: F841 -- held like the bytes build_export() returns
+    print(f"{peak_mb():.1f} {time.perf_counter() - started:.2f}")
+
+
+def measure(rows: int, method: str) -> tuple:
+    output = subprocess.run(
+        [sys.executable, __file__, "--child", str(rows), method],
+        check=True, capture_output=True, text=True,
+    ).stdout.split()
+    return float(output[0]), float(output[1])
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Compare peak memory of export paths")
+    parser.add_argument("--rows", type=int, nargs="+", default=[10000, 40000, 160000])
+    parser.add_argument("--formats", nargs="+", default=["csv", "parquet", "xlsx"])
+    parser.add_argument("--child", nargs=2, help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.child:
+        child(int(args.child[0]), args.child[1])
+        return
+
+    idle, _ = measure(0, "idle")
+    print(f"Export peak RSS above an idle interpreter ({idle:.0f} MB), {len(COLUMN_TYPES)} columns")
+    print(f"{'method':<16}" + "".join(f"{rows:>18,}" for rows in args.rows))
+    for method in ["to_csv (old)"] + args.formats:
+        cells = []
+        for rows in args.rows:
+            peak, seconds = measure(rows, method)
+            cells.append(f"{peak - idle:>9.1f} MB {seconds:>5.1f}s")
+        print(f"{method:<16}" + "".join(f"{cell:>18}" for cell in cells))
+
+
+if __name__ == "__main__":
+    main()
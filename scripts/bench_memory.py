@@ -0,0 +1,76 @@
+#!/usr/bin/env python3
+"""
+Memory benchmark for loaded ESG_METRICS frames
+Builds a frame shaped like Snowpark's to_pandas() output (DECIMAL columns as
+Python Decimal objects) and compares memory_usage(deep=True) across loader
+options.
+
+Usage: python scripts/bench_memory.py [--rows 50000]
+"""
+import argparse
+import os
+import random
+import sys
+from datetime import datetime
+from decimal import Decimal
+
+import pandas as pd
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+
+from utils.schema import CATEGORIES, COLUMN_TYPES, normalize  # noqa: E402
+
+
+def raw_frame(rows: int, seed: int = 7) -> pd.DataFrame:
+    """Random rows with the dtypes to_pandas() returns for the DDL"""
+    rng = random.Random(seed)
+    data = {}
+    for column, kind in COLUMN_TYPES.items():
+        if kind[0] == "DECIMAL":
+            precision, scale = kind[1], kind[2]
+            top = 10 ** min(precision - scale, 6)
+            data[column] = [Decimal(f"{rng.uniform(0, top):.{scale}f}") for _ in range(rows)]
+        elif kind[0] == "INTEGER":
+            data[column] = [rng.randint(0, 5000) for _ in range(rows)]
+        elif kind[0] == "BOOLEAN":
+            data[column] = [rng.random() < 0.5 for _ in range(rows)]
+        elif column in CATEGORIES:
+            data[column] = [rng.choice(CATEGORIES[column]) for _ in range(rows)]
+        elif kind[0] == "TEXT":
+            data[column] = [f"FY{2000 + i % 25} One Report notes " * rng.randint(2, 12) for i in range(rows)]
+        elif kind[0] == "TIMESTAMP_NTZ":
+            data[column] = [datetime(2024, 1, 1)] * rows
+        elif kind[0] == "DATE":
+            data[column] = [datetime(2024, 4, 30).date()] * rows
+        else:
+            data[column] = [f"{column.lower()}_{rng.randint(0, 50)}" for _ in range(rows)]
+    return pd.DataFrame(data)
+
+
+def mb(df: pd.DataFrame) -> float:
+    return df.memory_usage(deep=True).sum() / 1024 / 1024
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Compare in-memory size of ESG frames")
+    parser.add_argument("--rows", type=int, default=50000, help="Rows to generate")
+    args = parser.parse_args()
+
+    raw = raw_frame(args.rows)
+    without_notes = [c for c, kind in COLUMN_TYPES.items() if kind[0] != "TEXT"]
+    variants = [
+        ("to_pandas() as returned", raw),
+        ("normalize()", normalize(raw)),
+        ("normalize(compact=True)", normalize(raw, compact=True)),
+        ("compact, NOTES excluded", normalize(raw[without_notes], compact=True)),
+    ]
+
+    baseline = mb(raw)
+    print(f"ESG_METRICS frame memory, {args.rows:,} rows x {len(COLUMN_TYPES)} columns")
+    print(f"{'variant':<28}{'MB':>10}{'vs raw':>10}")
+    for label, df in variants:
+        print(f"{label:<28}{mb(df):>10.1f}{mb(df) / baseline:>10.1%}")
+
+
+if __name__ == "__main__":
+    main()
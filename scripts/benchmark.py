@@ -0,0 +1,252 @@
+#!/usr/bin/env python3
+"""
+Per-page rerun benchmark
+Drives streamlit_app.py and every app/pages_disabled page headlessly with
+Streamlit's AppTest against the local DuckDB backend, loaded with synthetic
+ESG_METRICS rows at several sizes. For each page (and each section of pages
+with a section radio) it records the wall time of the first and of warm
+reruns, the backend queries they issued with their time, rows and Arrow
+bytes, and the peak RSS of the page's process. Each page runs in its own
+process so caches and memory peaks do not carry over.
+
+Results are written as JSON; pass an earlier result file as --baseline to
+flag pages that got slower or started issuing more queries.
+
+Usage: python scripts/benchmark.py [--sizes 1000 10000 100000] [--reruns 5]
+                                   [--output bench.json] [--baseline baseline.json]
+"""
+import argparse
+import json
+import os
+import platform
+import resource
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import datetime, timezone
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+
+ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
+PAGES = ["streamlit_app.py"] + sorted(
+    f"app/pages_disabled/{name}" for name in os.listdir(os.path.join(ROOT, "app", "pages_disabled"))
+    if name.endswith(".py")
+)
+# page -> label of the radio whose options are benchmarked as separate views
+VIEW_RADIOS = {
+    "streamlit_app.py": "Section",
+    "app/pages_disabled/4_AI_Insights.py": "Mode",
+}
+YEARS = 10
+RUN_TIMEOUT = 600
+# A warm rerun is a regression when it is this much slower and above the noise floor
+SLOWER_RATIO = 1.25
+NOISE_MS = 5.0
+
+
+def peak_mb() -> float:
+    # ru_maxrss is KiB on Linux
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+
+def build_database(path: str, rows: int) -> int:
+    """Seed a DuckDB file from setup/ and add about rows synthetic reports and their organizations"""
+    from generate_esg_data import generate, organizations
+    from utils.database import ORG_TABLE, TABLE
+    from utils.local_backend import LocalSession
+
+    session = LocalSession(path)
+    companies = rows // (YEARS * 8)
+    if companies:
+        for frame in generate(companies, YEARS):
+            for name, data in ((ORG_TABLE, organizations(frame)), (TABLE, frame)):
+                session.write_pandas(data, name, database="ESG_REPORTING", schema="PROD", quote_identifiers=False)
+    total = session.sql(f"SELECT COUNT(*) AS N FROM {TABLE}").collect()[0].N
+    session.close()
+    return total
+
+
+def _errors(at) -> list:
+    return [str(e.value) for e in at.exception] + [e.value for e in at.error]
+
+
+def _measure(at, session) -> dict:
+    session.queries.clear()
+    started = time.perf_counter()
+    at.run(timeout=RUN_TIMEOUT)
+    wall_ms = (time.perf_counter() - started) * 1000
+    queries = list(session.queries)
+    return {
+        "wall_ms": round(wall_ms, 2),
+        "queries": len(queries),
+        "query_ms": round(sum(q.seconds for q in queries) * 1000, 2),
+        "rows": sum(q.rows for q in queries),
+        "bytes": sum(q.bytes for q in queries),
+        "errors": _errors(at),
+    }
+
+
+def _summary(first: dict, warm: list) -> dict:
+    last = warm[-1] if warm else first
+    return {
+        "first_ms": first["wall_ms"],
+        "first_queries": first["queries"],
+        "first_bytes": first["bytes"],
+        "warm_ms": round(statistics.median(r["wall_ms"] for r in warm), 2) if warm else None,
+        "warm_max_ms": max(r["wall_ms"] for r in warm) if warm else None,
+        "warm_queries": last["queries"],
+        "warm_query_ms": round(statistics.median(r["query_ms"] for r in warm), 2) if warm else None,
+        "warm_bytes": last["bytes"],
+        "errors": sorted({e for r in [first, *warm] for e in r["errors"]}),
+    }
+
+
+def child(path: str, page: str, reruns: int):
+    """Benchmark one page in this process and print its views as JSON"""
+    os.environ["ESG_BACKEND"] = "local"
+    os.environ["ESG_LOCAL_DB"] = path
+    os.chdir(ROOT)
+    sys.path.insert(0, ROOT)
+    from streamlit.testing.v1 import AppTest
+
+    from utils.local_backend import local_session
+
+    session = local_session()
+    at = AppTest.from_file(os.path.join(ROOT, page), default_timeout=RUN_TIMEOUT)
+    views = {}
+    first = _measure(at, session)
+    radio = next((r for r in at.radio if r.label == VIEW_RADIOS.get(page)), None)
+    options = list(radio.options) if radio is not None else ["default"]
+    for index, option in enumerate(options):
+        if index:
+            radio.set_value(option)
+            first = _measure(at, session)
+            radio = next(r for r in at.radio if r.label == VIEW_RADIOS[page])
+        warm = [_measure(at, session) for _ in range(reruns)]
+        views[option] = _summary(first, warm)
+    print(json.dumps({"peak_mb": round(peak_mb(), 1), "views": views}))
+
+
+def run_page(path: str, page: str, reruns: int) -> dict:
+    output = subprocess.run(
+        [sys.executable, __file__, "--child", path, page, str(reruns)],
+        capture_output=True, text=True, cwd=ROOT,
+    )
+    if output.returncode:
+        return {"peak_mb": None, "views": {"default": {"errors": [output.stderr.strip()[-2000:]]}}}
+    return json.loads(output.stdout.strip().splitlines()[-1])
+
+
+def _versions() -> dict:
+    versions = {"python": platform.python_version()}
+    for module in ("streamlit", "duckdb", "pandas", "pyarrow"):
+        try:
+            versions[module] = __import__(module).__version__
+        except ImportError:
+            versions[module] = None
+    return versions
+
+
+def _commit() -> str:
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd=ROOT,
+                              capture_output=True, text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def compare(results: list, baseline: list, ratio: float) -> list:
+    """Regression messages for results that are slower or chattier than baseline"""
+    previous = {r["key"]: r for r in baseline}
+    problems = []
+    for result in results:
+        before = previous.get(result["key"])
+        if before is None or result.get("warm_ms") is None or before.get("warm_ms") is None:
+            continue
+        if result["warm_ms"] > before["warm_ms"] * ratio and result["warm_ms"] - before["warm_ms"] > NOISE_MS:
+            problems.append(f"{result['key']}: warm rerun {before['warm_ms']:.0f} -> {result['warm_ms']:.0f} ms")
+        for field in ("warm_queries", "first_queries"):
+            if result[field] > before[field]:
+                problems.append(f"{result['key']}: {field} {before[field]} -> {result[field]}")
+        if result["warm_bytes"] > before["warm_bytes"] * ratio:
+            problems.append(f"{result['key']}: warm bytes {before['warm_bytes']:,} -> {result['warm_bytes']:,}")
+        if result["errors"] and not before["errors"]:
+            problems.append(f"{result['key']}: now fails with {result['errors'][0][:120]}")
+    return problems
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark page reruns against the local backend")
+    parser.add_argument("--sizes", type=int, nargs="+", default=[1000, 10000, 100000],
+                        help="Synthetic ESG_METRICS rows per run")
+    parser.add_argument("--reruns", type=int, default=5, help="Warm reruns per page view")
+    parser.add_argument("--pages", nargs="+", default=PAGES, help="Pages to run (paths from the repo root)")
+    parser.add_argument("--output", help="Write results as JSON to this file")
+    parser.add_argument("--baseline", help="Earlier --output file to compare against")
+    parser.add_argument("--ratio", type=float, default=SLOWER_RATIO, help="Slowdown that counts as a regression")
+    parser.add_argument("--fail-on-regression", action="store_true", help="Exit 1 when a regression is found")
+    parser.add_argument("--child", nargs=3, help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.child:
+        child(args.child[0], args.child[1], int(args.child[2]))
+        return
+
+    sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+    results = []
+    print(f"{'rows':>9}  {'page':<42}{'first ms':>10}{'queries':>9}{'KB':>9}"
+          f"{'warm ms':>10}{'queries':>9}{'query ms':>10}{'peak MB':>9}")
+    with tempfile.TemporaryDirectory() as tmp:
+        for size in args.sizes:
+            path = os.path.join(tmp, f"esg_{size}.duckdb")
+            rows = build_database(path, size)
+            for page in args.pages:
+                run = run_page(path, page, args.reruns)
+                for view, stats in run["views"].items():
+                    name = page if view == "default" else f"{page} [{view}]"
+                    label = os.path.basename(name)
+                    result = {"key": f"{size}/{name}", "size": size, "rows": rows, "page": page, "view": view,
+                              "peak_mb": run["peak_mb"], **stats}
+                    results.append(result)
+                    if "first_ms" not in stats:
+                        print(f"{size:>9,}  {label:<42}  FAILED: {stats['errors'][0].splitlines()[-1]}")
+                        continue
+                    flag = "  !" if stats["errors"] else ""
+                    peak = f"{run['peak_mb']:>9.1f}" if run["peak_mb"] is not None else f"{'':>9}"
+                    print(f"{size:>9,}  {label:<42}{stats['first_ms']:>10.0f}{stats['first_queries']:>9}"
+                          f"{stats['first_bytes'] / 1024:>9.0f}{stats['warm_ms'] or 0:>10.0f}"
+                          f"{stats['warm_queries']:>9}{stats['warm_query_ms'] or 0:>10.1f}{peak}{flag}")
+
+    report = {
+        "created": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+        "commit": _commit(),
+        "reruns": args.reruns,
+        "versions": _versions(),
+        "results": results,
+    }
+    failing = [r["key"] for r in results if r["errors"]]
+    if failing:
+        print(f"\n{len(failing)} page views raised errors (marked !); see 'errors' in the JSON")
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(report, f, indent=2)
+        print(f"Results written to {args.output}")
+
+    if args.baseline:
+        with open(args.baseline) as f:
+            baseline = json.load(f)
+        problems = compare([r for r in results if "first_ms" in r],
+                           [r for r in baseline["results"] if "first_ms" in r], args.ratio)
+        print(f"\nAgainst baseline {baseline.get('commit') or args.baseline} ({baseline['created']}):")
+        for problem in problems:
+            print(f"  REGRESSION {problem}")
+        if not problems:
+            print("  no regressions")
+        if problems and args.fail_on_regression:
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
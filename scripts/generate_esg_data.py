@@ -0,0 +1,348 @@
+#!/usr/bin/env python3
+"""
+Synthetic ESG_METRICS generator for load testing
+Produces seeded, internally consistent One Report rows for N companies in
+each of the 8 SET sectors over M years: renewable energy never exceeds total
+energy, permanent plus contract staff equals the headcount, board
+percentages come from whole directors, certifications stay once adopted, and
+every company drifts from year to year along its sector's trend.
+Generation is vectorized with NumPy in blocks of companies, so 1M rows
+stream to Parquet/CSV or into a backend without holding them all in memory.
+
+Usage:
+    python scripts/generate_esg_data.py --companies 1250 --years 10 --output esg_100k.parquet
+    ESG_LOCAL_DB=esg_local.duckdb python scripts/generate_esg_data.py --companies 125 --years 10 --load local
+    python scripts/generate_esg_data.py --companies 1250 --years 10 --load snowflake --connection default
+
+Rows are companies x 8 sectors x years. Every company is also added to
+ORGANIZATIONS (loaded ahead of its metrics) with ORG_ID = 1,000,000 + its
+number, which --replace uses to remove an earlier load; with --output the
+organizations go to a sibling <name>_organizations file.
+"""
+import argparse
+import os
+import sys
+import time
+from datetime import date
+
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+
+from utils.database import ORG_TABLE, TABLE  # noqa: E402
+from utils.schema import CGR_SCORES, COLUMN_TYPES, REPORT_STATUSES, SECTORS  # noqa: E402
+
+# Companies per random-number block; output does not depend on how it is chunked
+BLOCK_COMPANIES = 4096
+
+NOTES_PREFIX = "SYNTHETIC-"
+
+# Synthetic companies get ORG_IDs from here up, clear of AUTOINCREMENT ids of real ones
+ORG_ID_BASE = 1_000_000
+
+# Grid and fuel emission factors (tCO2e/MWh); Thai grid is about 0.5
+GRID_FACTOR = 0.5
+FUEL_FACTOR = 0.25
+
+# sector -> (MWh per employee, fuel share of energy, scope 3 multiple of scope 1+2,
+#            m3 water per employee, tons waste per employee, hazardous share,
+#            injury rate, women %, revenue M THB per employee, monthly salary THB)
+SECTOR_PROFILES = {
+    "Technology": (12, 0.15, 4.0, 90, 0.25, 0.02, 0.3, 45, 4.0, 52000),
+    "Services": (8, 0.20, 3.0, 110, 0.30, 0.01, 0.5, 55, 2.5, 32000),
+    "Industrial": (60, 0.55, 6.0, 900, 3.5, 0.08, 1.4, 30, 6.0, 28000),
+    "Property & Construction": (25, 0.45, 8.0, 400, 6.0, 0.04, 1.8, 25, 7.0, 30000),
+    "Resources": (150, 0.80, 10.0, 2500, 8.0, 0.12, 1.2, 20, 25.0, 48000),
+    "Consumer Products": (20, 0.35, 5.0, 350, 1.2, 0.03, 0.8, 50, 5.0, 27000),
+    "Agro & Food": (30, 0.40, 7.0, 1800, 2.5, 0.02, 1.1, 45, 4.5, 22000),
+    "Financials": (5, 0.05, 2.0, 60, 0.10, 0.005, 0.1, 60, 12.0, 60000),
+}
+
+ASSURANCE_PROVIDERS = ["KPMG Thailand", "PwC Thailand", "Deloitte Thailand", "EY Thailand", "SGS Thailand"]
+
+# Every ESG_METRICS column except the ones the table fills in itself
+COLUMNS = [c for c in COLUMN_TYPES if c not in ("ID", "CREATED_BY", "CREATED_AT", "UPDATED_BY", "UPDATED_AT")]
+
+
+def _adopted(rng, companies: int, years: int, eventually: float, already: float):
+    """(companies, years) flags that switch on once and stay on
+
+    already: share adopted before the first year; eventually: share adopted
+    by the last year.
+    """
+    first = np.where(rng.random(companies) < already, 0,
+                     np.where(rng.random(companies) < (eventually - already) / max(1 - already, 1e-9),
+                              rng.integers(1, max(years, 2), companies), years + 1))
+    return np.arange(years)[None, :] >= first[:, None]
+
+
+def _walk(rng, companies: int, years: int, trend: float, noise: float):
+    """Multiplicative drift per company: 1.0 in the first year"""
+    steps = rng.normal(trend, noise, (companies, years))
+    steps[:, 0] = 0.0
+    return np.exp(np.cumsum(steps, axis=1))
+
+
+def _pct(values):
+    return np.round(np.clip(values, 0, 100), 2)
+
+
+def generate_block(block: int, companies: int, years: int, last_year: int, seed: int) -> pd.DataFrame:
+    """Rows for companies block*BLOCK_COMPANIES .. +companies, every year of each"""
+    rng = np.random.default_rng([seed, block])
+    C, Y = companies, years
+    company = block * BLOCK_COMPANIES + np.arange(C)
+    sector_index = company % len(SECTORS)
+    profile = np.array([SECTOR_PROFILES[s] for s in SECTORS])[sector_index]
+    (energy_pe, fuel_share, scope3_multiple, water_pe, waste_pe, hazardous_share,
+     injury_base, women_base, revenue_pe, salary_base) = profile.T
+    year = last_year - Y + 1 + np.arange(Y)
+    t = np.arange(Y)[None, :]
+
+    def per_year(values):
+        return np.repeat(values[:, None], Y, axis=1)
+
+    # Workforce
+    headcount0 = np.clip(rng.lognormal(np.log(1500), 1.0, C), 50, 150000)
+    employees = np.maximum(np.round(per_year(headcount0) * _walk(rng, C, Y, 0.03, 0.05)), 20).astype(np.int64)
+    contract = np.round(employees * per_year(rng.beta(2, 10, C))).astype(np.int64)
+    permanent = employees - contract
+    turnover = _pct(per_year(rng.normal(10, 3, C)) + rng.normal(0, 1.5, (C, Y)))
+    growth = np.diff(employees, axis=1, prepend=employees[:, :1])
+    new_hires = np.round(employees * turnover / 100 + np.maximum(growth, 0)).astype(np.int64)
+
+    women = _pct(per_year(women_base + rng.normal(0, 6, C)) + 0.3 * t)
+    women_management = _pct(women * per_year(rng.uniform(0.6, 1.0, C)) + 0.4 * t)
+    women_executive = _pct(women_management * per_year(rng.uniform(0.4, 1.0, C)))
+    disabled = np.round(employees / 100 * per_year(rng.uniform(0.5, 1.1, C))).astype(np.int64)
+    local_employment = _pct(per_year(rng.uniform(60, 98, C)))
+    salary = np.round(per_year(salary_base * rng.lognormal(0, 0.2, C)) * 1.03 ** t, 2)
+    provident = _pct(per_year(rng.choice([2, 3, 5, 7, 10], C).astype(float)))
+
+    injury_rate = np.round(np.clip(per_year(injury_base * rng.lognormal(0, 0.4, C))
+                                   * _walk(rng, C, Y, -0.05, 0.15), 0, 99), 4)
+    lost_time = rng.poisson(employees * injury_rate / 250)
+    fatalities = rng.poisson(employees * per_year(injury_base) * 2e-5)
+    safety_hours = np.round(employees * rng.uniform(2, 4, (C, Y)), 2)
+    training_avg = np.round(np.clip(per_year(rng.normal(20, 6, C)) * 1.03 ** t, 2, 200), 2)
+    training_budget = np.round(employees * training_avg * rng.uniform(50, 90, (C, Y)), 2)
+
+    # Energy and emissions
+    energy = np.round(employees * per_year(energy_pe * rng.lognormal(0, 0.3, C)) * 0.98 ** t, 2)
+    renewable_share = np.clip(per_year(rng.beta(2, 8, C)) + np.cumsum(
+        np.where(t == 0, 0, rng.uniform(0.0, 0.05, (C, Y))), axis=1), 0, 1)
+    renewable = np.round(np.minimum(energy * renewable_share, energy), 2)
+    onsite = per_year(rng.uniform(0.1, 0.6, C))
+    solar_kw = np.round(renewable * onsite * 1000 / 1300, 2)
+    fuel = energy * per_year(fuel_share)
+    scope1 = np.round(fuel * FUEL_FACTOR, 2)
+    scope2 = np.round(np.maximum(energy - fuel - renewable, 0) * GRID_FACTOR, 2)
+    scope3 = np.round((scope1 + scope2) * per_year(scope3_multiple * rng.lognormal(0, 0.25, C)), 2)
+    base = (scope1 + scope2)[:, :1]
+    reduction_achieved = np.round(np.clip(100 * (1 - (scope1 + scope2) / np.maximum(base, 1e-9)), -99, 99), 2)
+    reduction_target = per_year(rng.choice([10.0, 15.0, 20.0, 25.0, 30.0], C))
+    revenue = employees * per_year(revenue_pe * rng.lognormal(0, 0.3, C))
+    energy_intensity = np.round(energy / revenue, 4)
+
+    # Water and waste
+    water = np.round(employees * per_year(water_pe * rng.lognormal(0, 0.3, C)) * 0.98 ** t, 2)
+    water_recycled = _pct(per_year(rng.uniform(5, 40, C)) + 2 * t)
+    waste = np.round(employees * per_year(waste_pe * rng.lognormal(0, 0.3, C)), 2)
+    waste_recycled = _pct(per_year(rng.uniform(30, 80, C)) + 2.5 * t)
+    hazardous = np.round(waste * per_year(hazardous_share), 2)
+    zero_waste = waste_recycled >= 95
+    violations = rng.poisson(0.05 * per_year(fuel_share) * 4, (C, Y))
+    fines = np.round(violations * rng.lognormal(np.log(100000), 0.8, (C, Y)), 2)
+
+    # Community and supply chain
+    csr = np.round(revenue * 1e6 * rng.uniform(0.001, 0.005, (C, Y)) / 100, 2)
+    community_projects = rng.poisson(np.clip(csr / 500000, 0.5, 200))
+    local_supplier = _pct(per_year(rng.uniform(40, 90, C)))
+
+    # Board: percentages come from whole directors
+    board_total = per_year(rng.integers(7, 16, C))
+    independent = np.maximum(np.ceil(board_total / 3), np.minimum(
+        board_total - 2, np.round(board_total * per_year(rng.uniform(0.33, 0.7, C)))))
+    board_women = np.minimum(board_total, per_year(rng.binomial(board_total[:, 0], 0.15))
+                             + (_adopted(rng, C, Y, 0.5, 0.0)).astype(int))
+    board_meetings = rng.integers(6, 15, (C, Y))
+    attendance = _pct(rng.uniform(85, 100, (C, Y)))
+    ethics_training = _pct(per_year(rng.uniform(70, 95, C)) + t)
+    corruption_cases = rng.poisson(0.02, (C, Y))
+
+    anti_corruption = _adopted(rng, C, Y, 0.9, 0.6)
+    governance_score = independent / board_total + 0.2 * anti_corruption + rng.normal(0, 0.1, (C, Y))
+    cgr = np.digitize(governance_score, [0.3, 0.45, 0.6, 0.75])
+    assured = _adopted(rng, C, Y, 0.7, 0.3)
+    provider = np.array(ASSURANCE_PROVIDERS, dtype=object)[per_year(rng.integers(0, len(ASSURANCE_PROVIDERS), C))]
+
+    statuses = np.array(REPORT_STATUSES, dtype=object)
+    status = np.where(t < Y - 1, "Approved", statuses[rng.integers(0, len(statuses), (C, Y))])
+
+    columns = {
+        "ORG_ID": per_year(ORG_ID_BASE + company),
+        "REPORT_YEAR": np.broadcast_to(year, (C, Y)),
+        "REPORT_STATUS": status,
+        "SECTOR": per_year(np.array(SECTORS, dtype=object)[sector_index]),
+        "SUBMISSION_DEADLINE": np.broadcast_to(np.array([date(y + 1, 4, 30) for y in year], dtype=object), (C, Y)),
+        "GHG_SCOPE1_TCO2E": scope1, "GHG_SCOPE2_TCO2E": scope2, "GHG_SCOPE3_TCO2E": scope3,
+        "GHG_REDUCTION_TARGET_PCT": reduction_target, "GHG_REDUCTION_ACHIEVED_PCT": reduction_achieved,
+        "ENERGY_TOTAL_MWH": energy, "ENERGY_RENEWABLE_MWH": renewable,
+        "ENERGY_INTENSITY": energy_intensity, "SOLAR_INSTALLED_KW": solar_kw,
+        "WATER_CONSUMPTION_M3": water, "WATER_RECYCLED_PCT": water_recycled,
+        "WASTE_TOTAL_TONS": waste, "WASTE_RECYCLED_PCT": waste_recycled,
+        "HAZARDOUS_WASTE_TONS": hazardous, "ZERO_WASTE_TO_LANDFILL": zero_waste,
+        "ENV_VIOLATIONS": violations, "ENV_FINES_THB": fines,
+        "EMPLOYEES_TOTAL": employees, "EMPLOYEES_PERMANENT": permanent, "EMPLOYEES_CONTRACT": contract,
+        "NEW_HIRES": new_hires, "TURNOVER_RATE_PCT": turnover,
+        "WOMEN_WORKFORCE_PCT": women, "WOMEN_MANAGEMENT_PCT": women_management,
+        "WOMEN_EXECUTIVE_PCT": women_executive, "DISABLED_EMPLOYEES": disabled,
+        "LOCAL_EMPLOYMENT_PCT": local_employment,
+        "MIN_WAGE_COMPLIANCE": rng.random((C, Y)) < 0.99, "AVG_SALARY_THB": salary,
+        "BENEFITS_BEYOND_LEGAL": _adopted(rng, C, Y, 0.85, 0.7), "PROVIDENT_FUND_PCT": provident,
+        "LOST_TIME_INJURIES": lost_time, "INJURY_RATE": injury_rate, "FATALITIES": fatalities,
+        "SAFETY_TRAINING_HOURS": safety_hours, "SAFETY_COMMITTEE": employees >= 50,
+        "TRAINING_HOURS_AVG": training_avg, "TRAINING_BUDGET_THB": training_budget,
+        "CAREER_DEVELOPMENT_PROGRAM": _adopted(rng, C, Y, 0.7, 0.4),
+        "CSR_BUDGET_THB": csr, "COMMUNITY_PROJECTS": community_projects, "LOCAL_SUPPLIER_PCT": local_supplier,
+        "SUPPLIER_CODE_OF_CONDUCT": _adopted(rng, C, Y, 0.8, 0.5),
+        "SUPPLIER_ESG_ASSESSMENT": _adopted(rng, C, Y, 0.6, 0.2),
+        "BOARD_TOTAL": board_total, "BOARD_INDEPENDENT_PCT": _pct(100 * independent / board_total),
+        "BOARD_WOMEN_PCT": _pct(100 * board_women / board_total), "BOARD_MEETINGS_YEAR": board_meetings,
+        "BOARD_ATTENDANCE_PCT": attendance,
+        "HAS_AUDIT_COMMITTEE": np.ones((C, Y), bool), "HAS_RISK_COMMITTEE": _adopted(rng, C, Y, 0.9, 0.6),
+        "HAS_CG_COMMITTEE": _adopted(rng, C, Y, 0.8, 0.5),
+        "HAS_SUSTAINABILITY_COMMITTEE": _adopted(rng, C, Y, 0.7, 0.2),
+        "CODE_OF_CONDUCT": rng.random((C, Y)) < 0.98, "ANTI_CORRUPTION_POLICY": anti_corruption,
+        "WHISTLEBLOWER_POLICY": _adopted(rng, C, Y, 0.95, 0.7), "ETHICS_TRAINING_PCT": ethics_training,
+        "CORRUPTION_CASES": corruption_cases,
+        "CGR_SCORE": np.array(CGR_SCORES, dtype=object)[cgr],
+        "ISO14001_CERTIFIED": _adopted(rng, C, Y, 0.6, 0.3), "ISO45001_CERTIFIED": _adopted(rng, C, Y, 0.5, 0.2),
+        "SET_ESG_RATING": _adopted(rng, C, Y, 0.4, 0.1), "THSI_MEMBER": _adopted(rng, C, Y, 0.3, 0.05),
+        "EXTERNAL_ASSURANCE": assured, "ASSURANCE_PROVIDER": np.where(assured, provider, None),
+        "NOTES": per_year(np.array([f"{NOTES_PREFIX}{c:07d}" for c in company], dtype=object)),
+    }
+    frame = pd.DataFrame({name: np.asarray(values).reshape(-1) for name, values in columns.items()})
+    return frame[COLUMNS]
+
+
+def generate(companies: int, years: int, last_year: int = 2024, seed: int = 42):
+    """Yield DataFrames of up to BLOCK_COMPANIES x years rows; companies is per sector"""
+    total = companies * len(SECTORS)
+    for block, start in enumerate(range(0, total, BLOCK_COMPANIES)):
+        yield generate_block(block, min(BLOCK_COMPANIES, total - start), years, last_year, seed)
+
+
+def organizations(frame: pd.DataFrame) -> pd.DataFrame:
+    """ORGANIZATIONS rows for the companies in a generated frame"""
+    orgs = frame.drop_duplicates("ORG_ID")[["ORG_ID", "SECTOR"]].reset_index(drop=True)
+    number = orgs["ORG_ID"] - ORG_ID_BASE
+    orgs.insert(1, "ORG_NAME", "Synthetic " + orgs["SECTOR"].astype(str) + " " + number.map("{:07d}".format))
+    orgs.insert(2, "SET_SYMBOL", "SYN" + number.map("{:07d}".format))
+    return orgs
+
+
+def validate(frame: pd.DataFrame) -> list:
+    """Consistency and DDL range problems in a generated frame (empty if none)"""
+    problems = []
+    checks = {
+        "renewable > total energy": frame["ENERGY_RENEWABLE_MWH"] > frame["ENERGY_TOTAL_MWH"],
+        "permanent + contract != total": (frame["EMPLOYEES_PERMANENT"] + frame["EMPLOYEES_CONTRACT"]
+                                          != frame["EMPLOYEES_TOTAL"]),
+        "hazardous > total waste": frame["HAZARDOUS_WASTE_TONS"] > frame["WASTE_TOTAL_TONS"],
+        "assurance provider without assurance": frame["ASSURANCE_PROVIDER"].notna() & ~frame["EXTERNAL_ASSURANCE"],
+    }
+    for column, kind in COLUMN_TYPES.items():
+        if kind[0] == "DECIMAL" and column in frame:
+            limit = 10 ** (kind[1] - kind[2])
+            checks[f"{column} outside DECIMAL({kind[1]},{kind[2]})"] = frame[column].abs() >= limit
+            if column.endswith("_PCT") and column != "GHG_REDUCTION_ACHIEVED_PCT":
+                checks[f"{column} outside 0-100"] = (frame[column] < 0) | (frame[column] > 100)
+    for label, mask in checks.items():
+        if mask.any():
+            problems.append(f"{label}: {int(mask.sum())} rows")
+    return problems
+
+
+def _open_writer(path: str, schema: pa.Schema):
+    if path.endswith(".parquet"):
+        import pyarrow.parquet as pq
+
+        return pq.ParquetWriter(path, schema, compression="zstd")
+    if path.endswith(".csv"):
+        import pyarrow.csv as pacsv
+
+        return pacsv.CSVWriter(path, schema)
+    raise ValueError(f"Unsupported output: {path} (use .parquet or .csv)")
+
+
+def _connect(target: str, connection: str = None):
+    if target == "local":
+        from utils.local_backend import local_session
+
+        return local_session()
+    from snowflake.snowpark import Session
+
+    if connection:
+        return Session.builder.config("connection_name", connection).create()
+    return Session.builder.create()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Generate synthetic ESG_METRICS rows for load testing")
+    parser.add_argument("--companies", type=int, default=125, help="Companies per SET sector")
+    parser.add_argument("--years", type=int, default=10, help="Report years per company")
+    parser.add_argument("--last-year", type=int, default=2024, help="Most recent report year")
+    parser.add_argument("--seed", type=int, default=42, help="Random seed")
+    parser.add_argument("--output", help="Write to a .parquet or .csv file")
+    parser.add_argument("--load", choices=["local", "snowflake"], help="Bulk-load into a backend")
+    parser.add_argument("--connection", help="Snowflake connection name for --load snowflake")
+    parser.add_argument("--replace", action="store_true", help="Delete earlier synthetic rows before loading")
+    args = parser.parse_args()
+    if not args.output and not args.load:
+        parser.error("pass --output and/or --load")
+
+    session = _connect(args.load, args.connection) if args.load else None
+    if args.load == "local" and os.environ.get("ESG_LOCAL_DB", ":memory:") == ":memory:":
+        print("Note: ESG_LOCAL_DB is not set, so the local load only lives for this process")
+    if session is not None and args.replace:
+        for table in ("ESG_NARRATIVES", TABLE, ORG_TABLE):
+            session.sql(f"DELETE FROM {table} WHERE ORG_ID >= ?", params=[ORG_ID_BASE]).collect()
+
+    total = args.companies * len(SECTORS) * args.years
+    print(f"Generating {total:,} rows ({args.companies:,} companies x {len(SECTORS)} sectors x {args.years} years)")
+    started = time.perf_counter()
+    writer, org_writer, rows = None, None, 0
+    try:
+        for frame in generate(args.companies, args.years, args.last_year, args.seed):
+            problems = validate(frame)
+            if problems:
+                sys.exit("Generated rows are inconsistent:\n  " + "\n  ".join(problems))
+            orgs = organizations(frame)
+            if args.output:
+                table = pa.Table.from_pandas(frame, preserve_index=False)
+                org_table = pa.Table.from_pandas(orgs, preserve_index=False)
+                if writer is None:
+                    writer = _open_writer(args.output, table.schema)
+                    stem, extension = os.path.splitext(args.output)
+                    org_writer = _open_writer(f"{stem}_organizations{extension}", org_table.schema)
+                writer.write_table(table)
+                org_writer.write_table(org_table)
+            if session is not None:
+                for name, data in ((ORG_TABLE, orgs), (TABLE, frame)):
+                    session.write_pandas(data, name, database="ESG_REPORTING", schema="PROD",
+                                         quote_identifiers=False)
+            rows += len(frame)
+            print(f"\r    {rows:,}/{total:,} rows", end="", flush=True)
+    finally:
+        for open_writer in (writer, org_writer):
+            if open_writer is not None:
+                open_writer.close()
+    elapsed = time.perf_counter() - started
+    print(f"\nDone in {elapsed:.1f}s ({rows / elapsed:,.0f} rows/s)")
+
+
+if __name__ == "__main__":
+    main()
@@ -6,9 +6,24 @@ USE DATABASE ESG_REPORTING;
 USE SCHEMA PROD;
 
 DROP TABLE IF EXISTS ESG_METRICS;
+DROP TABLE IF EXISTS ORGANIZATIONS;
+
+-- SET-listed companies in the portfolio; every ESG_METRICS row belongs to one
+CREATE TABLE ORGANIZATIONS (
+    ORG_ID INTEGER AUTOINCREMENT PRIMARY KEY,
+    ORG_NAME VARCHAR(200) NOT NULL COMMENT 'Registered company name',
+    SET_SYMBOL VARCHAR(20) COMMENT 'SET ticker symbol',
+    SECTOR VARCHAR(50) COMMENT 'SET sector classification',
+    CREATED_BY VARCHAR(100) DEFAULT CURRENT_USER(),
+    CREATED_AT TIMESTAMP_NTZ DEFAULT CURRENT_TIMESTAMP(),
+    UPDATED_AT TIMESTAMP_NTZ,
+
+    UNIQUE (SET_SYMBOL)
+);
 
 CREATE TABLE ESG_METRICS (
     ID INTEGER AUTOINCREMENT PRIMARY KEY,
+    ORG_ID INTEGER NOT NULL COMMENT 'Reporting company, see ORGANIZATIONS',
 
     -- Report Info
     REPORT_YEAR INTEGER NOT NULL COMMENT 'Fiscal year for One Report',
@@ -121,12 +136,20 @@ CREATE TABLE ESG_METRICS (
     UPDATED_BY VARCHAR(100),
     UPDATED_AT TIMESTAMP_NTZ,
 
-    UNIQUE (REPORT_YEAR)
-);
+    -- Not enforced by Snowflake; the app writes through update-then-insert on this key
+    UNIQUE (ORG_ID, REPORT_YEAR),
+    FOREIGN KEY (ORG_ID) REFERENCES ORGANIZATIONS (ORG_ID)
+)
+-- Every app query filters on one ORG_ID, so clustering by it lets Snowflake
+-- prune to that company's micro-partitions instead of scanning the portfolio
+CLUSTER BY (ORG_ID, REPORT_YEAR);
+
+-- Sample company and its FY2023 report
+INSERT INTO ORGANIZATIONS (ORG_NAME, SET_SYMBOL, SECTOR)
+VALUES ('Siam Digital Solutions PCL', 'SDS', 'Technology');
 
--- Insert sample data for FY2023
 INSERT INTO ESG_METRICS (
-    REPORT_YEAR, REPORT_STATUS, SECTOR, SUBMISSION_DEADLINE,
+    ORG_ID, REPORT_YEAR, REPORT_STATUS, SECTOR, SUBMISSION_DEADLINE,
     -- Environmental
     GHG_SCOPE1_TCO2E, GHG_SCOPE2_TCO2E, GHG_SCOPE3_TCO2E, GHG_REDUCTION_TARGET_PCT, GHG_REDUCTION_ACHIEVED_PCT,
     ENERGY_TOTAL_MWH, ENERGY_RENEWABLE_MWH, ENERGY_INTENSITY, SOLAR_INSTALLED_KW,
@@ -146,7 +169,9 @@ INSERT INTO ESG_METRICS (
     CGR_SCORE, ISO14001_CERTIFIED, ISO45001_CERTIFIED, SET_ESG_RATING, THSI_MEMBER,
     EXTERNAL_ASSURANCE, ASSURANCE_PROVIDER,
     NOTES
-) VALUES (
+)
+SELECT o.ORG_ID, v.*
+FROM ORGANIZATIONS o, (VALUES (
     2023, 'Submitted to SET', 'Technology', '2024-04-30',
     -- Environmental
     8500, 4200, 45000, 15, 12,
@@ -167,14 +192,17 @@ INSERT INTO ESG_METRICS (
     '4 Stars', TRUE, TRUE, TRUE, TRUE,
     TRUE, 'KPMG Thailand',
     'FY2023 One Report - Submitted to SET April 2024'
-);
+)) v
+WHERE o.SET_SYMBOL = 'SDS';
 
 -- Create summary view
 CREATE OR REPLACE VIEW ONE_REPORT_SUMMARY AS
 SELECT
+    m.ORG_ID,
+    o.ORG_NAME,
     REPORT_YEAR,
     REPORT_STATUS,
-    SECTOR,
+    m.SECTOR,
     -- E Score inputs
     GHG_SCOPE1_TCO2E + COALESCE(GHG_SCOPE2_TCO2E, 0) AS TOTAL_EMISSIONS,
     ROUND(ENERGY_RENEWABLE_MWH / NULLIF(ENERGY_TOTAL_MWH, 0) * 100, 1) AS RENEWABLE_PCT,
@@ -189,6 +217,52 @@ SELECT
     BOARD_WOMEN_PCT,
     CGR_SCORE,
     SET_ESG_RATING,
-    CREATED_AT
-FROM ESG_METRICS
-ORDER BY REPORT_YEAR DESC;
+    m.CREATED_AT
+FROM ESG_METRICS m
+JOIN ORGANIZATIONS o ON o.ORG_ID = m.ORG_ID
+ORDER BY m.ORG_ID, REPORT_YEAR DESC;
+
+-- Cortex COMPLETE responses, keyed by sha256(model, prompt, data fingerprint)
+-- Written and pruned by utils/cortex.py, safe to truncate at any time
+CREATE TABLE IF NOT EXISTS CORTEX_RESPONSE_CACHE (
+    CACHE_KEY VARCHAR(64) PRIMARY KEY,
+    MODEL VARCHAR(100),
+    RESPONSE TEXT,
+    LATENCY_MS INTEGER COMMENT 'Model latency when the response was computed',
+    CREATED_AT TIMESTAMP_NTZ DEFAULT CURRENT_TIMESTAMP(),
+    EXPIRES_AT TIMESTAMP_NTZ
+);
+
+-- One Report narratives per company, fiscal year and subsection (ghg, energy, board, ...)
+-- Generated by utils/narratives.py in one MERGE over ESG_METRICS and read by AI Insights;
+-- derived data, so it is recreated with ESG_METRICS
+CREATE OR REPLACE TABLE ESG_NARRATIVES (
+    ORG_ID INTEGER NOT NULL,
+    REPORT_YEAR INTEGER NOT NULL,
+    SECTION VARCHAR(30) NOT NULL COMMENT 'Subsection key, see utils/narratives.py',
+    PILLAR VARCHAR(1) COMMENT 'E, S or G',
+    MODEL VARCHAR(100),
+    PROMPT_HASH VARCHAR(64) COMMENT 'SHA-256 of the prompt, unchanged inputs are not regenerated',
+    NARRATIVE TEXT,
+    CREATED_BY VARCHAR(100) DEFAULT CURRENT_USER(),
+    CREATED_AT TIMESTAMP_NTZ DEFAULT CURRENT_TIMESTAMP(),
+    UPDATED_AT TIMESTAMP_NTZ,
+    PRIMARY KEY (ORG_ID, REPORT_YEAR, SECTION)
+)
+CLUSTER BY (ORG_ID);
+
+-- Backend calls made by the app, written in batches by utils/instrumentation.py when ESG_QUERY_LOG=1
+-- Join QUERY_ID to SNOWFLAKE.ACCOUNT_USAGE.QUERY_HISTORY for warehouse-side detail
+CREATE TABLE IF NOT EXISTS APP_QUERY_LOG (
+    EXECUTED_AT TIMESTAMP_NTZ COMMENT 'UTC start of the call',
+    SECTION VARCHAR(100) COMMENT 'App page or tab that issued the query',
+    ACTION VARCHAR(30) COMMENT 'collect, to_pandas, collect_nowait, ...',
+    QUERY_ID VARCHAR(100),
+    SQL_TEXT TEXT COMMENT 'Whitespace collapsed, literals replaced with ?',
+    ELAPSED_MS DECIMAL(12,2),
+    ROWS_RETURNED INTEGER,
+    BYTES_RETURNED INTEGER COMMENT 'In-memory size of the result in the app',
+    ERROR TEXT,
+    LOGGED_BY VARCHAR(100) DEFAULT CURRENT_USER(),
+    LOGGED_AT TIMESTAMP_NTZ DEFAULT CURRENT_TIMESTAMP()
+);
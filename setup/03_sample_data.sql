@@ -1,98 +1,170 @@
 -- Sample ESG Data for Demo
--- Realistic data based on typical corporate ESG disclosures
+-- Prior-year One Reports for the company created in 02_tables.sql (SDS), so its FY2023 row
+-- has a trend to compare against, and a second company for the organization picker
 
 USE DATABASE ESG_REPORTING;
 USE SCHEMA PROD;
 
 -- Clear existing sample data (optional - comment out if you want to keep existing data)
--- TRUNCATE TABLE ESG_METRICS;
+-- DELETE FROM ESG_METRICS WHERE REPORT_YEAR IN (2021, 2022);
 
--- Insert sample ESG records for demo organization
+-- Siam Digital Solutions PCL
 INSERT INTO ESG_METRICS (
-    organization_name, reporting_year, reporting_date,
+    ORG_ID, REPORT_YEAR, REPORT_STATUS, SECTOR, SUBMISSION_DEADLINE,
     -- Environmental
-    ghg_scope1_mtco2e, ghg_scope2_mtco2e, energy_consumption_mwh,
-    renewable_energy_pct, water_consumption_m3, waste_generated_tons, waste_recycled_pct,
+    GHG_SCOPE1_TCO2E, GHG_SCOPE2_TCO2E, GHG_SCOPE3_TCO2E, GHG_REDUCTION_TARGET_PCT, GHG_REDUCTION_ACHIEVED_PCT,
+    ENERGY_TOTAL_MWH, ENERGY_RENEWABLE_MWH, ENERGY_INTENSITY, SOLAR_INSTALLED_KW,
+    WATER_CONSUMPTION_M3, WATER_RECYCLED_PCT, WASTE_TOTAL_TONS, WASTE_RECYCLED_PCT, HAZARDOUS_WASTE_TONS, ZERO_WASTE_TO_LANDFILL,
+    ENV_VIOLATIONS, ENV_FINES_THB,
     -- Social
-    total_employees, female_employees_pct, employee_turnover_pct,
-    safety_incidents, training_hours_per_employee,
+    EMPLOYEES_TOTAL, EMPLOYEES_PERMANENT, EMPLOYEES_CONTRACT, NEW_HIRES, TURNOVER_RATE_PCT,
+    WOMEN_WORKFORCE_PCT, WOMEN_MANAGEMENT_PCT, WOMEN_EXECUTIVE_PCT, DISABLED_EMPLOYEES, LOCAL_EMPLOYMENT_PCT,
+    MIN_WAGE_COMPLIANCE, AVG_SALARY_THB, BENEFITS_BEYOND_LEGAL, PROVIDENT_FUND_PCT,
+    LOST_TIME_INJURIES, INJURY_RATE, FATALITIES, SAFETY_TRAINING_HOURS, SAFETY_COMMITTEE,
+    TRAINING_HOURS_AVG, TRAINING_BUDGET_THB, CAREER_DEVELOPMENT_PROGRAM,
+    CSR_BUDGET_THB, COMMUNITY_PROJECTS, LOCAL_SUPPLIER_PCT, SUPPLIER_CODE_OF_CONDUCT, SUPPLIER_ESG_ASSESSMENT,
     -- Governance
-    board_size, board_independence_pct, board_female_pct,
-    has_ethics_policy, has_whistleblower_policy,
-    notes
-) VALUES
--- 2024 Data (most recent)
+    BOARD_TOTAL, BOARD_INDEPENDENT_PCT, BOARD_WOMEN_PCT, BOARD_MEETINGS_YEAR, BOARD_ATTENDANCE_PCT,
+    HAS_AUDIT_COMMITTEE, HAS_RISK_COMMITTEE, HAS_CG_COMMITTEE, HAS_SUSTAINABILITY_COMMITTEE,
+    CODE_OF_CONDUCT, ANTI_CORRUPTION_POLICY, WHISTLEBLOWER_POLICY, ETHICS_TRAINING_PCT, CORRUPTION_CASES,
+    CGR_SCORE, ISO14001_CERTIFIED, ISO45001_CERTIFIED, SET_ESG_RATING, THSI_MEMBER,
+    EXTERNAL_ASSURANCE, ASSURANCE_PROVIDER,
+    NOTES
+)
+SELECT o.ORG_ID, v.*
+FROM ORGANIZATIONS o, (VALUES
+-- FY2022
 (
-    'Acme Corporation', 2024, '2024-03-31',
-    12500.00, 8200.00, 45000.00,
-    35.00, 125000.00, 2800.00, 62.00,
-    1250, 42.00, 12.50,
-    3, 24.00,
-    9, 78.00, 33.00,
-    TRUE, TRUE,
-    'Significant progress on renewable energy transition. New solar installation completed Q2.'
-),
--- 2023 Data
-(
-    'Acme Corporation', 2023, '2023-03-31',
-    14200.00, 9100.00, 48500.00,
-    28.00, 132000.00, 3100.00, 55.00,
-    1180, 40.00, 14.20,
-    5, 22.00,
-    9, 67.00, 22.00,
-    TRUE, TRUE,
-    'Launched sustainability program. Baseline year for many metrics.'
-),
--- 2022 Data
-(
-    'Acme Corporation', 2022, '2022-03-31',
-    15800.00, 10200.00, 52000.00,
-    18.00, 145000.00, 3500.00, 48.00,
-    1150, 38.00, 15.80,
-    7, 18.00,
-    8, 62.50, 12.50,
-    TRUE, FALSE,
-    'Pre-sustainability initiative baseline.'
+    2022, 'Approved', 'Technology', '2023-04-30',
+    -- Environmental
+    9300, 4900, 47500, 15, 7,
+    26200, 6550, 3.1, 250,
+    192000, 28, 505, 68, 14, FALSE,
+    1, 150000,
+    -- Social
+    1720, 1520, 200, 240, 9.8,
+    44, 35, 22, 25, 83,
+    TRUE, 43000, TRUE, 5,
+    5, 0.58, 0, 4600, TRUE,
+    24, 2400000, TRUE,
+    4800000, 10, 68, TRUE, FALSE,
+    -- Governance
+    11, 45, 18, 11, 93,
+    TRUE, TRUE, TRUE, TRUE,
+    TRUE, TRUE, TRUE, 95, 0,
+    '4 Stars', TRUE, TRUE, TRUE, FALSE,
+    TRUE, 'KPMG Thailand',
+    'FY2022 One Report - first year of rooftop solar'
 ),
--- 2021 Data (historical)
+-- FY2021
 (
-    'Acme Corporation', 2021, '2021-03-31',
-    16500.00, 11000.00, 54000.00,
-    12.00, 152000.00, 3800.00, 42.00,
-    1100, 36.00, 16.50,
-    9, 16.00,
-    8, 62.50, 12.50,
-    TRUE, FALSE,
-    'COVID-19 impact year. Reduced office operations.'
-),
--- Additional company for comparison
+    2021, 'Approved', 'Technology', '2022-04-30',
+    -- Environmental
+    9800, 5400, 49000, 10, 4,
+    26800, 4820, 3.4, 0,
+    201000, 22, 540, 61, 16, FALSE,
+    2, 320000,
+    -- Social
+    1610, 1390, 220, 210, 11.2,
+    43, 33, 20, 22, 80,
+    TRUE, 41500, TRUE, 3,
+    7, 0.71, 1, 3900, TRUE,
+    20, 1900000, FALSE,
+    4100000, 8, 64, TRUE, FALSE,
+    -- Governance
+    10, 40, 10, 10, 91,
+    TRUE, TRUE, FALSE, FALSE,
+    TRUE, TRUE, TRUE, 90, 1,
+    '3 Stars', TRUE, FALSE, FALSE, FALSE,
+    FALSE, NULL,
+    'FY2021 One Report'
+)) v
+WHERE o.SET_SYMBOL = 'SDS';
+
+-- Chao Phraya Agro Industries PCL
+INSERT INTO ORGANIZATIONS (ORG_NAME, SET_SYMBOL, SECTOR)
+VALUES ('Chao Phraya Agro Industries PCL', 'CPAI', 'Agro & Food');
+
+INSERT INTO ESG_METRICS (
+    ORG_ID, REPORT_YEAR, REPORT_STATUS, SECTOR, SUBMISSION_DEADLINE,
+    -- Environmental
+    GHG_SCOPE1_TCO2E, GHG_SCOPE2_TCO2E, GHG_SCOPE3_TCO2E, GHG_REDUCTION_TARGET_PCT, GHG_REDUCTION_ACHIEVED_PCT,
+    ENERGY_TOTAL_MWH, ENERGY_RENEWABLE_MWH, ENERGY_INTENSITY, SOLAR_INSTALLED_KW,
+    WATER_CONSUMPTION_M3, WATER_RECYCLED_PCT, WASTE_TOTAL_TONS, WASTE_RECYCLED_PCT, HAZARDOUS_WASTE_TONS, ZERO_WASTE_TO_LANDFILL,
+    ENV_VIOLATIONS, ENV_FINES_THB,
+    -- Social
+    EMPLOYEES_TOTAL, EMPLOYEES_PERMANENT, EMPLOYEES_CONTRACT, NEW_HIRES, TURNOVER_RATE_PCT,
+    WOMEN_WORKFORCE_PCT, WOMEN_MANAGEMENT_PCT, WOMEN_EXECUTIVE_PCT, DISABLED_EMPLOYEES, LOCAL_EMPLOYMENT_PCT,
+    MIN_WAGE_COMPLIANCE, AVG_SALARY_THB, BENEFITS_BEYOND_LEGAL, PROVIDENT_FUND_PCT,
+    LOST_TIME_INJURIES, INJURY_RATE, FATALITIES, SAFETY_TRAINING_HOURS, SAFETY_COMMITTEE,
+    TRAINING_HOURS_AVG, TRAINING_BUDGET_THB, CAREER_DEVELOPMENT_PROGRAM,
+    CSR_BUDGET_THB, COMMUNITY_PROJECTS, LOCAL_SUPPLIER_PCT, SUPPLIER_CODE_OF_CONDUCT, SUPPLIER_ESG_ASSESSMENT,
+    -- Governance
+    BOARD_TOTAL, BOARD_INDEPENDENT_PCT, BOARD_WOMEN_PCT, BOARD_MEETINGS_YEAR, BOARD_ATTENDANCE_PCT,
+    HAS_AUDIT_COMMITTEE, HAS_RISK_COMMITTEE, HAS_CG_COMMITTEE, HAS_SUSTAINABILITY_COMMITTEE,
+    CODE_OF_CONDUCT, ANTI_CORRUPTION_POLICY, WHISTLEBLOWER_POLICY, ETHICS_TRAINING_PCT, CORRUPTION_CASES,
+    CGR_SCORE, ISO14001_CERTIFIED, ISO45001_CERTIFIED, SET_ESG_RATING, THSI_MEMBER,
+    EXTERNAL_ASSURANCE, ASSURANCE_PROVIDER,
+    NOTES
+)
+SELECT o.ORG_ID, v.*
+FROM ORGANIZATIONS o, (VALUES
+-- FY2023
 (
-    'GreenTech Industries', 2024, '2024-03-31',
-    5200.00, 3100.00, 28000.00,
-    65.00, 45000.00, 1200.00, 78.00,
-    620, 48.00, 8.50,
-    1, 32.00,
-    7, 86.00, 43.00,
-    TRUE, TRUE,
-    'Industry leader in sustainability. Carbon neutral target 2030.'
+    2023, 'In Review', 'Agro & Food', '2024-04-30',
+    -- Environmental
+    41000, 23500, 310000, 20, 9,
+    118000, 27100, 5.6, 3200,
+    2650000, 41, 6900, 82, 150, FALSE,
+    0, 0,
+    -- Social
+    5400, 3900, 1500, 920, 14.2,
+    46, 31, 18, 40, 91,
+    TRUE, 23500, TRUE, 3,
+    22, 1.05, 0, 18800, TRUE,
+    16, 3900000, TRUE,
+    12500000, 34, 88, TRUE, TRUE,
+    -- Governance
+    12, 42, 25, 9, 96,
+    TRUE, TRUE, TRUE, TRUE,
+    TRUE, TRUE, TRUE, 92, 0,
+    '4 Stars', TRUE, FALSE, TRUE, FALSE,
+    TRUE, 'EY Thailand',
+    'FY2023 One Report - draft for board review'
 ),
+-- FY2022
 (
-    'GreenTech Industries', 2023, '2023-03-31',
-    6100.00, 3800.00, 31000.00,
-    55.00, 52000.00, 1450.00, 72.00,
-    580, 46.00, 9.20,
-    2, 28.00,
-    7, 86.00, 43.00,
-    TRUE, TRUE,
-    'Major renewable energy contract signed.'
-);
+    2022, 'Approved', 'Agro & Food', '2023-04-30',
+    -- Environmental
+    43500, 25200, 318000, 20, 4,
+    121000, 21800, 5.9, 1800,
+    2790000, 36, 7200, 78, 165, FALSE,
+    1, 85000,
+    -- Social
+    5250, 3750, 1500, 880, 15.1,
+    45, 29, 15, 36, 90,
+    TRUE, 22800, TRUE, 3,
+    27, 1.31, 1, 17100, TRUE,
+    14, 3400000, FALSE,
+    11000000, 30, 86, TRUE, FALSE,
+    -- Governance
+    12, 42, 17, 9, 94,
+    TRUE, TRUE, TRUE, FALSE,
+    TRUE, TRUE, TRUE, 85, 0,
+    '3 Stars', TRUE, FALSE, FALSE, FALSE,
+    FALSE, NULL,
+    'FY2022 One Report'
+)) v
+WHERE o.SET_SYMBOL = 'CPAI';
 
 -- Verify data
 SELECT
-    organization_name,
-    reporting_year,
-    ghg_scope1_mtco2e + ghg_scope2_mtco2e AS total_emissions,
-    renewable_energy_pct,
-    total_employees
-FROM ESG_METRICS
-ORDER BY organization_name, reporting_year DESC;
+    o.SET_SYMBOL,
+    m.REPORT_YEAR,
+    m.REPORT_STATUS,
+    m.GHG_SCOPE1_TCO2E + COALESCE(m.GHG_SCOPE2_TCO2E, 0) AS TOTAL_EMISSIONS,
+    ROUND(m.ENERGY_RENEWABLE_MWH / NULLIF(m.ENERGY_TOTAL_MWH, 0) * 100, 1) AS RENEWABLE_PCT,
+    m.EMPLOYEES_TOTAL
+FROM ESG_METRICS m
+JOIN ORGANIZATIONS o ON o.ORG_ID = m.ORG_ID
+ORDER BY o.SET_SYMBOL, m.REPORT_YEAR DESC;
@@ -0,0 +1,90 @@
+-- Migrate a single-company deployment to per-organization reports
+-- Run once on a database created before ORGANIZATIONS existed, instead of
+-- 02_tables.sql (which drops ESG_METRICS). Every existing report is assigned
+-- to one default organization; set its name, SET symbol and sector below.
+
+USE DATABASE ESG_REPORTING;
+USE SCHEMA PROD;
+
+SET DEFAULT_ORG_NAME = 'Siam Digital Solutions PCL';
+SET DEFAULT_SET_SYMBOL = 'SDS';
+SET DEFAULT_SECTOR = 'Technology';
+
+-- Same definition as 02_tables.sql
+CREATE TABLE IF NOT EXISTS ORGANIZATIONS (
+    ORG_ID INTEGER AUTOINCREMENT PRIMARY KEY,
+    ORG_NAME VARCHAR(200) NOT NULL COMMENT 'Registered company name',
+    SET_SYMBOL VARCHAR(20) COMMENT 'SET ticker symbol',
+    SECTOR VARCHAR(50) COMMENT 'SET sector classification',
+    CREATED_BY VARCHAR(100) DEFAULT CURRENT_USER(),
+    CREATED_AT TIMESTAMP_NTZ DEFAULT CURRENT_TIMESTAMP(),
+    UPDATED_AT TIMESTAMP_NTZ,
+
+    UNIQUE (SET_SYMBOL)
+);
+
+MERGE INTO ORGANIZATIONS o
+USING (SELECT $DEFAULT_SET_SYMBOL AS SET_SYMBOL) s ON o.SET_SYMBOL = s.SET_SYMBOL
+WHEN NOT MATCHED THEN INSERT (ORG_NAME, SET_SYMBOL, SECTOR)
+    VALUES ($DEFAULT_ORG_NAME, $DEFAULT_SET_SYMBOL, $DEFAULT_SECTOR);
+
+-- Existing reports belong to the default organization; UPDATED_AT is left alone
+-- so the backfill does not show up as an edit
+ALTER TABLE ESG_METRICS ADD COLUMN IF NOT EXISTS
+    ORG_ID INTEGER COMMENT 'Reporting company, see ORGANIZATIONS';
+
+UPDATE ESG_METRICS
+SET ORG_ID = (SELECT ORG_ID FROM ORGANIZATIONS WHERE SET_SYMBOL = $DEFAULT_SET_SYMBOL)
+WHERE ORG_ID IS NULL;
+
+ALTER TABLE ESG_METRICS ALTER COLUMN ORG_ID SET NOT NULL;
+
+-- One report per company and year, instead of one per year
+ALTER TABLE ESG_METRICS DROP UNIQUE (REPORT_YEAR);
+ALTER TABLE ESG_METRICS ADD UNIQUE (ORG_ID, REPORT_YEAR);
+ALTER TABLE ESG_METRICS ADD FOREIGN KEY (ORG_ID) REFERENCES ORGANIZATIONS (ORG_ID);
+ALTER TABLE ESG_METRICS CLUSTER BY (ORG_ID, REPORT_YEAR);
+
+-- Same definition as 02_tables.sql; narratives are derived data, so they are
+-- recreated rather than migrated and regenerate on the next AI Insights run
+CREATE OR REPLACE TABLE ESG_NARRATIVES (
+    ORG_ID INTEGER NOT NULL,
+    REPORT_YEAR INTEGER NOT NULL,
+    SECTION VARCHAR(30) NOT NULL COMMENT 'Subsection key, see utils/narratives.py',
+    PILLAR VARCHAR(1) COMMENT 'E, S or G',
+    MODEL VARCHAR(100),
+    PROMPT_HASH VARCHAR(64) COMMENT 'SHA-256 of the prompt, unchanged inputs are not regenerated',
+    NARRATIVE TEXT,
+    CREATED_BY VARCHAR(100) DEFAULT CURRENT_USER(),
+    CREATED_AT TIMESTAMP_NTZ DEFAULT CURRENT_TIMESTAMP(),
+    UPDATED_AT TIMESTAMP_NTZ,
+    PRIMARY KEY (ORG_ID, REPORT_YEAR, SECTION)
+)
+CLUSTER BY (ORG_ID);
+
+-- Same definition as 02_tables.sql
+CREATE OR REPLACE VIEW ONE_REPORT_SUMMARY AS
+SELECT
+    m.ORG_ID,
+    o.ORG_NAME,
+    REPORT_YEAR,
+    REPORT_STATUS,
+    m.SECTOR,
+    -- E Score inputs
+    GHG_SCOPE1_TCO2E + COALESCE(GHG_SCOPE2_TCO2E, 0) AS TOTAL_EMISSIONS,
+    ROUND(ENERGY_RENEWABLE_MWH / NULLIF(ENERGY_TOTAL_MWH, 0) * 100, 1) AS RENEWABLE_PCT,
+    WASTE_RECYCLED_PCT,
+    -- S Score inputs
+    EMPLOYEES_TOTAL,
+    WOMEN_MANAGEMENT_PCT,
+    INJURY_RATE,
+    TRAINING_HOURS_AVG,
+    -- G Score inputs
+    BOARD_INDEPENDENT_PCT,
+    BOARD_WOMEN_PCT,
+    CGR_SCORE,
+    SET_ESG_RATING,
+    m.CREATED_AT
+FROM ESG_METRICS m
+JOIN ORGANIZATIONS o ON o.ORG_ID = m.ORG_ID
+ORDER BY m.ORG_ID, REPORT_YEAR DESC;
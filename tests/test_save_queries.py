@@ -0,0 +1,150 @@
+"""
+Query budget of the save path
+Runs the write API against the local DuckDB backend and fails if a save
+costs more round-trips than expected. Then drives the app's own E and S
+save handlers with Streamlit's AppTest and checks the rows they actually
+write: a new year, a save that only accepts the form defaults, a no-op save
+and an edit.
+"""
+import os
+
+import pytest
+
+from utils import database
+from utils.local_backend import LocalSession, set_local_session
+from utils.schema import changed_fields
+
+# The sample organization seeded by setup/02_tables.sql
+ORG_ID = 1
+
+ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
+APP_TIMEOUT = 60
+NEW_YEAR = 2025
+
+
+@pytest.fixture
+def session():
+    """Schema and the FY2023 row only, every section cached, no queries recorded"""
+    database.invalidate_cache()
+    session = LocalSession(sample_data=False)
+    for section in database.SECTION_COLUMNS:
+        database.load_section(session, ORG_ID, section)
+    session.queries.clear()
+    yield session
+    database.invalidate_cache()
+
+
+def test_warm_section_read_is_one_fingerprint_query(session):
+    database.load_section(session, ORG_ID, "social")
+    assert len(session.queries) == 1
+
+
+def test_noop_save_runs_no_queries(session):
+    row = database.load_section(session, ORG_ID, "social").iloc[0].to_dict()
+    session.queries.clear()
+    if changed_fields(row, {"EMPLOYEES_TOTAL": row["EMPLOYEES_TOTAL"]}):
+        database.update_report(session, ORG_ID, 2023, {"EMPLOYEES_TOTAL": row["EMPLOYEES_TOTAL"]})
+    assert len(session.queries) == 0
+
+
+def test_edit_save_is_update_reselect_and_fingerprint(session):
+    database.update_report(session, ORG_ID, 2023, {"EMPLOYEES_TOTAL": 1900})
+    assert len(session.queries) == 3
+    session.queries.clear()
+
+    # The saved row is patched into the cache, so the next read is a hit
+    df = database.load_section(session, ORG_ID, "dashboard")
+    assert len(session.queries) == 1
+    assert int(df.loc[df["REPORT_YEAR"] == 2023, "EMPLOYEES_TOTAL"].iloc[0]) == 1900
+
+
+def test_new_year_is_update_miss_insert_reselect_and_fingerprint(session):
+    misses = database.cache_stats()["misses"]
+    database.upsert_report(session, ORG_ID, 2024, {"SECTOR": "Services"})
+    assert len(session.queries) == 4
+    session.queries.clear()
+
+    df = database.load_section(session, ORG_ID, "environmental")
+    assert len(session.queries) == 1
+    assert 2024 in set(df["REPORT_YEAR"])
+    assert database.cache_stats()["misses"] == misses
+
+
+def _problems(at) -> list:
+    return [e.value for e in at.error] + [str(e.value) for e in at.exception]
+
+
+def _writes(session) -> list:
+    return [q.sql for q in session.queries if q.sql.lstrip().upper().startswith(("INSERT", "UPDATE"))]
+
+
+def _stored(session, org_id: int, column: str):
+    rows = session.sql(f"SELECT {column} FROM {database.TABLE} WHERE ORG_ID = ? AND REPORT_YEAR = ?",
+                       params=[org_id, NEW_YEAR]).collect()
+    return rows[0][0] if rows else None
+
+
+def _employees(at):
+    return next(n for n in at.number_input if n.label == "Total Employees")
+
+
+def _save(at, label: str):
+    next(b for b in at.button if b.label == label).click().run()
+
+
+@pytest.fixture
+def app(monkeypatch):
+    """(AppTest, local session, ORG_ID) of streamlit_app.py on fresh sample data, FY2025 created"""
+    from streamlit.testing.v1 import AppTest
+
+    monkeypatch.setenv("ESG_BACKEND", "local")
+    monkeypatch.delenv("ESG_LOCAL_DB", raising=False)
+    database.invalidate_cache()
+    session = LocalSession()
+    set_local_session(session)
+
+    at = AppTest.from_file(os.path.join(ROOT, "streamlit_app.py"), default_timeout=APP_TIMEOUT).run()
+    assert not _problems(at)
+    org_id = at.sidebar.selectbox(key="org_id").value
+
+    at.radio(key="section").set_value("E - Environmental").run()
+    at.number_input(key="env_year").set_value(NEW_YEAR).run()
+    _save(at, "Save Environmental Data")
+    yield at, session, org_id
+    set_local_session(None)
+    database.invalidate_cache()
+
+
+def test_create_year_from_environmental(app):
+    at, session, org_id = app
+    assert not _problems(at)
+    assert _stored(session, org_id, "ENERGY_TOTAL_MWH") is not None
+    # st.rerun after the create puts the new year in the selector
+    assert f"Edit FY{NEW_YEAR}" in at.selectbox(key="env_action").options
+
+
+def test_new_year_takes_the_company_sector(app):
+    at, session, org_id = app
+    assert _stored(session, org_id, "SECTOR") == database.load_organization(session, org_id).get("SECTOR")
+
+
+def test_social_save_handler(app):
+    at, session, org_id = app
+    at.radio(key="section").set_value("S - Social").run()
+    at.selectbox(key="social_year").set_value(NEW_YEAR).run()
+    shown = _employees(at).value
+
+    # Saving the defaults the form shows writes them
+    _save(at, "Save Social Data")
+    assert _stored(session, org_id, "EMPLOYEES_TOTAL") == shown
+
+    session.queries.clear()
+    _save(at, "Save Social Data")
+    assert _writes(session) == []
+    assert any(i.value == "No changes to save" for i in at.info)
+
+    _employees(at).set_value(shown + 50)
+    session.queries.clear()
+    _save(at, "Save Social Data")
+    assert len(_writes(session)) == 1
+    assert _stored(session, org_id, "EMPLOYEES_TOTAL") == shown + 50
@@ -0,0 +1,3 @@
+"""
+Shared helpers for the SET ESG One Report app
+"""
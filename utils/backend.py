@@ -0,0 +1,26 @@
+"""
+Session for the configured backend
+ESG_BACKEND=snowflake (the default) uses the active Snowpark session of
+Streamlit in Snowflake; ESG_BACKEND=local uses the DuckDB stand-in from
+utils/local_backend.py, so the app runs without a Snowflake account.
+Either way the session comes wrapped by utils/instrumentation.py, which
+times each query for the Performance panel and APP_QUERY_LOG.
+"""
+import os
+
+from utils.instrumentation import instrument
+
+
+def backend() -> str:
+    return os.environ.get("ESG_BACKEND", "snowflake").lower()
+
+
+def get_session(page: str = None):
+    """The instrumented session for this rerun; page labels queries outside a section"""
+    if backend() == "local":
+        from utils.local_backend import local_session
+
+        return instrument(local_session(), page)
+    from snowflake.snowpark.context import get_active_session
+
+    return instrument(get_active_session(), page)
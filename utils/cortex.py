@@ -0,0 +1,513 @@
+"""
+Cached Cortex COMPLETE calls
+Responses are content-addressed by sha256(model, prompt, data fingerprint),
+so asking the same question about unchanged data never calls the model
+twice, and any write to ESG_METRICS moves the fingerprint and bypasses
+stale answers automatically. Two tiers: an in-process LRU shared by every
+Streamlit session, backed by the CORTEX_RESPONSE_CACHE table so answers
+survive restarts and are shared across app instances.
+The data context put in front of a prompt is aggregated in the warehouse by
+one GROUPING SETS query and cached on the same fingerprint.
+Questions can also run as background jobs (submit()), so the page stays
+interactive while Cortex works and several questions run at once.
+"""
+import hashlib
+import logging
+import threading
+import time
+import uuid
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+
+from utils.database import TABLE, data_fingerprint
+from utils.instrumentation import unwrap
+
+log = logging.getLogger(__name__)
+
+# Optional: snowflake-ml-python streams the answer token by token. Without it
+# jobs run as async SQL queries and the answer arrives in one piece.
+try:
+    from snowflake.cortex import Complete as _stream_complete
+except ImportError:
+    _stream_complete = None
+
+DEFAULT_MODEL = "claude-3-5-sonnet"
+
+# Streaming jobs each hold a worker thread; more than this many wait in a queue
+MAX_CONCURRENT_JOBS = 4
+
+RESPONSE_TABLE = "CORTEX_RESPONSE_CACHE"
+
+# Memory tier bounds; the table tier is bounded by TTL and MAX_TABLE_ROWS
+MAX_ENTRIES = 256
+TTL_SECONDS = 7 * 24 * 3600
+MAX_TABLE_ROWS = 10000
+
+# Expired and excess table rows are pruned once every this many stores
+PRUNE_EVERY = 50
+
+# Snowflake errors that mean the table tier cannot work in this deployment:
+# 2003 object does not exist or not authorized, 3001 insufficient privileges
+TABLE_UNAVAILABLE_CODES = (2003, 3001)
+TABLE_UNAVAILABLE_MESSAGES = ("does not exist", "not authorized", "insufficient privileges")
+
+COMPLETE_SQL = "SELECT SNOWFLAKE.CORTEX.COMPLETE(?, ?) AS RESPONSE"
+
+LOOKUP_SQL = f"""SELECT RESPONSE, LATENCY_MS FROM {RESPONSE_TABLE}
+    WHERE CACHE_KEY = ? AND EXPIRES_AT > CURRENT_TIMESTAMP()"""
+
+STORE_SQL = f"""MERGE INTO {RESPONSE_TABLE} t
+    USING (SELECT ? AS CACHE_KEY, ? AS MODEL, ? AS RESPONSE, ? AS LATENCY_MS) s
+    ON t.CACHE_KEY = s.CACHE_KEY
+    WHEN MATCHED THEN UPDATE SET RESPONSE = s.RESPONSE, LATENCY_MS = s.LATENCY_MS,
+        CREATED_AT = CURRENT_TIMESTAMP(), EXPIRES_AT = DATEADD(second, ?, CURRENT_TIMESTAMP())
+    WHEN NOT MATCHED THEN INSERT (CACHE_KEY, MODEL, RESPONSE, LATENCY_MS, CREATED_AT, EXPIRES_AT)
+        VALUES (s.CACHE_KEY, s.MODEL, s.RESPONSE, s.LATENCY_MS, CURRENT_TIMESTAMP(),
+                DATEADD(second, ?, CURRENT_TIMESTAMP()))"""
+
+# Upper bounds on what the context query returns and on the prompt text built from it
+MAX_CONTEXT_GROUPS = 64
+MAX_CONTEXT_CHARS = 4000
+
+# Overall and per-year statistics of one organization in one scan; the () set comes first.
+# Only that organization's rows are read, so the result moves with its own fingerprint
+CONTEXT_SQL = f"""SELECT GROUPING(REPORT_YEAR) AS G_YEAR, REPORT_YEAR, COUNT(*) AS REPORTS,
+    MIN(REPORT_YEAR) AS FIRST_YEAR, MAX(REPORT_YEAR) AS LAST_YEAR,
+    SUM(CASE WHEN REPORT_STATUS = 'Approved' THEN 1 ELSE 0 END) AS APPROVED,
+    SUM(GHG_SCOPE1_TCO2E) AS SCOPE1, SUM(GHG_SCOPE2_TCO2E) AS SCOPE2, SUM(GHG_SCOPE3_TCO2E) AS SCOPE3,
+    AVG(GHG_REDUCTION_ACHIEVED_PCT) AS REDUCTION_PCT,
+    SUM(ENERGY_RENEWABLE_MWH) * 100 / NULLIF(SUM(ENERGY_TOTAL_MWH), 0) AS RENEWABLE_PCT,
+    AVG(WASTE_RECYCLED_PCT) AS WASTE_RECYCLED_PCT,
+    SUM(EMPLOYEES_TOTAL) AS EMPLOYEES, AVG(WOMEN_MANAGEMENT_PCT) AS WOMEN_MANAGEMENT_PCT,
+    AVG(INJURY_RATE) AS INJURY_RATE, SUM(FATALITIES) AS FATALITIES,
+    AVG(TRAINING_HOURS_AVG) AS TRAINING_HOURS, AVG(BOARD_INDEPENDENT_PCT) AS BOARD_INDEPENDENT_PCT
+    FROM {TABLE}
+    WHERE ORG_ID = ?
+    GROUP BY GROUPING SETS ((), (REPORT_YEAR))
+    ORDER BY G_YEAR DESC, REPORT_YEAR DESC
+    LIMIT ?"""
+
+# (label, result column, format) for one line of context; None values are skipped
+CONTEXT_FIELDS = [
+    ("GHG Scope 1", "SCOPE1", "{:,.0f} tCO2e"),
+    ("Scope 2", "SCOPE2", "{:,.0f} tCO2e"),
+    ("Scope 3", "SCOPE3", "{:,.0f} tCO2e"),
+    ("GHG reduction achieved", "REDUCTION_PCT", "{:.1f}%"),
+    ("Renewable energy", "RENEWABLE_PCT", "{:.1f}%"),
+    ("Waste recycled", "WASTE_RECYCLED_PCT", "{:.1f}%"),
+    ("Employees", "EMPLOYEES", "{:,.0f}"),
+    ("Women in management", "WOMEN_MANAGEMENT_PCT", "{:.1f}%"),
+    ("Injury rate", "INJURY_RATE", "{:.2f}"),
+    ("Fatalities", "FATALITIES", "{:,.0f}"),
+    ("Training", "TRAINING_HOURS", "{:.1f} h/employee"),
+    ("Independent board", "BOARD_INDEPENDENT_PCT", "{:.1f}%"),
+]
+
+PRUNE_SQL = f"""DELETE FROM {RESPONSE_TABLE} WHERE EXPIRES_AT <= CURRENT_TIMESTAMP()
+    OR CACHE_KEY NOT IN (SELECT CACHE_KEY FROM {RESPONSE_TABLE} ORDER BY CREATED_AT DESC LIMIT ?)"""
+
+
+def cache_key(model: str, prompt: str, fingerprint) -> str:
+    """Content address of one completion"""
+    material = "\x1f".join([model, prompt, repr(fingerprint)])
+    return hashlib.sha256(material.encode("utf-8")).hexdigest()
+
+
+class ResponseCache:
+    """LRU + TTL memory tier in front of a Snowflake table tier
+
+    The table tier is optional: if the table is missing or not accessible
+    it is switched off for the process and only memory is used. Any other
+    failure (network, warehouse timeout) only skips that one call.
+    """
+
+    def __init__(self, max_entries: int = MAX_ENTRIES, ttl: float = TTL_SECONDS, use_table: bool = True):
+        self._lock = threading.Lock()
+        self._entries = OrderedDict()  # key -> (expires at, response, latency ms)
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.use_table = use_table
+        self.memory_hits = 0
+        self.table_hits = 0
+        self.misses = 0
+        self.saved_ms = 0.0
+        self.evictions = 0
+        self.table_errors = 0
+        self._stores = 0
+
+    def _get_memory(self, key: str):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            if entry[0] <= time.time():
+                del self._entries[key]
+                self.evictions += 1
+                return None
+            self._entries.move_to_end(key)
+            return entry
+
+    def _put_memory(self, key: str, response: str, latency_ms: float):
+        with self._lock:
+            self._entries[key] = (time.time() + self.ttl, response, latency_ms)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+
+    def _table(self, session, sql: str, params: list, nowait: bool = False):
+        if not self.use_table:
+            return None
+        try:
+            query = session.sql(sql, params=params)
+            if nowait and hasattr(query, "collect_nowait"):
+                return query.collect_nowait()
+            return query.collect()
+        except Exception as e:
+            self.table_failed(e)
+            return None
+
+    def table_failed(self, error: Exception):
+        """Count a failed table tier query; switch the tier off only if the table is unusable"""
+        with self._lock:
+            self.table_errors += 1
+        if _table_unavailable(error):
+            log.warning("Switching off the %s tier: %s", RESPONSE_TABLE, error)
+            self.use_table = False
+        else:
+            log.warning("%s query failed, skipping it: %s", RESPONSE_TABLE, error)
+
+    def memory(self, key: str):
+        """Cached response from the memory tier, or None"""
+        entry = self._get_memory(key)
+        if entry is None:
+            return None
+        with self._lock:
+            self.memory_hits += 1
+            self.saved_ms += entry[2]
+        return entry[1]
+
+    def accept(self, key: str, rows, lookup_ms: float):
+        """Cached response from LOOKUP_SQL result rows, or None"""
+        if not rows:
+            return None
+        response, latency_ms = rows[0]["RESPONSE"], float(rows[0]["LATENCY_MS"] or 0)
+        self._put_memory(key, response, latency_ms)
+        with self._lock:
+            self.table_hits += 1
+            self.saved_ms += max(latency_ms - lookup_ms, 0.0)
+        return response
+
+    def lookup(self, session, key: str) -> tuple:
+        """(response, "memory" | "table") or (None, None) on a miss"""
+        response = self.memory(key)
+        if response is not None:
+            return response, "memory"
+        started = time.perf_counter()
+        rows = self._table(session, LOOKUP_SQL, [key])
+        response = self.accept(key, rows, (time.perf_counter() - started) * 1000)
+        return (response, "table") if response is not None else (None, None)
+
+    def store(self, session, key: str, model: str, response: str, latency_ms: float, nowait: bool = False):
+        """Record a model answer in both tiers"""
+        with self._lock:
+            self.misses += 1
+            self._stores += 1
+            prune = self._stores % PRUNE_EVERY == 0
+        self._put_memory(key, response, latency_ms)
+        self._table(session, STORE_SQL, [key, model, response, round(latency_ms), int(self.ttl), int(self.ttl)], nowait)
+        if prune:
+            self._table(session, PRUNE_SQL, [MAX_TABLE_ROWS], nowait)
+
+    def complete(self, session, model: str, prompt: str, fingerprint) -> tuple:
+        """Return (response, source) where source is "memory", "table" or "model" """
+        key = cache_key(model, prompt, fingerprint)
+        response, source = self.lookup(session, key)
+        if response is not None:
+            return response, source
+        started = time.perf_counter()
+        response = session.sql(COMPLETE_SQL, params=[model, prompt]).collect()[0]["RESPONSE"]
+        self.store(session, key, model, response, (time.perf_counter() - started) * 1000)
+        return response, "model"
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self) -> dict:
+        with self._lock:
+            hits = self.memory_hits + self.table_hits
+            total = hits + self.misses
+            return {
+                "memory_hits": self.memory_hits,
+                "table_hits": self.table_hits,
+                "misses": self.misses,
+                "hit_rate": hits / total if total else 0.0,
+                "saved_seconds": self.saved_ms / 1000,
+                "entries": len(self._entries),
+                "evictions": self.evictions,
+                "table_tier": self.use_table,
+                "table_errors": self.table_errors,
+            }
+
+
+def _table_unavailable(error: Exception) -> bool:
+    """True for a missing table or missing privileges, not for transient failures"""
+    if getattr(error, "sql_error_code", None) in TABLE_UNAVAILABLE_CODES:
+        return True
+    message = str(error).lower()
+    # The local DuckDB backend raises CatalogException for a missing table
+    return type(error).__name__ == "CatalogException" or any(m in message for m in TABLE_UNAVAILABLE_MESSAGES)
+
+
+# One cache per Python process, like the data cache
+_responses = ResponseCache()
+
+
+def complete(session, prompt: str, model: str = DEFAULT_MODEL, fingerprint=None) -> tuple:
+    """Cortex COMPLETE through the response cache; returns (response, source)
+
+    fingerprint defaults to the current ESG_METRICS fingerprint, so answers
+    about the data are recomputed after any write. Pass the organization's
+    data_fingerprint() to only react to writes to that company's rows.
+    """
+    if fingerprint is None:
+        fingerprint = data_fingerprint(session)
+    return _responses.complete(session, model, prompt, fingerprint)
+
+
+def _metrics(row) -> str:
+    return ", ".join(f"{label} {fmt.format(float(row[column]))}"
+                     for label, column, fmt in CONTEXT_FIELDS if row[column] is not None)
+
+
+def format_context(rows: list, max_chars: int = MAX_CONTEXT_CHARS) -> str:
+    """Prompt text for the CONTEXT_SQL result, truncated at whole lines to max_chars"""
+    overall = next((r for r in rows if r["G_YEAR"]), None)
+    if overall is None or not overall["REPORTS"]:
+        return ""
+    lines = [
+        "ESG Data Summary:",
+        f"- Reports: {overall['REPORTS']} ({overall['APPROVED']} approved), "
+        f"years {overall['FIRST_YEAR']} to {overall['LAST_YEAR']}",
+        f"- All years: {_metrics(overall)}",
+    ]
+    years = [r for r in rows if not r["G_YEAR"]]
+    if years:
+        lines.append("By year (newest first):")
+        lines += [f"- {r['REPORT_YEAR']}: {_metrics(r)}" for r in years]
+
+    text = ""
+    for i, line in enumerate(lines):
+        omitted = f"\n- ... {len(lines) - i} more lines omitted"
+        if len(text) + len(line) + 1 + len(omitted) > max_chars and i > 0:
+            return text + omitted
+        text += ("\n" if text else "") + line
+    return text
+
+
+class ContextCache:
+    """Prompt context per organization; only its latest fingerprint is kept"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._texts = {}  # org_id -> ((fingerprint, max_chars), text)
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, session, org_id: int, fingerprint, max_chars: int = MAX_CONTEXT_CHARS) -> str:
+        key = (fingerprint, max_chars)
+        with self._lock:
+            cached = self._texts.get(org_id)
+            if cached is not None and cached[0] == key:
+                self.hits += 1
+                return cached[1]
+        rows = session.sql(CONTEXT_SQL, params=[org_id, MAX_CONTEXT_GROUPS]).collect()
+        text = format_context(rows, max_chars)
+        with self._lock:
+            self._texts[org_id] = (key, text)
+            self.misses += 1
+        return text
+
+
+_contexts = ContextCache()
+
+
+def data_context(session, org_id: int, fingerprint=None, max_chars: int = MAX_CONTEXT_CHARS) -> str:
+    """Aggregated ESG_METRICS summary of one organization for prompts; empty string if there is no data
+
+    Computed in the warehouse (one small result set) and rebuilt only when
+    the organization's fingerprint moves. Pass the fingerprint used for
+    complete() to avoid a second fingerprint query.
+    """
+    org_id = int(org_id)
+    if fingerprint is None:
+        fingerprint = data_fingerprint(session, org_id)
+    return _contexts.get(session, org_id, fingerprint, max_chars)
+
+
+def response_cache_stats() -> dict:
+    """Hit rate and model time saved by the response cache"""
+    return _responses.stats()
+
+
+_workers = ThreadPoolExecutor(max_workers=MAX_CONCURRENT_JOBS, thread_name_prefix="cortex")
+
+
+class CortexJob:
+    """One question answered in the background
+
+    poll() advances the job without blocking; text is the answer so far.
+    Streaming jobs run on the shared worker pool, other jobs are async
+    Snowflake queries (collect_nowait), so waiting costs no server thread.
+    Finished answers are written to the response cache.
+    """
+
+    def __init__(self, session, label: str, prompt: str, model: str, fingerprint):
+        self.id = uuid.uuid4().hex[:8]
+        self.label = label
+        self.model = model
+        self.prompt = prompt
+        self.key = cache_key(model, prompt, fingerprint)
+        self.status = "queued"  # queued, running, done, failed, cancelled
+        self.source = None  # memory, table or model once done
+        self.error = None
+        self.submitted = time.time()
+        self.elapsed = None
+        self._session = session
+        self._lock = threading.Lock()
+        self._chunks = []
+        self._cancelled = threading.Event()
+        self._future = None
+        self._query = None  # Snowpark AsyncJob of the current phase
+        self._phase = None  # "lookup" or "complete" for async jobs
+        self._started = None
+
+    @property
+    def text(self) -> str:
+        with self._lock:
+            return "".join(self._chunks)
+
+    @property
+    def done(self) -> bool:
+        return self.status in ("done", "failed", "cancelled")
+
+    def _finish(self, status: str, source: str = None, error: str = None):
+        with self._lock:
+            if self.status == "cancelled":
+                return
+            self.status, self.source, self.error = status, source, error
+            self.elapsed = time.time() - self.submitted
+
+    def _answer(self, response: str, source: str):
+        with self._lock:
+            if self.status == "cancelled":
+                return
+            self._chunks = [response]
+        self._finish("done", source)
+
+    def _start(self):
+        response = _responses.memory(self.key)
+        if response is not None:
+            return self._answer(response, "memory")
+        # DataFrames are lazy, so this only checks the Snowpark version
+        if _stream_complete is not None or not hasattr(self._session.sql(LOOKUP_SQL), "collect_nowait"):
+            self._future = _workers.submit(self._run)
+            return
+        self.status = "running"
+        try:
+            self._started = time.perf_counter()
+            self._query = _responses._table(self._session, LOOKUP_SQL, [self.key], nowait=True)
+            self._phase = "lookup"
+            if self._query is None:
+                self._complete_async()
+        except Exception as e:
+            self._finish("failed", error=str(e))
+
+    def _run(self):
+        """Worker thread: cache lookup, then the model, streaming if possible"""
+        with self._lock:
+            if self.status == "cancelled":
+                return
+            self.status = "running"
+        try:
+            response, source = _responses.lookup(self._session, self.key)
+            if response is not None:
+                return self._answer(response, source)
+            started = time.perf_counter()
+            if _stream_complete is not None:
+                for chunk in _stream_complete(self.model, self.prompt, session=unwrap(self._session), stream=True):
+                    if self._cancelled.is_set():
+                        return
+                    with self._lock:
+                        self._chunks.append(chunk)
+                response = self.text
+            else:
+                response = self._session.sql(COMPLETE_SQL, params=[self.model, self.prompt]).collect()[0]["RESPONSE"]
+            if self._cancelled.is_set():
+                return
+            _responses.store(self._session, self.key, self.model, response, (time.perf_counter() - started) * 1000)
+            self._answer(response, "model")
+        except Exception as e:
+            self._finish("failed", error=str(e))
+
+    def _complete_async(self):
+        self._started = time.perf_counter()
+        self._query = self._session.sql(COMPLETE_SQL, params=[self.model, self.prompt]).collect_nowait()
+        self._phase = "complete"
+
+    def poll(self):
+        """Advance an async job whose query has finished; never blocks"""
+        if self.done or self._query is None or not self._query.is_done():
+            return self
+        try:
+            if self._phase == "lookup":
+                try:
+                    rows = self._query.result()
+                except Exception as e:
+                    # A failed lookup is a miss; the tier stays on unless the table is unusable
+                    _responses.table_failed(e)
+                    rows = None
+                lookup_ms = (time.perf_counter() - self._started) * 1000
+                response = _responses.accept(self.key, rows, lookup_ms)
+                if response is not None:
+                    self._answer(response, "table")
+                else:
+                    self._complete_async()
+            else:
+                response = self._query.result()[0]["RESPONSE"]
+                latency_ms = (time.perf_counter() - self._started) * 1000
+                _responses.store(self._session, self.key, self.model, response, latency_ms, nowait=True)
+                self._answer(response, "model")
+        except Exception as e:
+            self._finish("failed", error=str(e))
+        return self
+
+    def cancel(self):
+        """Stop the job; a running warehouse query is cancelled too"""
+        with self._lock:
+            if self.done:
+                return
+            self.status = "cancelled"
+            self.elapsed = time.time() - self.submitted
+        self._cancelled.set()
+        if self._future is not None:
+            self._future.cancel()
+        if self._query is not None:
+            try:
+                self._query.cancel()
+            except Exception:
+                pass
+
+
+def submit(session, prompt: str, label: str = None, model: str = DEFAULT_MODEL, fingerprint=None) -> CortexJob:
+    """Start answering a prompt in the background and return its job
+
+    A memory-cache hit comes back already done. Keep the jobs (for example
+    in st.session_state) and call poll() on each rerun.
+    """
+    if fingerprint is None:
+        fingerprint = data_fingerprint(session)
+    job = CortexJob(session, label or prompt, prompt, model, fingerprint)
+    job._start()
+    return job
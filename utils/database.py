@@ -0,0 +1,506 @@
+"""
+Data access for ESG_METRICS
+Process-wide read cache, revalidated by a cheap fingerprint query on every read.
+Each app section declares the columns it needs and only those are selected.
+Writes go through parameterized, column-stable statements and patch the
+written row into the cache instead of forcing a full reload.
+Large reads can stay columnar: Arrow tables are cached the same way, and
+record batches can be streamed for aggregations without a pandas copy.
+Every read and write is scoped to one organization (ORG_ID); the table is
+clustered on it, so a company's handful of rows is all that is scanned.
+"""
+import re
+import threading
+
+import pandas as pd
+import pyarrow as pa
+import pyarrow.compute as pc
+
+from utils.schema import COLUMN_TYPES, coerce, normalize, to_reports
+
+TABLE = "ESG_METRICS"
+ORG_TABLE = "ORGANIZATIONS"
+ORG_COLUMNS = ["ORG_ID", "ORG_NAME", "SET_SYMBOL", "SECTOR"]
+
+# COUNT(*) and MIN/MAX over a whole table are answered from micro-partition
+# metadata, so this does not need a running warehouse or a table scan
+FINGERPRINT_SQL = """SELECT MAX(UPDATED_AT) AS MAX_UPDATED_AT, MAX(CREATED_AT) AS MAX_CREATED_AT,
+    COUNT(*) AS ROW_COUNT FROM {table}"""
+
+# Appended to scope a read to one organization; with CLUSTER BY (ORG_ID, ...)
+# Snowflake prunes to that company's micro-partitions
+ORG_FILTER = " WHERE ORG_ID = ?"
+
+# The table fingerprint plus one organization's in one round trip. The filtered
+# half needs the warehouse, so it only runs once the table fingerprint moved.
+ORG_FINGERPRINT_SQL = """SELECT t.MAX_UPDATED_AT, t.MAX_CREATED_AT, t.ROW_COUNT,
+    o.MAX_UPDATED_AT AS ORG_MAX_UPDATED_AT, o.MAX_CREATED_AT AS ORG_MAX_CREATED_AT, o.ROW_COUNT AS ORG_ROW_COUNT
+    FROM ({table_sql}) t CROSS JOIN ({table_sql}""" + ORG_FILTER + """) o"""
+
+# Columns each section reads; keep NOTES and other TEXT blobs out unless needed
+SECTION_COLUMNS = {
+    # ONE_REPORT_SUMMARY inputs plus certification flags
+    "dashboard": [
+        "REPORT_YEAR", "REPORT_STATUS", "SECTOR", "CGR_SCORE",
+        "GHG_SCOPE1_TCO2E", "GHG_SCOPE2_TCO2E", "ENERGY_TOTAL_MWH", "ENERGY_RENEWABLE_MWH", "WASTE_RECYCLED_PCT",
+        "EMPLOYEES_TOTAL", "WOMEN_MANAGEMENT_PCT", "INJURY_RATE", "TRAINING_HOURS_AVG",
+        "BOARD_INDEPENDENT_PCT", "BOARD_WOMEN_PCT", "ETHICS_TRAINING_PCT",
+        "ISO14001_CERTIFIED", "ISO45001_CERTIFIED", "SET_ESG_RATING", "THSI_MEMBER",
+        "EXTERNAL_ASSURANCE", "ASSURANCE_PROVIDER", "CREATED_AT",
+    ],
+    "environmental": [
+        "REPORT_YEAR", "REPORT_STATUS", "SECTOR",
+        "GHG_SCOPE1_TCO2E", "GHG_SCOPE2_TCO2E", "GHG_SCOPE3_TCO2E", "GHG_REDUCTION_TARGET_PCT", "GHG_REDUCTION_ACHIEVED_PCT",
+        "ENERGY_TOTAL_MWH", "ENERGY_RENEWABLE_MWH", "SOLAR_INSTALLED_KW",
+        "WATER_CONSUMPTION_M3", "WATER_RECYCLED_PCT", "WASTE_TOTAL_TONS", "WASTE_RECYCLED_PCT",
+        "HAZARDOUS_WASTE_TONS", "ZERO_WASTE_TO_LANDFILL",
+        "ENV_VIOLATIONS", "ENV_FINES_THB", "ISO14001_CERTIFIED",
+    ],
+    "social": [
+        "REPORT_YEAR",
+        "EMPLOYEES_TOTAL", "EMPLOYEES_PERMANENT", "NEW_HIRES", "TURNOVER_RATE_PCT",
+        "WOMEN_WORKFORCE_PCT", "WOMEN_MANAGEMENT_PCT", "WOMEN_EXECUTIVE_PCT", "DISABLED_EMPLOYEES",
+        "LOST_TIME_INJURIES", "INJURY_RATE", "FATALITIES", "ISO45001_CERTIFIED",
+        "TRAINING_HOURS_AVG", "TRAINING_BUDGET_THB", "CAREER_DEVELOPMENT_PROGRAM",
+        "CSR_BUDGET_THB", "LOCAL_SUPPLIER_PCT", "SUPPLIER_CODE_OF_CONDUCT",
+    ],
+    "governance": [
+        "REPORT_YEAR",
+        "BOARD_TOTAL", "BOARD_INDEPENDENT_PCT", "BOARD_WOMEN_PCT", "BOARD_MEETINGS_YEAR",
+        "HAS_AUDIT_COMMITTEE", "HAS_RISK_COMMITTEE", "HAS_CG_COMMITTEE", "HAS_SUSTAINABILITY_COMMITTEE",
+        "CODE_OF_CONDUCT", "ANTI_CORRUPTION_POLICY", "WHISTLEBLOWER_POLICY", "ETHICS_TRAINING_PCT",
+        "CGR_SCORE", "SET_ESG_RATING", "THSI_MEMBER", "EXTERNAL_ASSURANCE", "ASSURANCE_PROVIDER",
+        "NOTES",
+    ],
+}
+
+
+class _Entry:
+    """A cached projection; OneReport records are built on first use"""
+    __slots__ = ("fingerprint", "frame", "_reports")
+
+    def __init__(self, fingerprint: tuple, frame):
+        self.fingerprint = fingerprint
+        self.frame = frame
+        self._reports = None
+
+    @property
+    def reports(self) -> dict:
+        if self._reports is None:
+            self._reports = to_reports(self.frame)
+        return self._reports
+
+
+class TableCache:
+    """Caches downloaded tables until their fingerprint changes
+
+    Frames are normalized once per download and shared by every Streamlit
+    session in the process, so callers must treat them as read-only.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._entries = {}  # (table, org_id, columns, compact | "arrow") -> _Entry
+        self._org_fingerprints = {}  # (table, org_id) -> (table fingerprint, org fingerprint)
+        self.hits = 0
+        self.misses = 0
+        self.invalidations = 0
+        self.patches = 0
+
+    def fingerprint(self, session, table: str, org_id: int = None) -> tuple:
+        """Return (max updated, max created, row count) for a table, or one organization's rows
+
+        The check is always the metadata-only table fingerprint. An
+        organization's own fingerprint is remembered against it and only
+        re-queried (warehouse) when the table fingerprint has moved.
+        """
+        row = session.sql(FINGERPRINT_SQL.format(table=table)).collect()[0]
+        table_fp = (row["MAX_UPDATED_AT"], row["MAX_CREATED_AT"], row["ROW_COUNT"])
+        if org_id is None:
+            return table_fp
+        with self._lock:
+            known = self._org_fingerprints.get((table, org_id))
+        if known is not None and known[0] == table_fp:
+            return known[1]
+        return self.org_fingerprint(session, table, org_id)
+
+    def org_fingerprint(self, session, table: str, org_id: int) -> tuple:
+        """Query the table and organization fingerprints together and remember the pair"""
+        sql = ORG_FINGERPRINT_SQL.format(table_sql=FINGERPRINT_SQL.format(table=table))
+        row = session.sql(sql, params=[int(org_id)]).collect()[0]
+        table_fp = (row["MAX_UPDATED_AT"], row["MAX_CREATED_AT"], row["ROW_COUNT"])
+        org_fp = (row["ORG_MAX_UPDATED_AT"], row["ORG_MAX_CREATED_AT"], row["ORG_ROW_COUNT"])
+        with self._lock:
+            self._org_fingerprints[(table, org_id)] = (table_fp, org_fp)
+        return org_fp
+
+    def entry(self, session, table: str = TABLE, org_id: int = None, columns: list = None,
+              compact: bool = True) -> _Entry:
+        """Return the cached projection, downloading it only if the fingerprint moved
+
+        org_id limits it to one organization's rows (None reads the whole
+        table, for dimensions like ORGANIZATIONS). columns=None selects every
+        column; otherwise the projection is pushed down to the warehouse.
+        compact=True stores small DECIMALs as float32 and enumerated columns
+        as categoricals.
+        """
+        key = (table, org_id, tuple(columns) if columns else None, compact)
+        fp = self.fingerprint(session, table, org_id)
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and entry.fingerprint == fp:
+                self.hits += 1
+                return entry
+
+        entry = _Entry(fp, normalize(_select(session, table, org_id, columns).to_pandas(), compact))
+        with self._lock:
+            self._entries[key] = entry
+            self.misses += 1
+        return entry
+
+    def arrow(self, session, table: str = TABLE, org_id: int = None, columns: list = None):
+        """Return the cached projection as a pyarrow Table (no pandas conversion)"""
+        key = (table, org_id, tuple(columns) if columns else None, "arrow")
+        fp = self.fingerprint(session, table, org_id)
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and entry.fingerprint == fp:
+                self.hits += 1
+                return entry.frame
+
+        batches = list(_arrow_batches(_select(session, table, org_id, columns)))
+        if batches:
+            frame = pa.Table.from_batches(batches)
+        else:
+            frame = pa.table({c: pa.array([], pa.null()) for c in columns or COLUMN_TYPES})
+        with self._lock:
+            self._entries[key] = _Entry(fp, frame)
+            self.misses += 1
+        return frame
+
+    def get(self, session, table: str = TABLE, org_id: int = None, columns: list = None, compact: bool = True):
+        """Return the cached projection as a DataFrame"""
+        return self.entry(session, table, org_id, columns, compact).frame
+
+    def invalidate(self, table: str = None, org_id: int = None):
+        """Drop one table (or everything) so the next read re-downloads
+
+        With org_id only that organization's projections of the table are dropped.
+        """
+        with self._lock:
+            if table is None:
+                self._entries.clear()
+                self._org_fingerprints.clear()
+            else:
+                for key in [k for k in self._entries if k[0] == table and org_id in (None, k[1])]:
+                    del self._entries[key]
+                for key in [k for k in self._org_fingerprints if k[0] == table and org_id in (None, k[1])]:
+                    del self._org_fingerprints[key]
+            self.invalidations += 1
+
+    def patch(self, session, table: str, org_id: int, row, key: str, inserted: bool):
+        """Splice one freshly written (normalized) row into the organization's cached projections
+
+        A projection is only kept if the new fingerprint is explained by this
+        write alone; if another writer got in between it is dropped instead.
+        Arrow tables are always dropped and re-fetched on their next read.
+        """
+        # The table fingerprint has just moved, so go straight to the combined query
+        fp = self.org_fingerprint(session, table, org_id)
+        with self._lock:
+            for cache_key, entry in list(self._entries.items()):
+                if cache_key[0] != table or cache_key[1] != org_id:
+                    continue
+                if (cache_key[3] == "arrow" or row.empty
+                        or not _explains(entry.fingerprint, fp, row.iloc[0], inserted)):
+                    del self._entries[cache_key]
+                    self.invalidations += 1
+                    continue
+                # Re-normalize so float32/categorical dtypes survive the concat
+                frame = normalize(_splice(entry.frame, row[list(entry.frame.columns)], key), cache_key[3])
+                self._entries[cache_key] = _Entry(fp, frame)
+                self.patches += 1
+
+    def stats(self) -> dict:
+        """Hit/miss counters for verifying saved round-trips"""
+        with self._lock:
+            total = self.hits + self.misses
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "invalidations": self.invalidations,
+                "patches": self.patches,
+                "hit_rate": self.hits / total if total else 0.0,
+                "cached_tables": sorted({k[0] for k in self._entries}),
+                # {table: {org_id: rows}} from the latest fingerprints, known without a query
+                "table_rows": _table_rows(self._entries),
+                "cached_projections": len(self._entries),
+            }
+
+
+def _table_rows(entries: dict) -> dict:
+    rows = {}
+    for (table, org_id, _, _), entry in entries.items():
+        rows.setdefault(table, {})[org_id] = entry.fingerprint[2]
+    return rows
+
+
+def _scoped(session, sql: str, org_id: int = None):
+    """session.sql() limited to one organization's rows when org_id is given"""
+    if org_id is None:
+        return session.sql(sql)
+    return session.sql(sql + ORG_FILTER, params=[int(org_id)])
+
+
+def _select(session, table: str, org_id: int = None, columns: list = None):
+    """Lazy SELECT of a projection; the column list and org filter are pushed down"""
+    return _scoped(session, f"SELECT {', '.join(columns) if columns else '*'} FROM {table}", org_id)
+
+
+def _ts(value):
+    """Timestamp at microsecond precision (collect() truncates, to_pandas() does not)"""
+    return None if pd.isna(value) else pd.Timestamp(value).floor("us")
+
+
+def _explains(old_fp: tuple, new_fp: tuple, written, inserted: bool) -> bool:
+    """True if moving from old_fp to new_fp is exactly the effect of this one write"""
+    old_updated, old_created, old_count = old_fp
+    new_updated, new_created, new_count = new_fp
+    if inserted:
+        return (new_count == old_count + 1 and _ts(new_updated) == _ts(old_updated)
+                and _ts(new_created) == _ts(written["CREATED_AT"]))
+    return (new_count == old_count and _ts(new_created) == _ts(old_created)
+            and _ts(new_updated) == _ts(written["UPDATED_AT"]))
+
+
+def _splice(frame, row, key: str):
+    """Copy of frame with the row for row[key] replaced in place, or appended"""
+    mask = frame[key] == row[key].iloc[0]
+    if not mask.any():
+        return pd.concat([frame, row], ignore_index=True)
+    position = frame.index[mask][0]
+    keep = frame.index[~mask | (frame.index == position)]
+    return pd.concat([frame[~mask], row.set_axis([position])]).loc[keep]
+
+
+def _arrow_batches(query):
+    """Record batches from a Snowpark DataFrame
+
+    Uses to_arrow_batches() where the Snowpark version has it, otherwise
+    converts each to_pandas_batches() chunk on its own.
+    """
+    if hasattr(query, "to_arrow_batches"):
+        for chunk in query.to_arrow_batches():
+            yield from chunk.to_batches() if isinstance(chunk, pa.Table) else [chunk]
+    else:
+        for chunk in query.to_pandas_batches():
+            yield pa.RecordBatch.from_pandas(chunk, preserve_index=False)
+
+
+# One cache per Python process; Streamlit keeps imported modules across reruns
+_cache = TableCache()
+
+
+def _default_columns(columns: list, include_notes: bool) -> list:
+    if columns is None and not include_notes:
+        return [c for c, kind in COLUMN_TYPES.items() if kind[0] != "TEXT"]
+    return columns
+
+
+def load_metrics(session, org_id: int, columns: list = None, include_notes: bool = False, compact: bool = True):
+    """Load one organization's ESG_METRICS (optionally a column subset) through the shared cache
+
+    Without an explicit column list every column except the TEXT blobs
+    (NOTES) is loaded, unless include_notes=True.
+    """
+    return _cache.get(session, TABLE, int(org_id), _default_columns(columns, include_notes), compact)
+
+
+def load_arrow(session, org_id: int, columns: list = None, include_notes: bool = False):
+    """Load one organization's ESG_METRICS as a cached pyarrow Table
+
+    The table stays columnar; convert only what a widget shows with
+    arrow_frame(). Column selection follows load_metrics().
+    """
+    return _cache.arrow(session, TABLE, int(org_id), _default_columns(columns, include_notes))
+
+
+def arrow_frame(table, offset: int = 0, length: int = None, compact: bool = True):
+    """Normalized DataFrame for a row slice of an Arrow table (zero-copy slice)"""
+    return normalize(table.slice(offset, length).to_pandas(), compact)
+
+
+def iter_batches(session, org_id: int, columns: list = None, include_notes: bool = False):
+    """Stream one organization's ESG_METRICS as Arrow record batches, bypassing the cache
+
+    For one-pass aggregations over tables too large to hold; nothing is kept
+    after a batch has been consumed.
+    """
+    yield from _arrow_batches(_select(session, TABLE, int(org_id), _default_columns(columns, include_notes)))
+
+
+def batch_totals(batches, columns: list) -> dict:
+    """Row count and per-column sums over an iterable of Arrow batches or tables"""
+    totals = {"ROWS": 0, **{c: 0.0 for c in columns}}
+    for batch in batches:
+        totals["ROWS"] += batch.num_rows
+        for column in columns:
+            if column in batch.schema.names:
+                total = pc.sum(batch.column(column).cast(pa.float64())).as_py()
+                totals[column] += total or 0.0
+    return totals
+
+
+def load_table(session, table: str, org_id: int = None, columns: list = None):
+    """Load another table with CREATED_AT/UPDATED_AT columns through the same cache
+
+    Tables with an ORG_ID column are read for one organization; org_id=None
+    reads all rows and is meant for dimensions such as ORGANIZATIONS.
+    """
+    return _cache.get(session, table, None if org_id is None else int(org_id), columns, compact=False)
+
+
+def load_organizations(session):
+    """The ORGANIZATIONS dimension (ORG_ID, ORG_NAME, SET_SYMBOL, SECTOR), sorted by name"""
+    return load_table(session, ORG_TABLE, columns=ORG_COLUMNS).sort_values("ORG_NAME", ignore_index=True)
+
+
+def load_organization(session, org_id: int) -> dict:
+    """One organization's non-NULL ORGANIZATIONS columns, from the cached dimension"""
+    orgs = load_organizations(session)
+    match = orgs[orgs["ORG_ID"] == org_id]
+    return match.iloc[0].dropna().to_dict() if not match.empty else {}
+
+
+def organization_picker(session) -> int:
+    """Sidebar select box over ORGANIZATIONS; returns the selected ORG_ID
+
+    The choice is kept under the "org_id" session state key, so every page
+    opens on the same company. Stops the rerun if there are no organizations.
+    """
+    import streamlit as st
+
+    orgs = load_organizations(session)
+    if orgs.empty:
+        st.warning("No organizations yet. Add one to ORGANIZATIONS (see setup/02_tables.sql).")
+        st.stop()
+    labels = {int(row.ORG_ID): f"{row.ORG_NAME} ({row.SET_SYMBOL})" if pd.notna(row.SET_SYMBOL) else row.ORG_NAME
+              for row in orgs.itertuples()}
+    if st.session_state.get("org_id") not in labels:
+        st.session_state.pop("org_id", None)
+    return st.sidebar.selectbox("Organization", list(labels), format_func=labels.get, key="org_id")
+
+
+def load_section(session, org_id: int, section: str, with_reports: bool = False):
+    """Load only the columns a section declares in SECTION_COLUMNS, for one organization
+
+    with_reports=True also returns the {REPORT_YEAR: OneReport} records from
+    the same cache entry, so both come from a single fingerprint check.
+    """
+    entry = _cache.entry(session, TABLE, int(org_id), SECTION_COLUMNS[section])
+    return (entry.frame, entry.reports) if with_reports else entry.frame
+
+
+def load_reports(session, org_id: int, section: str) -> dict:
+    """{REPORT_YEAR: OneReport} for a section of one organization, built once per data load"""
+    return _cache.entry(session, TABLE, int(org_id), SECTION_COLUMNS[section]).reports
+
+
+def invalidate_cache(table: str = None, org_id: int = None):
+    """Force the next read to hit the warehouse (call after every write)"""
+    _cache.invalidate(table, None if org_id is None else int(org_id))
+
+
+def cache_stats() -> dict:
+    """Expose cache counters"""
+    return _cache.stats()
+
+
+def data_fingerprint(session, org_id: int = None, table: str = TABLE) -> tuple:
+    """Current (max updated, max created, row count) of one organization's rows, for keying derived caches
+
+    org_id=None fingerprints the whole table.
+    """
+    return _cache.fingerprint(session, table, None if org_id is None else int(org_id))
+
+
+# Write path: columns are emitted in DDL order and values are bound, so a given
+# set of fields always produces the same SQL text and Snowflake compiles it once
+IDENTIFIER = re.compile(r"^[A-Z][A-Z0-9_]*$")
+_COLUMN_ORDER = {name: i for i, name in enumerate(COLUMN_TYPES)}
+
+
+def _ordered_columns(fields: dict) -> list:
+    """Validated column names in a stable order"""
+    for name in fields:
+        if not IDENTIFIER.match(name):
+            raise ValueError(f"Invalid column name: {name!r}")
+    return sorted(fields, key=lambda name: (_COLUMN_ORDER.get(name, len(_COLUMN_ORDER)), name))
+
+
+def _insert(session, org_id: int, fields: dict):
+    fields = {**fields, "ORG_ID": int(org_id)}
+    columns = _ordered_columns(fields)
+    sql = (f"INSERT INTO {TABLE} ({', '.join(columns)}) "
+           f"VALUES ({', '.join('?' for _ in columns)})")
+    session.sql(sql, params=[coerce(c, fields[c]) for c in columns]).collect()
+
+
+def _refresh_report(session, org_id: int, year: int, inserted: bool):
+    """Re-select the single written row and patch it into the organization's cache"""
+    row = normalize(session.sql(f"SELECT * FROM {TABLE} WHERE ORG_ID = ? AND REPORT_YEAR = ?",
+                                params=[int(org_id), int(year)]).to_pandas())
+    _cache.patch(session, TABLE, int(org_id), row, "REPORT_YEAR", inserted)
+    return to_reports(row).get(int(year))
+
+
+def insert_row(session, org_id: int, fields: dict):
+    """Insert one ESG_METRICS row for an organization; values are coerced to their DDL types"""
+    _insert(session, org_id, fields)
+    invalidate_cache(TABLE, org_id)
+
+
+def insert_report(session, org_id: int, year: int, fields: dict):
+    """Create an organization's report for a fiscal year; returns the written row"""
+    _insert(session, org_id, {**fields, "REPORT_YEAR": year})
+    return _refresh_report(session, org_id, year, inserted=True)
+
+
+def update_report(session, org_id: int, year: int, fields: dict):
+    """Update fields of an existing report year; returns the written row, or None if no such year"""
+    columns = _ordered_columns(fields)
+    assignments = ", ".join(f"{c} = ?" for c in columns)
+    sql = (f"UPDATE {TABLE} SET {assignments}, "
+           "UPDATED_BY = CURRENT_USER(), UPDATED_AT = CURRENT_TIMESTAMP() "
+           "WHERE ORG_ID = ? AND REPORT_YEAR = ?")
+    params = [coerce(c, fields[c]) for c in columns] + [int(org_id), int(year)]
+    result = session.sql(sql, params=params).collect()
+    if not result or int(result[0][0]) == 0:
+        return None
+    return _refresh_report(session, org_id, year, inserted=False)
+
+
+def upsert_report(session, org_id: int, year: int, fields: dict):
+    """Update the report year if it exists, otherwise create it; returns the written row"""
+    row = update_report(session, org_id, year, fields)
+    if row is None:
+        row = insert_report(session, org_id, year, fields)
+    return row
+
+
+def delete_report(session, org_id: int, report_id: int):
+    """Delete one row by ID; rows of other organizations are never touched"""
+    session.sql(f"DELETE FROM {TABLE} WHERE ID = ? AND ORG_ID = ?", params=[int(report_id), int(org_id)]).collect()
+    invalidate_cache(TABLE, org_id)
+
+
+def insert_organization(session, name: str, symbol: str = None, sector: str = None) -> int:
+    """Add a company to ORGANIZATIONS; returns its ORG_ID"""
+    fields = {"ORG_NAME": name, "SET_SYMBOL": symbol or None, "SECTOR": sector}
+    columns = [c for c, v in fields.items() if v is not None]
+    session.sql(f"INSERT INTO {ORG_TABLE} ({', '.join(columns)}) VALUES ({', '.join('?' for _ in columns)})",
+                params=[fields[c] for c in columns]).collect()
+    invalidate_cache(ORG_TABLE)
+    # ORG_NAME is not unique, so read back the newest row with this name
+    row = session.sql(f"SELECT MAX(ORG_ID) AS ORG_ID FROM {ORG_TABLE} WHERE ORG_NAME = ?", params=[name]).collect()[0]
+    return int(row["ORG_ID"])
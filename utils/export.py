@@ -0,0 +1,144 @@
+"""
+One Report exports
+Files are built only when a user asks for one, by streaming Arrow record
+batches from the warehouse straight into the chosen writer. Writing holds one
+batch at a time rather than a DataFrame of the whole table; the finished file
+itself is returned as bytes for st.download_button, so it is in memory once.
+"""
+import importlib.util
+import itertools
+import tempfile
+from datetime import date
+
+import pyarrow as pa
+import pyarrow.csv as pa_csv
+import pyarrow.parquet as pq
+
+from utils.database import SECTION_COLUMNS, iter_batches
+from utils.schema import COLUMN_TYPES
+
+# SET templates: column selection per One Report section (None = every column)
+TEMPLATES = {
+    "all": None,
+    "environmental": SECTION_COLUMNS["environmental"],
+    "social": SECTION_COLUMNS["social"],
+    "governance": SECTION_COLUMNS["governance"],
+}
+
+TEMPLATE_LABELS = {
+    "all": "Full One Report (56-1)",
+    "environmental": "Environmental (E)",
+    "social": "Social (S)",
+    "governance": "Governance (G)",
+}
+
+# format -> (file extension, MIME type); XLSX is only offered where openpyxl is installed
+FORMATS = {
+    "csv": ("csv", "text/csv"),
+    "parquet": ("parquet", "application/vnd.apache.parquet"),
+}
+if importlib.util.find_spec("openpyxl") is not None:
+    FORMATS["xlsx"] = ("xlsx", "application/vnd.openxmlformats-officedocument.spreadsheetml.sheet")
+
+# Exports larger than this spill from memory to a temporary file
+SPOOL_BYTES = 8 * 1024 * 1024
+
+
+def _arrow_type(column: str, fallback=None):
+    kind = COLUMN_TYPES.get(column, ("ANY",))
+    if kind[0] == "DECIMAL":
+        return pa.decimal128(kind[1], kind[2])
+    if kind[0] == "INTEGER":
+        return pa.int64()
+    if kind[0] == "BOOLEAN":
+        return pa.bool_()
+    if kind[0] == "DATE":
+        return pa.date32()
+    if kind[0] == "TIMESTAMP_NTZ":
+        return pa.timestamp("us")
+    if kind[0] in ("VARCHAR", "TEXT"):
+        return pa.string()
+    return fallback or pa.string()
+
+
+def export_schema(columns: list, first_batch=None):
+    """Fixed Arrow schema for an export, taken from the DDL
+
+    Snowflake picks the narrowest integer type per batch, so every batch is
+    cast to this schema before it reaches a writer. Columns the DDL does not
+    know keep the type of the first batch.
+    """
+    if first_batch is None:
+        return pa.schema([(c, _arrow_type(c)) for c in columns or COLUMN_TYPES])
+    return pa.schema([(f.name, _arrow_type(f.name, f.type)) for f in first_batch.schema])
+
+
+def _conformed(batches, schema):
+    for batch in batches:
+        yield from pa.Table.from_batches([batch]).select(schema.names).cast(schema).to_batches()
+
+
+def _write_csv(batches, schema, sink):
+    with pa_csv.CSVWriter(sink, schema) as writer:
+        for batch in batches:
+            writer.write_batch(batch)
+
+
+def _write_parquet(batches, schema, sink):
+    with pq.ParquetWriter(sink, schema, compression="zstd") as writer:
+        for batch in batches:
+            writer.write_batch(batch)
+
+
+def _write_xlsx(batches, schema, sink):
+    # Write-only workbooks stream rows to disk instead of building a sheet in memory
+    from openpyxl import Workbook
+
+    workbook = Workbook(write_only=True)
+    sheet = workbook.create_sheet("ESG_METRICS")
+    sheet.append(schema.names)
+    for batch in batches:
+        for row in zip(*(column.to_pylist() for column in batch.columns)):
+            sheet.append(row)
+    workbook.save(sink)
+
+
+_WRITERS = {"csv": _write_csv, "parquet": _write_parquet, "xlsx": _write_xlsx}
+
+
+def write_export(batches, fmt: str, sink, columns: list = None) -> int:
+    """Stream record batches into a binary sink as csv, parquet or xlsx; returns rows written"""
+    if fmt not in _WRITERS:
+        raise ValueError(f"Unknown export format: {fmt!r}")
+    batches = iter(batches)
+    first = next(batches, None)
+    schema = export_schema(columns, first)
+    if first is not None:
+        batches = itertools.chain([first], batches)
+    rows = 0
+
+    def counted():
+        nonlocal rows
+        for batch in _conformed(batches, schema):
+            rows += batch.num_rows
+            yield batch
+
+    _WRITERS[fmt](counted(), schema, sink)
+    return rows
+
+
+def build_export(session, org_id: int, template: str = "all", fmt: str = "csv"):
+    """Export a SET template of one organization; returns (data, file name, MIME type)
+
+    Batches are fetched with iter_batches(), bypassing the read cache, and
+    written one at a time. data is the whole finished file; the caller keeps
+    it only as long as its download button is shown.
+    """
+    columns = TEMPLATES[template]
+    extension, mime = FORMATS[fmt]
+    with tempfile.SpooledTemporaryFile(max_size=SPOOL_BYTES) as sink:
+        write_export(iter_batches(session, org_id, columns, include_notes=True), fmt, sink, columns)
+        sink.seek(0)
+        data = sink.read()
+    file_name = f"one_report_56-1_{template}_{date.today().isoformat()}.{extension}"
+    return data, file_name, mime
@@ -0,0 +1,411 @@
+"""
+Query instrumentation
+InstrumentedSession wraps the Snowpark session (or the local one) and times
+every action it runs: collect(), collect_nowait(), to_pandas() and the
+batch iterators. Each call becomes a QueryRecord with the normalized SQL,
+the Snowflake query ID, elapsed time, rows and bytes returned, and the app
+section that issued it. Records of the current rerun feed the Performance
+panel; with ESG_QUERY_LOG=1 they are also written in batches to
+PROD.APP_QUERY_LOG, so warehouse time can be traced back to a tab.
+"""
+import os
+import re
+import sys
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+from datetime import datetime, timezone
+
+LOG_TABLE = "APP_QUERY_LOG"
+LOG_COLUMNS = ["EXECUTED_AT", "SECTION", "ACTION", "QUERY_ID", "SQL_TEXT",
+               "ELAPSED_MS", "ROWS_RETURNED", "BYTES_RETURNED", "ERROR"]
+FLUSH_ROWS = 100
+FLUSH_SECONDS = 60
+MAX_PENDING = 5000  # oldest records are dropped if the table cannot be written
+MAX_SQL_CHARS = 10000
+
+# Actions that run a query; everything else on a DataFrame is lazy
+ACTIONS = {"collect", "to_pandas", "count"}
+STREAMS = {"to_pandas_batches", "to_arrow_batches", "to_local_iterator"}
+
+WHITESPACE = re.compile(r"\s+")
+LITERALS = re.compile(r"'(?:[^']|'')*'|\b\d+(?:\.\d+)?\b")
+
+
+def normalize_sql(sql: str) -> str:
+    """Collapse whitespace and replace literals with ?, so repeats group together"""
+    return LITERALS.sub("?", WHITESPACE.sub(" ", sql).strip())
+
+
+def logging_enabled() -> bool:
+    return os.environ.get("ESG_QUERY_LOG", "0").lower() in ("1", "true", "yes")
+
+
+def _size(result) -> tuple:
+    """(rows, bytes) of a result as it sits in memory"""
+    if result is None:
+        return 0, 0
+    if hasattr(result, "num_rows") and hasattr(result, "nbytes"):  # Arrow table or batch
+        return result.num_rows, result.nbytes
+    if hasattr(result, "memory_usage"):  # pandas
+        return len(result), int(result.memory_usage(index=False).sum())
+    if isinstance(result, int):
+        return 1, sys.getsizeof(result)
+    rows = list(result)
+    return len(rows), sum(sys.getsizeof(value) for row in rows for value in row)
+
+
+class QueryRecord:
+    """One timed backend call"""
+    __slots__ = ("executed_at", "section", "action", "query_id", "sql", "elapsed_ms", "rows", "bytes", "error")
+
+    def __init__(self, section: str, action: str, sql: str):
+        self.executed_at = datetime.now(timezone.utc).replace(tzinfo=None)
+        self.section = section
+        self.action = action
+        self.sql = sql
+        self.query_id = None
+        self.elapsed_ms = 0.0
+        self.rows = 0
+        self.bytes = 0
+        self.error = None
+
+    def as_dict(self) -> dict:
+        return {name: getattr(self, name) for name in self.__slots__}
+
+
+class QueryLog:
+    """Process-wide buffer of records waiting to be written to APP_QUERY_LOG"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._pending = deque(maxlen=MAX_PENDING)
+        self._last_flush = time.monotonic()
+        self._flushing = threading.Lock()
+        self._inflight = None  # (collect_nowait job, its records) of the last INSERT
+        self.written = 0
+        self.failures = 0
+
+    def add(self, session, record: QueryRecord):
+        if not logging_enabled():
+            return
+        with self._lock:
+            self._pending.append(record)
+            due = len(self._pending) >= FLUSH_ROWS or time.monotonic() - self._last_flush >= FLUSH_SECONDS
+        if due:
+            self.flush(session)
+
+    def flush(self, session) -> int:
+        """Write pending records in one multi-row INSERT; returns rows sent
+
+        Runs on the raw session so the insert is not logged itself, and
+        without waiting for the result where the Snowpark version allows.
+        An async INSERT is checked by the next flush: nothing new is sent
+        while it is still running, and its rows are re-queued if it failed.
+        """
+        if not self._flushing.acquire(blocking=False):
+            return 0
+        try:
+            if not self._settle():
+                return 0
+            with self._lock:
+                batch = list(self._pending)
+                self._pending.clear()
+                self._last_flush = time.monotonic()
+            if not batch:
+                return 0
+            placeholders = ", ".join(f"({', '.join('?' for _ in LOG_COLUMNS)})" for _ in batch)
+            params = [value for record in batch for value in (
+                record.executed_at, record.section, record.action, record.query_id, record.sql[:MAX_SQL_CHARS],
+                round(record.elapsed_ms, 2), record.rows, record.bytes, record.error,
+            )]
+            query = session.sql(f"INSERT INTO {LOG_TABLE} ({', '.join(LOG_COLUMNS)}) VALUES {placeholders}",
+                                params=params)
+            try:
+                if hasattr(query, "collect_nowait"):
+                    self._inflight = (query.collect_nowait(), batch)
+                else:
+                    query.collect()
+                    self.written += len(batch)
+            except Exception:
+                self._failed(batch)
+                return 0
+            return len(batch)
+        finally:
+            self._flushing.release()
+
+    def _settle(self) -> bool:
+        """Account for the last async INSERT; False while it is still running"""
+        if self._inflight is None:
+            return True
+        job, batch = self._inflight
+        if not job.is_done():
+            return False
+        self._inflight = None
+        try:
+            job.result()
+        except Exception:
+            self._failed(batch)
+            return True
+        self.written += len(batch)
+        return True
+
+    def _failed(self, batch: list):
+        # Logging must never break a page; keep the rows for the next flush
+        self.failures += 1
+        with self._lock:
+            self._pending.extendleft(reversed(batch))
+
+
+_log = QueryLog()
+
+
+class _Job:
+    """collect_nowait() job whose result() is recorded once"""
+
+    def __init__(self, session, job, record: QueryRecord, started: float):
+        self._session = session
+        self._job = job
+        self._record = record
+        self._started = started
+        self._recorded = False
+        record.query_id = getattr(job, "query_id", None)
+
+    def __getattr__(self, name):
+        return getattr(self._job, name)
+
+    def result(self, *args, **kwargs):
+        try:
+            result = self._job.result(*args, **kwargs)
+        except Exception as e:
+            self._record.error = str(e)
+            self._finish(None)
+            raise
+        self._finish(result)
+        return result
+
+    def _finish(self, result):
+        if self._recorded:
+            return
+        self._recorded = True
+        self._record.elapsed_ms = (time.perf_counter() - self._started) * 1000
+        self._record.rows, self._record.bytes = _size(result) if self._record.error is None else (0, 0)
+        self._session._add(self._record)
+
+
+class InstrumentedDataFrame:
+    """Snowpark DataFrame proxy that times its actions"""
+
+    def __init__(self, session, frame, sql: str):
+        self._session = session
+        self._frame = frame
+        self._sql = sql
+
+    def __getattr__(self, name):
+        attr = getattr(self._frame, name)
+        if name in ACTIONS:
+            return lambda *args, **kwargs: self._session._timed(self, name, attr, args, kwargs)
+        if name in STREAMS:
+            return lambda *args, **kwargs: self._session._streamed(self, name, attr, args, kwargs)
+        if name == "collect_nowait":
+            return lambda *args, **kwargs: self._session._submitted(self, attr, args, kwargs)
+        if not callable(attr):
+            return attr
+
+        def transformed(*args, **kwargs):
+            result = attr(*args, **kwargs)
+            if hasattr(result, "collect"):
+                detail = ", ".join(str(a) for a in args)
+                return InstrumentedDataFrame(self._session, result, f"{self._sql} /* {name}({detail}) */")
+            return result
+        return transformed
+
+    def select(self, *columns):
+        names = columns[0] if len(columns) == 1 and isinstance(columns[0], (list, tuple)) else columns
+        return InstrumentedDataFrame(self._session, self._frame.select(*columns),
+                                     f"SELECT {', '.join(str(c) for c in names)} FROM ({self._sql})")
+
+    @property
+    def sql_text(self) -> str:
+        """The SQL Snowpark generates where available, otherwise the SQL as written"""
+        try:
+            queries = self._frame.queries["queries"]
+            if queries:
+                return queries[-1]
+        except (AttributeError, KeyError, TypeError):
+            pass
+        return self._sql
+
+
+class InstrumentedSession:
+    """Session proxy that records every query it runs
+
+    Make one per rerun (get_session() does), so records holds exactly this
+    rerun's queries for the Performance panel. Use section() to attribute
+    queries to a tab; anything else is attributed to the page.
+    """
+
+    def __init__(self, session, page: str = None):
+        self.raw = session
+        self.records = []
+        self.label = page or "app"
+        self._lock = threading.Lock()
+
+    def __getattr__(self, name):
+        return getattr(self.raw, name)
+
+    @contextmanager
+    def section(self, name: str):
+        previous, self.label = self.label, name
+        try:
+            yield self
+        finally:
+            self.label = previous
+
+    def sql(self, query: str, params: list = None) -> InstrumentedDataFrame:
+        return InstrumentedDataFrame(self, self.raw.sql(query, params=params), query)
+
+    def table(self, name: str) -> InstrumentedDataFrame:
+        return InstrumentedDataFrame(self, self.raw.table(name), f"SELECT * FROM {name}")
+
+    def write_pandas(self, frame, table_name: str, *args, **kwargs):
+        record = QueryRecord(self.label, "write_pandas", f"write_pandas {table_name}")
+        return self._run(record, lambda: self.raw.write_pandas(frame, table_name, *args, **kwargs), frame)
+
+    def _add(self, record: QueryRecord):
+        with self._lock:
+            self.records.append(record)
+        _log.add(self.raw, record)
+
+    @contextmanager
+    def _history(self):
+        """Snowpark's query history for the query ID; a no-op where the session has none"""
+        if hasattr(self.raw, "query_history"):
+            with self.raw.query_history() as history:
+                yield history
+        else:
+            yield None
+
+    def _run(self, record: QueryRecord, call, sized=None):
+        started = time.perf_counter()
+        try:
+            with self._history() as history:
+                result = call()
+            if history is not None and history.queries:
+                record.query_id = history.queries[-1].query_id
+            record.rows, record.bytes = _size(result if sized is None else sized)
+            return result
+        except Exception as e:
+            record.error = str(e)
+            raise
+        finally:
+            record.elapsed_ms = (time.perf_counter() - started) * 1000
+            self._add(record)
+
+    def _timed(self, frame: InstrumentedDataFrame, action: str, call, args, kwargs):
+        record = QueryRecord(self.label, action, normalize_sql(frame.sql_text))
+        return self._run(record, lambda: call(*args, **kwargs))
+
+    def _streamed(self, frame: InstrumentedDataFrame, action: str, call, args, kwargs):
+        """Generator actions: time and size accumulate until the stream ends"""
+        record = QueryRecord(self.label, action, normalize_sql(frame.sql_text))
+        elapsed = 0.0
+        try:
+            with self._history() as history:
+                started = time.perf_counter()
+                chunks = iter(call(*args, **kwargs))
+                elapsed += time.perf_counter() - started
+                while True:
+                    started = time.perf_counter()
+                    try:
+                        chunk = next(chunks)
+                    except StopIteration:
+                        break
+                    finally:
+                        elapsed += time.perf_counter() - started
+                    if record.query_id is None and history is not None and history.queries:
+                        record.query_id = history.queries[-1].query_id
+                    rows, nbytes = _size(chunk) if action != "to_local_iterator" else _size([chunk])
+                    record.rows += rows
+                    record.bytes += nbytes
+                    yield chunk
+        except Exception as e:
+            record.error = str(e)
+            raise
+        finally:
+            record.elapsed_ms = elapsed * 1000
+            self._add(record)
+
+    def _submitted(self, frame: InstrumentedDataFrame, call, args, kwargs):
+        record = QueryRecord(self.label, "collect_nowait", normalize_sql(frame.sql_text))
+        started = time.perf_counter()
+        return _Job(self, call(*args, **kwargs), record, started)
+
+    def totals(self) -> dict:
+        """Per-rerun totals, overall and by section"""
+        with self._lock:
+            records = list(self.records)
+        sections = {}
+        for record in records:
+            total = sections.setdefault(record.section, {"queries": 0, "elapsed_ms": 0.0, "rows": 0, "bytes": 0})
+            total["queries"] += 1
+            total["elapsed_ms"] += record.elapsed_ms
+            total["rows"] += record.rows
+            total["bytes"] += record.bytes
+        overall = {key: sum(total[key] for total in sections.values())
+                   for key in ("queries", "elapsed_ms", "rows", "bytes")}
+        return {"overall": overall, "sections": sections, "records": records}
+
+
+def instrument(session, page: str = None) -> InstrumentedSession:
+    return session if isinstance(session, InstrumentedSession) else InstrumentedSession(session, page)
+
+
+def unwrap(session):
+    """The underlying session, for libraries that need a real Snowpark Session"""
+    return getattr(session, "raw", session)
+
+
+def flush_query_log(session) -> int:
+    """Write any pending records now (e.g. from an admin action)"""
+    return _log.flush(unwrap(session))
+
+
+def query_log_stats() -> dict:
+    return {"enabled": logging_enabled(), "pending": len(_log._pending),
+            "written": _log.written, "failures": _log.failures}
+
+
+def performance_panel(session):
+    """Collapsible per-rerun query totals; shown when the sidebar toggle is on"""
+    import streamlit as st
+
+    if not isinstance(session, InstrumentedSession):
+        return
+    if not st.sidebar.checkbox("Performance panel", key="show_performance"):
+        return
+    totals = session.totals()
+    overall = totals["overall"]
+    with st.expander(f"Performance: {overall['queries']} queries, {overall['elapsed_ms']:,.0f} ms"):
+        col1, col2, col3, col4 = st.columns(4)
+        col1.metric("Queries", overall["queries"])
+        col2.metric("Query time", f"{overall['elapsed_ms']:,.0f} ms")
+        col3.metric("Rows", f"{overall['rows']:,}")
+        col4.metric("Data", f"{overall['bytes'] / 1024:,.1f} KB")
+        st.dataframe(
+            [{"Section": name, "Queries": t["queries"], "ms": round(t["elapsed_ms"], 1),
+              "Rows": t["rows"], "KB": round(t["bytes"] / 1024, 1)}
+             for name, t in sorted(totals["sections"].items(), key=lambda item: -item[1]["elapsed_ms"])],
+            hide_index=True, use_container_width=True,
+        )
+        st.dataframe(
+            [{"Section": r.section, "Action": r.action, "ms": round(r.elapsed_ms, 1), "Rows": r.rows,
+              "KB": round(r.bytes / 1024, 1), "Query ID": r.query_id, "SQL": r.sql[:200],
+              "Error": r.error} for r in totals["records"]],
+            hide_index=True, use_container_width=True,
+        )
+        stats = query_log_stats()
+        if stats["enabled"]:
+            st.caption(f"{LOG_TABLE}: {stats['written']:,} written, {stats['pending']} pending"
+                       + (f", {stats['failures']} failed flushes" if stats["failures"] else ""))
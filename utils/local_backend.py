@@ -0,0 +1,366 @@
+"""
+Local backend: a DuckDB stand-in for the Snowpark session
+Implements the subset of the Snowpark API the app uses (sql()/table() and
+the DataFrame collect, to_pandas, batch, local iterator and collect_nowait
+calls, plus write_pandas), translating the few Snowflake-only constructs
+the app's SQL uses. Like Snowflake, it does not enforce PRIMARY KEY or
+UNIQUE constraints. The database is bootstrapped from setup/02_tables.sql
+and setup/03_sample_data.sql, so the app runs, is profiled and is tested
+without a Snowflake account. Cortex COMPLETE returns a placeholder.
+
+Select it with ESG_BACKEND=local (see utils/backend.py); ESG_LOCAL_DB
+points at a DuckDB file to keep data between runs (default: in memory).
+"""
+import getpass
+import os
+import re
+import threading
+import time
+import uuid
+from collections import deque
+
+import duckdb
+import pyarrow as pa
+
+DATABASE = "ESG_REPORTING"
+SCHEMAS = ["PROD", "STAGING"]
+SETUP_DIR = os.path.join(os.path.dirname(__file__), "..", "setup")
+SETUP_SCRIPTS = ["02_tables.sql", "03_sample_data.sql"]
+
+# LocalSession.queries keeps only the most recent statements, so a long-running
+# local app does not grow without bound; callers that count clear it per run
+MAX_RECORDED_QUERIES = 10000
+
+# Snowflake spelling -> DuckDB spelling, applied to every statement
+TRANSLATIONS = [
+    (re.compile(r"\bCOMMENT\s+'(?:[^']|'')*'"), ""),
+    (re.compile(r"\bTIMESTAMP_NTZ\b"), "TIMESTAMP"),
+    (re.compile(r"\bTRANSIENT\s+TABLE\b"), "TABLE"),
+    (re.compile(r"\bCURRENT_TIMESTAMP\(\)"), "CAST(CURRENT_TIMESTAMP AS TIMESTAMP)"),
+    (re.compile(r"\bSNOWFLAKE\.CORTEX\.COMPLETE\("), "CORTEX_COMPLETE("),
+    (re.compile(r"\bOBJECT_CONSTRUCT\("), "JSON_OBJECT("),
+    (re.compile(r"\bDATEADD\((\w+),"), r"DATEADD('\1',"),
+]
+
+# Snowflake functions DuckDB lacks, as macros
+MACROS = [
+    "CREATE OR REPLACE MACRO IFF(condition, a, b) AS CASE WHEN condition THEN a ELSE b END",
+    "CREATE OR REPLACE MACRO SHA2(value, bits) AS SHA256(value)",
+    """CREATE OR REPLACE MACRO DATEADD(part, n, ts) AS CASE lower(part)
+        WHEN 'second' THEN ts + to_seconds(CAST(n AS BIGINT))
+        WHEN 'minute' THEN ts + to_minutes(CAST(n AS BIGINT))
+        WHEN 'hour' THEN ts + to_hours(CAST(n AS BIGINT))
+        ELSE ts + to_days(CAST(n AS BIGINT)) END""",
+]
+
+# Snowflake does not enforce PRIMARY KEY, UNIQUE or FOREIGN KEY, so neither does
+# the local copy; clustering keys have no DuckDB equivalent
+CONSTRAINTS = [
+    (re.compile(r",\s*(?:PRIMARY KEY|UNIQUE)\s*\([^)]*\)"), ""),
+    (re.compile(r"\s+(?:PRIMARY KEY|UNIQUE)\b(?!\s*\()"), ""),
+    (re.compile(r",\s*FOREIGN KEY\s*\([^)]*\)\s*REFERENCES\s+\w+\s*\([^)]*\)"), ""),
+    (re.compile(r"\s*\bCLUSTER BY\s*\([^)]*\)"), ""),
+]
+
+AUTOINCREMENT = re.compile(r"CREATE TABLE (?:IF NOT EXISTS )?(\w+)[^;]*?\bAUTOINCREMENT\b", re.S)
+SKIPPED = re.compile(r"^(USE|CREATE (DATABASE|SCHEMA|WAREHOUSE))\b", re.I)
+
+
+def split_statements(script: str) -> list:
+    """Split a SQL script on semicolons outside quotes, dropping -- comments"""
+    statements, current, quoted = [], [], False
+    i = 0
+    while i < len(script):
+        char = script[i]
+        if char == "'":
+            quoted = not quoted
+        elif not quoted and script.startswith("--", i):
+            end = script.find("\n", i)
+            i = len(script) if end < 0 else end
+            continue
+        elif not quoted and char == ";":
+            statements.append("".join(current).strip())
+            current = []
+            i += 1
+            continue
+        current.append(char)
+        i += 1
+    statements.append("".join(current).strip())
+    return [s for s in statements if s]
+
+
+class Row(tuple):
+    """Snowpark Row stand-in: a tuple that can also be indexed by column name"""
+
+    def __new__(cls, names, values):
+        row = super().__new__(cls, values)
+        row._names = names
+        return row
+
+    def __getitem__(self, key):
+        if isinstance(key, str):
+            key = self._names.index(key)
+        return super().__getitem__(key)
+
+    def __getattr__(self, name):
+        if name.startswith("_"):
+            raise AttributeError(name)
+        try:
+            return self[name]
+        except ValueError:
+            raise AttributeError(name) from None
+
+    def asDict(self) -> dict:
+        return dict(zip(self._names, self))
+
+
+class AsyncJob:
+    """collect_nowait() result: the query runs on its own thread"""
+
+    def __init__(self, frame):
+        self.query_id = uuid.uuid4().hex
+        self._result = None
+        self._error = None
+        self._thread = threading.Thread(target=self._run, args=(frame,), daemon=True)
+        self._thread.start()
+
+    def _run(self, frame):
+        try:
+            self._result = frame.collect()
+        except Exception as e:
+            self._error = e
+
+    def is_done(self) -> bool:
+        return not self._thread.is_alive()
+
+    def result(self):
+        self._thread.join()
+        if self._error is not None:
+            raise self._error
+        return self._result
+
+    def cancel(self):
+        """DuckDB queries here are short; the result is simply never read"""
+
+
+class DataFrame:
+    """A lazy query, run when one of the Snowpark actions is called"""
+
+    def __init__(self, session, sql: str, params: list = None):
+        self.session = session
+        self.sql = sql
+        self.params = list(params or [])
+
+    def select(self, *columns):
+        if len(columns) == 1 and isinstance(columns[0], (list, tuple)):
+            columns = columns[0]
+        return DataFrame(self.session, f"SELECT {', '.join(columns)} FROM ({self.sql})", self.params)
+
+    def collect(self) -> list:
+        return _rows(self.session._fetch(self.sql, self.params))
+
+    def collect_nowait(self) -> AsyncJob:
+        return AsyncJob(self)
+
+    def to_local_iterator(self):
+        for batch in self.session._batches(self.sql, self.params, 1000):
+            yield from _rows(batch)
+
+    def to_pandas(self):
+        return _to_pandas(self.session._fetch(self.sql, self.params))
+
+    def to_pandas_batches(self, rows_per_batch: int = 100_000):
+        for batch in self.session._batches(self.sql, self.params, rows_per_batch):
+            yield _to_pandas(batch)
+
+
+def _rows(table) -> list:
+    """Rows as collect() returns them: DECIMAL as Decimal, dates as date"""
+    names = [name.upper() for name in table.schema.names]
+    return [Row(names, values) for values in zip(*(column.to_pylist() for column in table.columns))]
+
+
+def _to_pandas(table):
+    """DataFrame as Snowpark's to_pandas() returns it: scaled DECIMALs as float64"""
+    schema = pa.schema([
+        pa.field(field.name.upper(), pa.float64() if pa.types.is_decimal(field.type) else field.type)
+        for field in table.schema
+    ])
+    if isinstance(table, pa.RecordBatch):
+        table = pa.Table.from_batches([table])
+    return table.cast(schema).to_pandas()
+
+
+class Query:
+    """One statement as the session saw it: SQL, wall time, rows and Arrow bytes returned"""
+    __slots__ = ("query_id", "sql", "seconds", "rows", "bytes")
+
+    def __init__(self, sql: str, seconds: float = 0.0, rows: int = 0, nbytes: int = 0):
+        self.query_id = uuid.uuid4().hex
+        self.sql = sql
+        self.seconds = seconds
+        self.rows = rows
+        self.bytes = nbytes
+
+
+class QueryHistory:
+    """session.query_history(): the Query objects recorded inside the with block"""
+
+    def __init__(self, session):
+        self._session = session
+        self.queries = []
+
+    def __enter__(self):
+        with self._session._lock:
+            self._session._listeners.append(self)
+        return self
+
+    def __exit__(self, *exc):
+        with self._session._lock:
+            self._session._listeners.remove(self)
+
+
+class LocalSession:
+    """DuckDB-backed session with the Snowpark methods the app calls
+
+    Every statement is appended to queries as a Query with its wall time,
+    rows and Arrow bytes returned (cleared by the caller, and capped at the
+    last MAX_RECORDED_QUERIES), so round trips and transfer can be measured
+    the way they would be against Snowflake.
+    """
+
+    def __init__(self, path: str = ":memory:", sample_data: bool = True, cortex_latency: float = 0.0):
+        self.user = getpass.getuser().upper()
+        self.cortex_latency = cortex_latency
+        self.queries = deque(maxlen=MAX_RECORDED_QUERIES)
+        self._listeners = []
+        self._lock = threading.Lock()
+        self._con = duckdb.connect()
+        self._con.execute(f"ATTACH '{path}' AS {DATABASE}")
+        self._con.execute(f"USE {DATABASE}")
+        for schema in SCHEMAS:
+            self._con.execute(f"CREATE SCHEMA IF NOT EXISTS {schema}")
+        self._con.execute(f"USE {DATABASE}.PROD")
+        for macro in MACROS:
+            self._con.execute(macro)
+        self._con.create_function("CORTEX_COMPLETE", self._complete, ["VARCHAR", "VARCHAR"], "VARCHAR")
+
+        if not self._con.execute("SELECT COUNT(*) FROM information_schema.tables "
+                                 "WHERE table_name = 'ESG_METRICS'").fetchone()[0]:
+            self.run_script(SETUP_SCRIPTS if sample_data else SETUP_SCRIPTS[:1])
+
+    def _complete(self, model: str, prompt: str) -> str:
+        if self.cortex_latency:
+            time.sleep(self.cortex_latency)
+        return (f"Cortex is not available on the local backend; this placeholder stands in for "
+                f"the {model} answer to a {len(prompt):,}-character prompt.")
+
+    def translate(self, sql: str) -> str:
+        sql = sql.replace("CURRENT_USER()", f"'{self.user}'")
+        for pattern, replacement in TRANSLATIONS:
+            sql = pattern.sub(replacement, sql)
+        return sql
+
+    def _cursor(self, sql: str, params: list = None):
+        with self._lock:
+            cursor = self._con.cursor()
+        cursor.execute(f"USE {DATABASE}.PROD")
+        return cursor.execute(self.translate(sql), params or None)
+
+    def _record(self, query: Query):
+        with self._lock:
+            self.queries.append(query)
+            for history in self._listeners:
+                history.queries.append(query)
+
+    def query_history(self) -> QueryHistory:
+        return QueryHistory(self)
+
+    def _fetch(self, sql: str, params: list = None):
+        """Run one statement and return its result as an Arrow table"""
+        started = time.perf_counter()
+        cursor = self._cursor(sql, params)
+        table = cursor.fetch_arrow_table() if cursor.description else pa.table({})
+        self._record(Query(sql, time.perf_counter() - started, table.num_rows, table.nbytes))
+        return table
+
+    def _batches(self, sql: str, params: list, rows_per_batch: int):
+        """Run one statement and yield its result as Arrow record batches"""
+        query = Query(sql)
+        self._record(query)
+        started = time.perf_counter()
+        reader = self._cursor(sql, params).fetch_record_batch(rows_per_batch)
+        query.seconds += time.perf_counter() - started
+        while True:
+            started = time.perf_counter()
+            try:
+                batch = reader.read_next_batch()
+            except StopIteration:
+                return
+            finally:
+                query.seconds += time.perf_counter() - started
+            query.rows += batch.num_rows
+            query.bytes += batch.nbytes
+            yield batch
+
+    def run_script(self, names: list):
+        """Run setup scripts statement by statement, skipping account-level DDL"""
+        for name in names:
+            with open(os.path.join(SETUP_DIR, name), encoding="utf-8") as f:
+                script = f.read()
+            for statement in split_statements(script):
+                if SKIPPED.match(statement):
+                    continue
+                match = AUTOINCREMENT.match(statement)
+                if match:
+                    sequence = f"{match.group(1)}_ID_SEQ"
+                    self._con.execute(f"CREATE SEQUENCE IF NOT EXISTS {sequence}")
+                    statement = statement.replace("AUTOINCREMENT", f"DEFAULT nextval('{sequence}')")
+                for pattern, replacement in CONSTRAINTS:
+                    statement = pattern.sub(replacement, statement)
+                self._con.execute(self.translate(statement))
+
+    def sql(self, query: str, params: list = None) -> DataFrame:
+        return DataFrame(self, query, params)
+
+    def table(self, name: str) -> DataFrame:
+        return DataFrame(self, f"SELECT * FROM {name}")
+
+    def write_pandas(self, frame, table_name: str, database: str = None, schema: str = None,
+                     quote_identifiers: bool = True, **kwargs):
+        """Append a DataFrame to an existing table, like Session.write_pandas"""
+        target = ".".join(part for part in (database, schema, table_name) if part)
+        view = f"_write_{uuid.uuid4().hex}"
+        started = time.perf_counter()
+        with self._lock:
+            self._con.register(view, frame)
+            try:
+                self._con.execute(f"INSERT INTO {target} ({', '.join(frame.columns)}) SELECT * FROM {view}")
+            finally:
+                self._con.unregister(view)
+        self._record(Query(f"write_pandas {target}", time.perf_counter() - started, len(frame)))
+        return self.table(target)
+
+    def close(self):
+        self._con.close()
+
+
+_session = None
+_session_lock = threading.Lock()
+
+
+def local_session() -> LocalSession:
+    """The process-wide local session, created on first use"""
+    global _session
+    with _session_lock:
+        if _session is None:
+            _session = LocalSession(os.environ.get("ESG_LOCAL_DB", ":memory:"),
+                                    cortex_latency=float(os.environ.get("ESG_LOCAL_CORTEX_LATENCY", 0)))
+        return _session
+
+
+def set_local_session(session: LocalSession):
+    """Make session the process-wide local session (benchmarks and checks)"""
+    global _session
+    with _session_lock:
+        _session = session
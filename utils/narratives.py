@@ -0,0 +1,147 @@
+"""
+One Report narratives
+Drafts the 56-1 narrative for every E, S and G subsection of every report
+year of one organization in a single MERGE: prompts are built in SQL from ESG_METRICS (with the
+previous year for comparison), CORTEX.COMPLETE runs over that prompt set in
+the warehouse and the results land in ESG_NARRATIVES. A subsection whose
+prompt is unchanged since it was last generated is skipped, so rerunning
+only pays for what the data changed.
+"""
+from utils.cortex import DEFAULT_MODEL
+from utils.database import IDENTIFIER, TABLE, load_table
+
+NARRATIVE_TABLE = "ESG_NARRATIVES"
+
+NARRATIVE_COLUMNS = ["ORG_ID", "REPORT_YEAR", "SECTION", "PILLAR", "MODEL", "NARRATIVE", "CREATED_AT", "UPDATED_AT"]
+
+PILLARS = {"E": "Environmental", "S": "Social", "G": "Governance"}
+
+# section key -> (pillar, title, ESG_METRICS columns the narrative draws on)
+SECTIONS = {
+    "ghg": ("E", "Climate change and GHG emissions", [
+        "GHG_SCOPE1_TCO2E", "GHG_SCOPE2_TCO2E", "GHG_SCOPE3_TCO2E",
+        "GHG_REDUCTION_TARGET_PCT", "GHG_REDUCTION_ACHIEVED_PCT",
+    ]),
+    "energy": ("E", "Energy management", [
+        "ENERGY_TOTAL_MWH", "ENERGY_RENEWABLE_MWH", "ENERGY_INTENSITY", "SOLAR_INSTALLED_KW",
+    ]),
+    "water_waste": ("E", "Water and waste management", [
+        "WATER_CONSUMPTION_M3", "WATER_RECYCLED_PCT", "WASTE_TOTAL_TONS", "WASTE_RECYCLED_PCT",
+        "HAZARDOUS_WASTE_TONS", "ZERO_WASTE_TO_LANDFILL",
+    ]),
+    "env_compliance": ("E", "Environmental compliance", [
+        "ENV_VIOLATIONS", "ENV_FINES_THB", "ISO14001_CERTIFIED",
+    ]),
+    "workforce": ("S", "Employment and compensation", [
+        "EMPLOYEES_TOTAL", "EMPLOYEES_PERMANENT", "EMPLOYEES_CONTRACT", "NEW_HIRES", "TURNOVER_RATE_PCT",
+        "MIN_WAGE_COMPLIANCE", "AVG_SALARY_THB", "BENEFITS_BEYOND_LEGAL", "PROVIDENT_FUND_PCT",
+    ]),
+    "diversity": ("S", "Diversity and inclusion", [
+        "WOMEN_WORKFORCE_PCT", "WOMEN_MANAGEMENT_PCT", "WOMEN_EXECUTIVE_PCT",
+        "DISABLED_EMPLOYEES", "LOCAL_EMPLOYMENT_PCT",
+    ]),
+    "safety": ("S", "Occupational health and safety", [
+        "LOST_TIME_INJURIES", "INJURY_RATE", "FATALITIES", "SAFETY_TRAINING_HOURS",
+        "SAFETY_COMMITTEE", "ISO45001_CERTIFIED",
+    ]),
+    "training": ("S", "Training and development", [
+        "TRAINING_HOURS_AVG", "TRAINING_BUDGET_THB", "CAREER_DEVELOPMENT_PROGRAM",
+    ]),
+    "community": ("S", "Community and supply chain", [
+        "CSR_BUDGET_THB", "COMMUNITY_PROJECTS", "LOCAL_SUPPLIER_PCT",
+        "SUPPLIER_CODE_OF_CONDUCT", "SUPPLIER_ESG_ASSESSMENT",
+    ]),
+    "board": ("G", "Board structure and committees", [
+        "BOARD_TOTAL", "BOARD_INDEPENDENT_PCT", "BOARD_WOMEN_PCT", "BOARD_MEETINGS_YEAR", "BOARD_ATTENDANCE_PCT",
+        "HAS_AUDIT_COMMITTEE", "HAS_RISK_COMMITTEE", "HAS_CG_COMMITTEE", "HAS_SUSTAINABILITY_COMMITTEE",
+    ]),
+    "ethics": ("G", "Business ethics and anti-corruption", [
+        "CODE_OF_CONDUCT", "ANTI_CORRUPTION_POLICY", "WHISTLEBLOWER_POLICY",
+        "ETHICS_TRAINING_PCT", "CORRUPTION_CASES",
+    ]),
+    "ratings": ("G", "Ratings, certification and assurance", [
+        "CGR_SCORE", "SET_ESG_RATING", "THSI_MEMBER", "EXTERNAL_ASSURANCE", "ASSURANCE_PROVIDER",
+    ]),
+}
+
+INSTRUCTION = (
+    "You are drafting the sustainability chapter of a Thai listed company's One Report "
+    "(Form 56-1 One Report) for the Stock Exchange of Thailand. Write one concise paragraph "
+    "of 80 to 120 words for the subsection below in a factual, professional register. "
+    "Use only the figures given, quote them with their units, compare with the previous "
+    "year where it is given, and do not invent targets or initiatives."
+)
+
+
+def _figures(alias: str) -> str:
+    """CASE expression giving the section's columns of one ESG_METRICS row as JSON"""
+    branches = []
+    for key, (_, _, columns) in SECTIONS.items():
+        pairs = ", ".join(f"'{c}', {alias}.{c}" for c in columns)
+        branches.append(f"WHEN '{key}' THEN TO_JSON(OBJECT_CONSTRUCT({pairs}))")
+    return "CASE s.SECTION " + " ".join(branches) + " END"
+
+
+def _merge_sql(years: list, force: bool) -> str:
+    for key, (_, _, columns) in SECTIONS.items():
+        for name in [key.upper(), *columns]:
+            if not IDENTIFIER.match(name):
+                raise ValueError(f"Invalid section or column name: {name!r}")
+    sections = ", ".join("(?, ?, ?)" for _ in SECTIONS)
+    year_filter = f"AND m.REPORT_YEAR IN ({', '.join('?' for _ in years)})" if years else ""
+    # Without force, rows whose stored prompt hash still matches are left out of the source
+    unchanged = "" if force else f"""LEFT JOIN {NARRATIVE_TABLE} n ON n.ORG_ID = pr.ORG_ID AND n.REPORT_YEAR = pr.REPORT_YEAR
+            AND n.SECTION = pr.SECTION AND n.MODEL = ? AND n.PROMPT_HASH = SHA2(pr.PROMPT, 256)
+        WHERE n.SECTION IS NULL"""
+    return f"""MERGE INTO {NARRATIVE_TABLE} t USING (
+    WITH PROMPTS AS (
+        SELECT m.ORG_ID, m.REPORT_YEAR, s.SECTION, s.PILLAR,
+            ? || ' Subsection: ' || s.TITLE || '. Fiscal year ' || m.REPORT_YEAR || ' figures: '
+            || {_figures("m")}
+            || CASE WHEN p.REPORT_YEAR IS NULL THEN ''
+                ELSE ' Previous year figures: ' || {_figures("p")} END AS PROMPT
+        FROM {TABLE} m
+        CROSS JOIN (VALUES {sections}) AS s (SECTION, PILLAR, TITLE)
+        LEFT JOIN {TABLE} p ON p.ORG_ID = m.ORG_ID AND p.REPORT_YEAR = m.REPORT_YEAR - 1
+        WHERE m.ORG_ID = ? {year_filter}
+    )
+    SELECT pr.ORG_ID, pr.REPORT_YEAR, pr.SECTION, pr.PILLAR, ? AS MODEL, SHA2(pr.PROMPT, 256) AS PROMPT_HASH,
+        SNOWFLAKE.CORTEX.COMPLETE(?, pr.PROMPT) AS NARRATIVE
+    FROM PROMPTS pr
+    {unchanged}
+) src ON t.ORG_ID = src.ORG_ID AND t.REPORT_YEAR = src.REPORT_YEAR AND t.SECTION = src.SECTION
+WHEN MATCHED THEN UPDATE SET PILLAR = src.PILLAR, MODEL = src.MODEL, PROMPT_HASH = src.PROMPT_HASH,
+    NARRATIVE = src.NARRATIVE, UPDATED_AT = CURRENT_TIMESTAMP()
+WHEN NOT MATCHED THEN INSERT (ORG_ID, REPORT_YEAR, SECTION, PILLAR, MODEL, PROMPT_HASH, NARRATIVE)
+    VALUES (src.ORG_ID, src.REPORT_YEAR, src.SECTION, src.PILLAR, src.MODEL, src.PROMPT_HASH, src.NARRATIVE)"""
+
+
+def narrative_query(session, org_id: int, years: list = None, model: str = DEFAULT_MODEL, force: bool = False):
+    """The generation MERGE for one organization as a lazy Snowpark DataFrame
+
+    years=None covers every report year of the organization; force=True regenerates subsections
+    whose inputs have not changed. Run it with collect(), or collect_nowait()
+    to keep the app responsive while the warehouse works.
+    """
+    years = [int(y) for y in years or []]
+    params = [value for key, (pillar, title, _) in SECTIONS.items() for value in (key, pillar, title)]
+    params = [INSTRUCTION, *params, int(org_id), *years, model, model]
+    if not force:
+        params.append(model)
+    return session.sql(_merge_sql(years, force), params=params)
+
+
+def merged_rows(result) -> int:
+    """Rows inserted plus rows updated, from the collected MERGE result"""
+    return sum(int(value or 0) for value in result[0]) if result else 0
+
+
+def generate_narratives(session, org_id: int, years: list = None, model: str = DEFAULT_MODEL,
+                        force: bool = False) -> int:
+    """Generate an organization's missing or outdated narratives in one statement; returns rows written"""
+    return merged_rows(narrative_query(session, org_id, years, model, force).collect())
+
+
+def load_narratives(session, org_id: int):
+    """One organization's ESG_NARRATIVES through the shared read cache"""
+    return load_table(session, NARRATIVE_TABLE, org_id, NARRATIVE_COLUMNS)
@@ -0,0 +1,154 @@
+"""
+Opt-in rerun profiling
+Wraps a Streamlit rerun in cProfile when ESG_PROFILE=1 is set or the page
+is opened with ?profile=1. Each profiled rerun is saved as a .prof file
+(open it with snakeviz or python -m pstats) next to a .json with the rerun
+metadata (script, section, dataset rows, wall time) and its top hotspots,
+which the sidebar shows as well. When profiling is off, profiled() only
+checks the switch and yields None.
+"""
+import cProfile
+import json
+import os
+import pstats
+import re
+import sysconfig
+import tempfile
+import threading
+import time
+from contextlib import contextmanager
+from datetime import datetime
+
+PROFILE_DIR = os.environ.get("ESG_PROFILE_DIR", os.path.join(tempfile.gettempdir(), "esg_profiles"))
+MAX_PROFILES = 100  # older .prof/.json pairs are deleted
+TOP_FUNCTIONS = 15
+ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
+STDLIB = sysconfig.get_paths()["stdlib"]
+
+# cProfile hooks are process-wide on newer Pythons; one rerun is profiled at a time
+_active = threading.Lock()
+
+
+def profiling_enabled() -> bool:
+    if os.environ.get("ESG_PROFILE", "0").lower() in ("1", "true", "yes"):
+        return True
+    import streamlit as st
+
+    try:
+        return st.query_params.get("profile") == "1"
+    except Exception:
+        return False
+
+
+def _location(filename: str, line: int, name: str) -> str:
+    """file:line(function) with the path shortened to the repo or package"""
+    if filename.startswith(ROOT):
+        filename = os.path.relpath(filename, ROOT)
+    elif "site-packages" in filename:
+        filename = filename.split("site-packages" + os.sep, 1)[1]
+    elif filename.startswith(STDLIB):
+        filename = os.path.relpath(filename, STDLIB)
+    return f"{filename}:{line}({name})" if line else name
+
+
+def hotspots(stats: pstats.Stats, limit: int = TOP_FUNCTIONS) -> list:
+    """Functions with the most self time: calls, self ms and cumulative ms"""
+    rows = sorted(stats.stats.items(), key=lambda item: item[1][2], reverse=True)[:limit]
+    return [
+        {"function": _location(*key), "calls": calls, "self_ms": round(tottime * 1000, 2),
+         "cumulative_ms": round(cumtime * 1000, 2)}
+        for key, (_, calls, tottime, cumtime, _) in rows
+    ]
+
+
+class RerunProfile:
+    """One profiled rerun; note() adds metadata such as section and rows"""
+
+    def __init__(self, script: str, metadata: dict):
+        self.script = script
+        self.metadata = {"script": script, **metadata}
+        self.started_at = datetime.now()
+        self.wall_ms = None
+        self.hotspots = []
+        self.path = None
+        self.error = None
+        self._profiler = cProfile.Profile()
+
+    def note(self, **metadata):
+        self.metadata.update(metadata)
+
+    def _finish(self, wall_ms: float):
+        self.wall_ms = round(wall_ms, 1)
+        stats = pstats.Stats(self._profiler)
+        self.hotspots = hotspots(stats)
+        try:
+            self.path = self._save(stats)
+        except OSError as e:
+            self.error = f"Profile not saved: {e}"
+
+    def _save(self, stats: pstats.Stats) -> str:
+        os.makedirs(PROFILE_DIR, exist_ok=True)
+        label = "_".join(str(v) for v in (os.path.basename(self.script), self.metadata.get("section")) if v)
+        stem = os.path.join(PROFILE_DIR, f"{self.started_at:%Y%m%d-%H%M%S-%f}_{re.sub(r'[^A-Za-z0-9.]+', '-', label)}")
+        stats.dump_stats(stem + ".prof")
+        with open(stem + ".json", "w", encoding="utf-8") as f:
+            json.dump({**self.metadata, "started_at": self.started_at.isoformat(), "wall_ms": self.wall_ms,
+                       "hotspots": self.hotspots}, f, indent=2, default=str)
+        _prune()
+        return stem + ".prof"
+
+
+def _prune():
+    profiles = sorted(name for name in os.listdir(PROFILE_DIR) if name.endswith(".prof"))
+    for name in profiles[:-MAX_PROFILES]:
+        for suffix in (".prof", ".json"):
+            try:
+                os.remove(os.path.join(PROFILE_DIR, name[:-len(".prof")] + suffix))
+            except OSError:
+                pass
+
+
+@contextmanager
+def profiled(script: str, **metadata):
+    """Profile the with block if profiling is switched on; yields the RerunProfile or None"""
+    if not profiling_enabled() or not _active.acquire(blocking=False):
+        yield None
+        return
+    profile = RerunProfile(script, metadata)
+    started = time.perf_counter()
+    try:
+        profile._profiler.enable()
+        try:
+            yield profile
+        except BaseException as e:
+            # st.rerun() and st.stop() end a rerun by raising; keep the profile
+            profile.note(interrupted=type(e).__name__)
+            raise
+        finally:
+            profile._profiler.disable()
+            profile._finish((time.perf_counter() - started) * 1000)
+    finally:
+        _active.release()
+
+
+def profile_panel(profile: RerunProfile):
+    """Sidebar expander with the hotspots of a finished profile"""
+    if profile is None:
+        return
+    import streamlit as st
+
+    with st.sidebar.expander(f"Profile: {profile.wall_ms:,.0f} ms"):
+        details = ", ".join(f"{k}={v}" for k, v in profile.metadata.items() if k != "script")
+        st.caption(f"{profile.script} {details}")
+        st.dataframe(
+            [{"Function": h["function"], "Calls": h["calls"], "Self ms": h["self_ms"],
+              "Cum. ms": h["cumulative_ms"]} for h in profile.hotspots],
+            hide_index=True, use_container_width=True,
+        )
+        if profile.path:
+            st.caption(f"Saved to {profile.path}")
+            with open(profile.path, "rb") as f:
+                st.download_button("Download .prof", f.read(), file_name=os.path.basename(profile.path),
+                                   mime="application/octet-stream")
+        if profile.error:
+            st.warning(profile.error)
@@ -0,0 +1,265 @@
+"""
+ESG_METRICS column types and form defaults
+Mirrors the DDL in setup/02_tables.sql - keep the two in sync
+"""
+import pandas as pd
+
+REPORT_STATUSES = ["Draft", "In Review", "Submitted to SET", "Approved"]
+SECTORS = ["Technology", "Services", "Industrial", "Property & Construction",
+           "Resources", "Consumer Products", "Agro & Food", "Financials"]
+CGR_SCORES = ["1 Star", "2 Stars", "3 Stars", "4 Stars", "5 Stars"]
+
+# column -> (type, precision or length, scale)
+COLUMN_TYPES = {
+    "ID": ("INTEGER",),
+    "ORG_ID": ("INTEGER",),
+
+    # Report Info
+    "REPORT_YEAR": ("INTEGER",),
+    "REPORT_STATUS": ("VARCHAR", 30),
+    "SECTOR": ("VARCHAR", 50),
+    "SUBMISSION_DEADLINE": ("DATE",),
+
+    # Environmental
+    "GHG_SCOPE1_TCO2E": ("DECIMAL", 15, 2),
+    "GHG_SCOPE2_TCO2E": ("DECIMAL", 15, 2),
+    "GHG_SCOPE3_TCO2E": ("DECIMAL", 15, 2),
+    "GHG_REDUCTION_TARGET_PCT": ("DECIMAL", 5, 2),
+    "GHG_REDUCTION_ACHIEVED_PCT": ("DECIMAL", 5, 2),
+    "ENERGY_TOTAL_MWH": ("DECIMAL", 15, 2),
+    "ENERGY_RENEWABLE_MWH": ("DECIMAL", 15, 2),
+    "ENERGY_INTENSITY": ("DECIMAL", 10, 4),
+    "SOLAR_INSTALLED_KW": ("DECIMAL", 15, 2),
+    "WATER_CONSUMPTION_M3": ("DECIMAL", 15, 2),
+    "WATER_RECYCLED_PCT": ("DECIMAL", 5, 2),
+    "WASTE_TOTAL_TONS": ("DECIMAL", 15, 2),
+    "WASTE_RECYCLED_PCT": ("DECIMAL", 5, 2),
+    "HAZARDOUS_WASTE_TONS": ("DECIMAL", 15, 2),
+    "ZERO_WASTE_TO_LANDFILL": ("BOOLEAN",),
+    "ENV_VIOLATIONS": ("INTEGER",),
+    "ENV_FINES_THB": ("DECIMAL", 15, 2),
+
+    # Social
+    "EMPLOYEES_TOTAL": ("INTEGER",),
+    "EMPLOYEES_PERMANENT": ("INTEGER",),
+    "EMPLOYEES_CONTRACT": ("INTEGER",),
+    "NEW_HIRES": ("INTEGER",),
+    "TURNOVER_RATE_PCT": ("DECIMAL", 5, 2),
+    "WOMEN_WORKFORCE_PCT": ("DECIMAL", 5, 2),
+    "WOMEN_MANAGEMENT_PCT": ("DECIMAL", 5, 2),
+    "WOMEN_EXECUTIVE_PCT": ("DECIMAL", 5, 2),
+    "DISABLED_EMPLOYEES": ("INTEGER",),
+    "LOCAL_EMPLOYMENT_PCT": ("DECIMAL", 5, 2),
+    "MIN_WAGE_COMPLIANCE": ("BOOLEAN",),
+    "AVG_SALARY_THB": ("DECIMAL", 15, 2),
+    "BENEFITS_BEYOND_LEGAL": ("BOOLEAN",),
+    "PROVIDENT_FUND_PCT": ("DECIMAL", 5, 2),
+    "LOST_TIME_INJURIES": ("INTEGER",),
+    "INJURY_RATE": ("DECIMAL", 6, 4),
+    "FATALITIES": ("INTEGER",),
+    "SAFETY_TRAINING_HOURS": ("DECIMAL", 10, 2),
+    "SAFETY_COMMITTEE": ("BOOLEAN",),
+    "TRAINING_HOURS_AVG": ("DECIMAL", 8, 2),
+    "TRAINING_BUDGET_THB": ("DECIMAL", 15, 2),
+    "CAREER_DEVELOPMENT_PROGRAM": ("BOOLEAN",),
+    "CSR_BUDGET_THB": ("DECIMAL", 15, 2),
+    "COMMUNITY_PROJECTS": ("INTEGER",),
+    "LOCAL_SUPPLIER_PCT": ("DECIMAL", 5, 2),
+    "SUPPLIER_CODE_OF_CONDUCT": ("BOOLEAN",),
+    "SUPPLIER_ESG_ASSESSMENT": ("BOOLEAN",),
+
+    # Governance
+    "BOARD_TOTAL": ("INTEGER",),
+    "BOARD_INDEPENDENT_PCT": ("DECIMAL", 5, 2),
+    "BOARD_WOMEN_PCT": ("DECIMAL", 5, 2),
+    "BOARD_MEETINGS_YEAR": ("INTEGER",),
+    "BOARD_ATTENDANCE_PCT": ("DECIMAL", 5, 2),
+    "HAS_AUDIT_COMMITTEE": ("BOOLEAN",),
+    "HAS_RISK_COMMITTEE": ("BOOLEAN",),
+    "HAS_CG_COMMITTEE": ("BOOLEAN",),
+    "HAS_SUSTAINABILITY_COMMITTEE": ("BOOLEAN",),
+    "CODE_OF_CONDUCT": ("BOOLEAN",),
+    "ANTI_CORRUPTION_POLICY": ("BOOLEAN",),
+    "WHISTLEBLOWER_POLICY": ("BOOLEAN",),
+    "ETHICS_TRAINING_PCT": ("DECIMAL", 5, 2),
+    "CORRUPTION_CASES": ("INTEGER",),
+    "CGR_SCORE": ("VARCHAR", 20),
+    "ISO14001_CERTIFIED": ("BOOLEAN",),
+    "ISO45001_CERTIFIED": ("BOOLEAN",),
+    "SET_ESG_RATING": ("BOOLEAN",),
+    "THSI_MEMBER": ("BOOLEAN",),
+    "EXTERNAL_ASSURANCE": ("BOOLEAN",),
+    "ASSURANCE_PROVIDER": ("VARCHAR", 100),
+
+    # Metadata
+    "NOTES": ("TEXT",),
+    "CREATED_BY": ("VARCHAR", 100),
+    "CREATED_AT": ("TIMESTAMP_NTZ",),
+    "UPDATED_BY": ("VARCHAR", 100),
+    "UPDATED_AT": ("TIMESTAMP_NTZ",),
+}
+
+# Starting values for new reports (FY2023 sample figures), then DDL defaults
+FORM_DEFAULTS = {
+    "REPORT_STATUS": "Draft",
+    "SECTOR": "Technology",
+    "GHG_SCOPE1_TCO2E": 8500, "GHG_SCOPE2_TCO2E": 4200, "GHG_SCOPE3_TCO2E": 45000,
+    "GHG_REDUCTION_TARGET_PCT": 15, "GHG_REDUCTION_ACHIEVED_PCT": 12,
+    "ENERGY_TOTAL_MWH": 25000, "ENERGY_RENEWABLE_MWH": 8750, "SOLAR_INSTALLED_KW": 500,
+    "WATER_CONSUMPTION_M3": 180000, "WATER_RECYCLED_PCT": 35,
+    "WASTE_TOTAL_TONS": 450, "WASTE_RECYCLED_PCT": 75, "HAZARDOUS_WASTE_TONS": 12,
+    "EMPLOYEES_TOTAL": 1850, "EMPLOYEES_PERMANENT": 1650, "NEW_HIRES": 280, "TURNOVER_RATE_PCT": 8.5,
+    "WOMEN_WORKFORCE_PCT": 45, "WOMEN_MANAGEMENT_PCT": 38, "WOMEN_EXECUTIVE_PCT": 25, "DISABLED_EMPLOYEES": 28,
+    "LOST_TIME_INJURIES": 3, "INJURY_RATE": 0.42,
+    "TRAINING_HOURS_AVG": 28, "TRAINING_BUDGET_THB": 2800000,
+    "CSR_BUDGET_THB": 5500000, "LOCAL_SUPPLIER_PCT": 72,
+    "BOARD_TOTAL": 11, "BOARD_INDEPENDENT_PCT": 45, "BOARD_WOMEN_PCT": 27, "BOARD_MEETINGS_YEAR": 12,
+    "ETHICS_TRAINING_PCT": 98,
+    "CGR_SCORE": "4 Stars",
+
+    # DDL defaults
+    "ZERO_WASTE_TO_LANDFILL": False, "ENV_VIOLATIONS": 0, "ENV_FINES_THB": 0,
+    "MIN_WAGE_COMPLIANCE": True, "BENEFITS_BEYOND_LEGAL": True, "FATALITIES": 0, "SAFETY_COMMITTEE": True,
+    "CAREER_DEVELOPMENT_PROGRAM": False, "SUPPLIER_CODE_OF_CONDUCT": False, "SUPPLIER_ESG_ASSESSMENT": False,
+    "HAS_AUDIT_COMMITTEE": True, "HAS_RISK_COMMITTEE": False, "HAS_CG_COMMITTEE": False,
+    "HAS_SUSTAINABILITY_COMMITTEE": False,
+    "CODE_OF_CONDUCT": True, "ANTI_CORRUPTION_POLICY": True, "WHISTLEBLOWER_POLICY": True, "CORRUPTION_CASES": 0,
+    "ISO14001_CERTIFIED": False, "ISO45001_CERTIFIED": False, "SET_ESG_RATING": False, "THSI_MEMBER": False,
+    "EXTERNAL_ASSURANCE": False,
+}
+
+
+def is_missing(value) -> bool:
+    """True for None, NaN and pandas NA/NaT"""
+    if value is None:
+        return True
+    try:
+        return bool(value != value)
+    except TypeError:
+        # pd.NA refuses boolean comparison
+        return True
+
+
+def coerce(column: str, value):
+    """Convert a value to the Python type its DDL column stores
+
+    Raises ValueError when the value does not fit the column.
+    """
+    if is_missing(value):
+        return None
+    kind = COLUMN_TYPES.get(column, ("ANY",))
+    name = kind[0]
+    if name == "INTEGER":
+        return int(value)
+    if name == "DECIMAL":
+        precision, scale = kind[1], kind[2]
+        value = round(float(value), scale)
+        if abs(value) >= 10 ** (precision - scale):
+            raise ValueError(f"{column} value {value} exceeds DECIMAL({precision},{scale})")
+        return value
+    if name == "BOOLEAN":
+        if isinstance(value, str):
+            return value.strip().lower() in ("true", "t", "yes", "y", "1")
+        return bool(value)
+    if name == "VARCHAR":
+        value = str(value)
+        if len(value) > kind[1]:
+            raise ValueError(f"{column} is longer than {kind[1]} characters")
+        return value
+    if name == "TEXT":
+        return str(value)
+    return value
+
+
+def form_value(row: dict, column: str):
+    """Widget default for a column: the stored value, else the form default"""
+    value = coerce(column, row.get(column)) if row else None
+    if value is None:
+        value = coerce(column, FORM_DEFAULTS.get(column))
+    if value is None:
+        kind = COLUMN_TYPES.get(column, ("ANY",))[0]
+        value = {"INTEGER": 0, "DECIMAL": 0.0, "BOOLEAN": False}.get(kind, "")
+    return value
+
+
+def changed_fields(row: dict, submitted: dict) -> dict:
+    """Submitted fields whose value differs from the value stored in the row
+
+    Values are compared after DDL coercion, so float noise from number_input
+    and Decimal vs float differences do not count as edits. A NULL column
+    counts as changed whenever a value is submitted for it: the form shows
+    FORM_DEFAULTS there, and accepting them must still write them. An empty
+    text box over a NULL VARCHAR is not a change.
+    """
+    stored = row or {}
+    changes = {}
+    for column, value in submitted.items():
+        new, old = coerce(column, value), coerce(column, stored.get(column))
+        if new != old and not (old is None and new == ""):
+            changes[column] = value
+    return changes
+
+
+# Enumerated VARCHAR columns stored as categoricals in compact frames
+CATEGORIES = {
+    "REPORT_STATUS": REPORT_STATUSES,
+    "SECTOR": SECTORS,
+    "CGR_SCORE": CGR_SCORES,
+}
+
+# float32 holds about 7 significant digits, enough for DECIMAL(5,2) or DECIMAL(6,4)
+FLOAT32_MAX_PRECISION = 7
+
+
+def normalize(df, compact: bool = False):
+    """Coerce a freshly loaded frame to proper dtypes in one vectorized pass
+
+    DECIMAL columns arrive as Python Decimal objects; they become float64,
+    INTEGER columns become nullable Int64 and BOOLEAN columns become real
+    bools with NULLs replaced by the DDL default.
+
+    compact=True also stores low-precision DECIMALs as float32 and the
+    enumerated columns in CATEGORIES as categoricals. Running it again on
+    its own output is a no-op, so patched frames can be re-normalized.
+    """
+    columns = {}
+    for column in df.columns:
+        kind = COLUMN_TYPES.get(column, ("ANY",))
+        series = df[column]
+        if kind[0] == "DECIMAL":
+            dtype = "float32" if compact and kind[1] <= FLOAT32_MAX_PRECISION else "float64"
+            series = pd.to_numeric(series, errors="coerce").astype(dtype)
+        elif kind[0] == "INTEGER":
+            series = pd.to_numeric(series, errors="coerce").astype("Int64")
+        elif kind[0] == "BOOLEAN":
+            series = series.fillna(FORM_DEFAULTS.get(column, False)).astype(bool)
+        elif compact and column in CATEGORIES:
+            # Keep unexpected values instead of turning them into NaN
+            known = CATEGORIES[column]
+            extra = sorted(set(series.dropna().astype(str)) - set(known))
+            series = pd.Categorical(series.astype(object), categories=known + extra)
+        columns[column] = series
+    return pd.DataFrame(columns, index=df.index)
+
+
+class OneReport:
+    """One report year as plain Python values; None where the column is NULL
+
+    Forms and the dashboard read these instead of going back to pandas for
+    every field.
+    """
+    __slots__ = tuple(COLUMN_TYPES)
+
+    def __init__(self, **values):
+        for column in self.__slots__:
+            setattr(self, column, values.get(column))
+
+    def get(self, column: str, default=None):
+        value = getattr(self, column, None)
+        return default if value is None else value
+
+
+def to_reports(df) -> dict:
+    """Build {REPORT_YEAR: OneReport} from a normalized frame in one pass"""
+    records = df.astype(object).where(df.notna(), None).to_dict("records")
+    return {int(r["REPORT_YEAR"]): OneReport(**r) for r in records}